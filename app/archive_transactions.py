@@ -0,0 +1,111 @@
+"""
+Archivador de transacciones: mueve las más antiguas al tier frío.
+
+Las transacciones con `timestamp` anterior a `ARCHIVE_AFTER_DAYS` días se
+agrupan por usuario y mes en `transactions_archive` (un documento por bucket,
+`_id` = "usuario:AAAA-MM") y se borran de `transactions`. Así la colección
+caliente y sus índices quedan del tamaño de la ventana reciente, que es lo que
+ocupa el working set de DocumentDB.
+
+Cada lote primero se agrega a los buckets con `$addToSet` y después se borra:
+si el proceso se interrumpe entre los dos pasos, repetirlo no duplica nada y
+mientras tanto las lecturas descartan las transacciones que están en ambos
+tiers. El historial, el flujo de suscripción y `rebuild_fund_stats.py` leen
+los dos tiers.
+
+Uso (desde la carpeta `app`):
+    python archive_transactions.py --older-than-days 365 --batch-size 1000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import settings
+from db import ensure_indexes, get_db
+from repositories.backend import Database
+from repositories.transactions import ARCHIVE_COLLECTION
+
+
+def month_of(timestamp: datetime) -> str:
+    """Mes UTC (AAAA-MM) de un timestamp; los naive se toman como UTC."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.strftime("%Y-%m")
+
+
+def archive_batch(database: Database, transactions: list[dict]) -> int:
+    """
+    Agrega un lote de transacciones a sus buckets mensuales y lo borra del tier caliente.
+
+    Returns:
+        int: Número de buckets tocados.
+    """
+    buckets: dict[tuple[str, str], list[dict]] = {}
+    for transaction in transactions:
+        document = {key: value for key, value in transaction.items() if key != "user_id"}
+        buckets.setdefault((transaction["user_id"], month_of(transaction["timestamp"])), []).append(document)
+
+    archive = database[ARCHIVE_COLLECTION]
+    for (user_id, month), documents in buckets.items():
+        archive.update_one(
+            {"_id": f"{user_id}:{month}"},
+            {
+                "$addToSet": {"transactions": {"$each": documents}},
+                "$setOnInsert": {"user_id": user_id, "month": month},
+                "$min": {"first_timestamp": min(document["timestamp"] for document in documents)},
+                "$max": {"last_timestamp": max(document["timestamp"] for document in documents)},
+            },
+            upsert=True,
+        )
+    database["transactions"].delete_many({"_id": {"$in": [transaction["_id"] for transaction in transactions]}})
+    return len(buckets)
+
+
+def archive(database: Database, older_than_days: int, batch_size: int = 1_000, limit: int | None = None) -> dict:
+    """
+    Mueve al tier frío las transacciones más antiguas que `older_than_days`.
+
+    Args:
+        database (Database): La base de datos (MongoDB o en memoria).
+        older_than_days (int): Edad mínima (días) de las transacciones a archivar.
+        batch_size (int): Transacciones por lote.
+        limit (int | None): Máximo de transacciones a mover en esta corrida.
+
+    Returns:
+        dict: Resumen con los conteos y los tiempos.
+    """
+    started = time.perf_counter()
+    ensure_indexes(database)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    hot = database["transactions"]
+    moved = buckets = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        # Lo ya movido se borra, así que cada lote vuelve a pedir los primeros del índice de timestamp
+        batch = list(hot.find({"timestamp": {"$lt": cutoff}}).limit(size))
+        if not batch:
+            break
+        buckets += archive_batch(database, batch)
+        moved += len(batch)
+    return {
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+        "cutoff": cutoff.isoformat(),
+        "moved": moved,
+        "buckets_touched": buckets,
+        "hot_remaining": hot.estimated_document_count(),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mueve las transacciones antiguas a buckets mensuales.")
+    parser.add_argument("--older-than-days", type=int, default=settings.archive_after_days)
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size)
+    parser.add_argument("--limit", type=int, help="Máximo de transacciones a mover en esta corrida")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(archive(get_db(), args.older_than_days, args.batch_size, args.limit), indent=2))
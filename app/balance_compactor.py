@@ -0,0 +1,110 @@
+"""
+Compactación de balances en segundo plano.
+
+El flujo de suscripción avisa (`notify`) qué usuario escribió una
+transacción; un hilo revisa cada `interval` segundos a los usuarios avisados
+y escribe un snapshot para los que acumulan suficientes transacciones desde
+el último (`repositories.balances.compact_user`). Solo se revisan usuarios
+activos y la petición no espera a la compactación.
+
+Con varios workers cada uno compacta a sus propios usuarios avisados; el
+índice único (user_id, as_of) evita snapshots duplicados.
+
+Para compactar a todos los usuarios (p.ej. tras una carga masiva o la primera
+vez, para crear sus snapshots iniciales), desde la carpeta `app`:
+    python balance_compactor.py --every 100
+"""
+import argparse
+import json
+import threading
+import time
+
+from pymongo.errors import PyMongoError
+
+from config import settings
+from db import get_db
+from metrics import registry
+from repositories.balances import compact_user
+
+balance_snapshots = registry.counter("balance_snapshots_total", "Snapshots de balance escritos por la compactación")
+compaction_errors = registry.counter("balance_compaction_errors_total", "Errores al compactar el balance de un usuario")
+
+
+class BalanceCompactor:
+    """
+    Compacta en un hilo de fondo los balances de los usuarios con transacciones nuevas.
+
+    Args:
+        interval (float): Segundos entre revisiones.
+    """
+
+    def __init__(self, interval: float = 30.0):
+        self.interval = interval
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    def notify(self, user_id: str) -> None:
+        """Marca a un usuario para revisar en la próxima pasada."""
+        with self._lock:
+            self._pending.add(user_id)
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(target=self._run, name="balance-compactor", daemon=True)
+                self._worker.start()
+
+    def run_once(self) -> int:
+        """
+        Revisa a los usuarios avisados.
+
+        Returns:
+            int: Snapshots escritos.
+        """
+        with self._lock:
+            user_ids, self._pending = self._pending, set()
+        written = 0
+        for user_id in user_ids:
+            try:
+                if compact_user(user_id):
+                    written += 1
+                    balance_snapshots.inc()
+            except PyMongoError as e:
+                compaction_errors.inc(error=type(e).__name__)
+                # Se vuelve a intentar en la próxima pasada
+                with self._lock:
+                    self._pending.add(user_id)
+        return written
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def stop(self) -> None:
+        """Detiene el hilo tras una última pasada (p.ej. al apagar el proceso)."""
+        self._stopped.set()
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join(timeout=1)
+        self.run_once()
+
+
+balance_compactor = BalanceCompactor(interval=settings.balance_compaction_interval)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Escribe snapshots de balance para todos los usuarios.")
+    parser.add_argument("--every", type=int, default=settings.balance_snapshot_every,
+                        help="Transacciones mínimas desde el último snapshot")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.perf_counter()
+    users = written = 0
+    for user in get_db().users.find({}, {"_id": 1}):
+        users += 1
+        written += compact_user(str(user["_id"]), every=args.every)
+    print(json.dumps({"users": users, "snapshots": written, "seconds": round(time.perf_counter() - started, 2)}, indent=2))
@@ -0,0 +1,119 @@
+"""
+Benchmark del camino de BSON crudo para `/funds/get/transactions`.
+
+Parte de los mismos lotes de BSON que entrega el driver y compara, por cada
+10k filas, el tiempo de CPU y el pico de memoria de:
+
+- dict + Pydantic + jsonable_encoder: el camino original de FastAPI;
+- dict + Pydantic + orjson: `model_dump` serializado con `FastJSONResponse`;
+- BSON crudo + orjson: `raw_batches_to_json`.
+
+Uso (desde la carpeta `app`):
+    python -m benchmarks.bench_raw_bson [filas ...]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from responses import FastJSONResponse, raw_batches_to_json
+from schema.transactions import Transaction, TransactionType
+
+DEFAULT_SIZES = (10_000, 100_000)
+BATCH_SIZE = 1_000
+PER_ROWS = 10_000
+
+
+def build_batches(rows: int, seed: int = 42) -> list[bytes]:
+    # Documentos como los guarda la API; Mongo devuelve las fechas sin zona horaria
+    rng = random.Random(seed)
+    user_id = str(ObjectId())
+    fund_ids = [str(ObjectId()) for _ in range(5)]
+    start = datetime(2024, 1, 1)
+    documents = [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "fund_id": rng.choice(fund_ids),
+            "amount": rng.randrange(50_000, 500_000, 1_000),
+            "transaction_type": rng.choice(list(TransactionType)).value,
+            "timestamp": start + timedelta(seconds=i * 37),
+        }
+        for i in range(rows)
+    ]
+    return [
+        b"".join(bson.encode(document) for document in documents[i:i + BATCH_SIZE])
+        for i in range(0, rows, BATCH_SIZE)
+    ]
+
+
+def _models(batches: list[bytes]) -> list[Transaction]:
+    # Lo que hacen el driver (dicts) y el repositorio (modelos)
+    return [
+        Transaction(id=str(document["_id"]), **document)
+        for batch in batches
+        for document in bson.decode_all(batch)
+    ]
+
+
+def default_path(batches: list[bytes]) -> bytes:
+    return JSONResponse(content=None).render(jsonable_encoder(_models(batches)))
+
+
+def orjson_path(batches: list[bytes]) -> bytes:
+    return FastJSONResponse(content=None).render([t.model_dump() for t in _models(batches)])
+
+
+def raw_path(batches: list[bytes]) -> bytes:
+    return raw_batches_to_json(batches)
+
+
+def measure(fn, batches: list[bytes], repeat: int) -> tuple[float, int, bytes]:
+    """Mejor tiempo de CPU (s), pico de memoria (bytes) y el resultado."""
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        start = time.process_time()
+        body = fn(batches)
+        best = min(best, time.process_time() - start)
+
+    tracemalloc.start()
+    fn(batches)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, body
+
+
+def run(rows: int) -> None:
+    batches = build_batches(rows)
+    repeat = 5 if rows <= 10_000 else 2
+    scale = PER_ROWS / rows
+
+    results = {
+        "dict+pydantic+jsonable": measure(default_path, batches, repeat),
+        "dict+pydantic+orjson": measure(orjson_path, batches, repeat),
+        "bson crudo+orjson": measure(raw_path, batches, repeat),
+    }
+
+    # jsonable_encoder emite las fechas sin zona horaria sin "Z"; los caminos con orjson las marcan como UTC
+    assert json.loads(results["dict+pydantic+orjson"][2]) == json.loads(results["bson crudo+orjson"][2])
+
+    print(f"\n== {rows:,} transacciones ({sum(map(len, batches)):,} bytes de BSON) ==")
+    print(f"{'camino':<26}{'CPU ms/10k':>12}{'pico MiB/10k':>14}")
+    for name, (cpu, peak, _) in results.items():
+        print(f"{name:<26}{cpu * 1000 * scale:>12.1f}{peak / 2**20 * scale:>14.2f}")
+    base_cpu, base_peak, _ = results["dict+pydantic+orjson"]
+    raw_cpu, raw_peak, _ = results["bson crudo+orjson"]
+    print(f"bson crudo vs orjson con modelos: {base_cpu / raw_cpu:.1f}x menos CPU, {base_peak / raw_peak:.1f}x menos memoria")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    for size in sizes:
+        run(size)
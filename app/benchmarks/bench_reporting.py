@@ -0,0 +1,136 @@
+"""
+Benchmark de la consulta de clientes elegibles (`query.sql`) en SQLite.
+
+Genera clientes, sucursales y productos con una forma realista (cada cliente
+inscrito en 0-3 productos y visitando 1-3 sucursales; cada sucursal ofrece
+una fracción del catálogo) y compara, sobre la consulta completa:
+
+- `EXISTS` solo con las llaves primarias del esquema;
+- `EXISTS` con los índices secundarios de `reporting`;
+- el índice de join materializado (`cliente_producto_sucursal`), más su costo de construcción.
+
+Después mide el mantenimiento incremental con triggers (costo por insert en
+`visitan` con y sin triggers, verificación contra el recálculo) y la latencia
+de ambas formas al duplicar el volumen de visitas.
+
+Uso (desde la carpeta `app`):
+    python -m benchmarks.bench_reporting [clientes]
+"""
+import random
+import sqlite3
+import sys
+import time
+
+from reporting import (
+    ELIGIBLE_CLIENTS_EXISTS, ELIGIBLE_CLIENTS_JOIN_INDEX, JOIN_INDEX_INDEXES, JOIN_INDEX_TABLE,
+    JOIN_INDEX_TRIGGERS, SECONDARY_INDEXES, DEFAULT_SCHEMA_PATH, eligible_clients,
+    rebuild_join_index, verify_join_index,
+)
+
+DEFAULT_CLIENTS = 1_000_000
+BRANCHES = 500
+PRODUCTS = 200
+PRODUCTS_PER_BRANCH = 8
+INCREMENTAL_VISITS = 100_000
+
+
+def populate(conn: sqlite3.Connection, clients: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    conn.executemany("INSERT INTO sucursal VALUES (?, ?, ?)", ((i, f"Sucursal {i}", f"Ciudad {i % 30}") for i in range(BRANCHES)))
+    conn.executemany("INSERT INTO producto VALUES (?, ?, ?)", ((i, f"Producto {i}", ("FPV", "FIC")[i % 2]) for i in range(PRODUCTS)))
+    conn.executemany(
+        "INSERT INTO disponibilidad VALUES (?, ?)",
+        ((branch, product) for branch in range(BRANCHES) for product in rng.sample(range(PRODUCTS), PRODUCTS_PER_BRANCH)),
+    )
+    conn.executemany("INSERT INTO cliente VALUES (?, ?, ?, ?)", ((i, f"Nombre {i}", f"Apellido {i}", f"Ciudad {i % 30}") for i in range(clients)))
+    conn.executemany(
+        "INSERT INTO inscripcion VALUES (?, ?)",
+        ((product, client) for client in range(clients) for product in rng.sample(range(PRODUCTS), rng.randint(0, 3))),
+    )
+    add_visits(conn, clients, rng)
+
+
+def add_visits(conn: sqlite3.Connection, clients: int, rng: random.Random, limit: int | None = None) -> None:
+    # Entre 1 y 3 sucursales nuevas por cliente; las visitas repetidas se ignoran
+    rows = ((client, branch) for client in range(clients) for branch in rng.sample(range(BRANCHES), rng.randint(1, 3)))
+    if limit is not None:
+        rows = (row for _, row in zip(range(limit), rows))
+    conn.executemany("INSERT OR IGNORE INTO visitan VALUES (?, ?, '2024-01-01')", rows)
+    conn.commit()
+
+
+def _timed(label: str, fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<38} {elapsed * 1000:>9.0f} ms")
+    return elapsed, result
+
+
+def _count(conn: sqlite3.Connection, query: str) -> int:
+    return len(conn.execute(query, (-1, 0)).fetchall())
+
+
+def _plan(conn: sqlite3.Connection, query: str) -> list[str]:
+    return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, (-1, 0))]
+
+
+def run(clients: int) -> None:
+    conn = sqlite3.connect(":memory:")
+    with open(DEFAULT_SCHEMA_PATH, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    print(f"{clients:,} clientes, {BRANCHES} sucursales, {PRODUCTS} productos")
+    _timed("carga", lambda: populate(conn, clients))
+    for table in ("inscripcion", "disponibilidad", "visitan"):
+        print(f"  {table:<38} {conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]:>9,} filas")
+
+    conn.execute("ANALYZE")
+    print("\nEXISTS solo con llaves primarias:", *_plan(conn, ELIGIBLE_CLIENTS_EXISTS), sep="\n  · ")
+    _, baseline = _timed("consulta", lambda: _count(conn, ELIGIBLE_CLIENTS_EXISTS))
+
+    def create_indexes():
+        for statement in SECONDARY_INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+    print("\nEXISTS con índices secundarios:")
+    _timed("creación de índices", create_indexes)
+    print("", *_plan(conn, ELIGIBLE_CLIENTS_EXISTS), sep="\n  · ")
+    exists_seconds, eligible = _timed("consulta", lambda: _count(conn, ELIGIBLE_CLIENTS_EXISTS))
+
+    for statement in (JOIN_INDEX_TABLE, *JOIN_INDEX_INDEXES):
+        conn.execute(statement)
+    print("\nÍndice de join materializado:", *_plan(conn, ELIGIBLE_CLIENTS_JOIN_INDEX), sep="\n  · ")
+    _, triples = _timed("construcción", lambda: rebuild_join_index(conn))
+    conn.execute("ANALYZE")
+    join_seconds, joined = _timed("consulta", lambda: _count(conn, ELIGIBLE_CLIENTS_JOIN_INDEX))
+    _timed("primera página (100)", lambda: eligible_clients(conn))
+
+    assert baseline == eligible == joined, (baseline, eligible, joined)
+    print(f"\n{eligible:,} clientes elegibles ({eligible / clients:.1%}); {triples:,} ternas en el índice de join")
+    print(f"índice de join vs EXISTS: {exists_seconds / join_seconds:.1f}x")
+
+    rng = random.Random(7)
+    print(f"\nMantenimiento incremental ({INCREMENTAL_VISITS:,} visitas nuevas):")
+    watermark = conn.execute("SELECT MAX(rowid) FROM visitan").fetchone()[0]
+    plain, _ = _timed("insert sin triggers", lambda: add_visits(conn, clients, random.Random(7), INCREMENTAL_VISITS))
+    conn.execute("DELETE FROM visitan WHERE rowid > ?", (watermark,))
+    conn.commit()
+    for statement in JOIN_INDEX_TRIGGERS:
+        conn.execute(statement)
+    triggered, _ = _timed("insert con triggers", lambda: add_visits(conn, clients, rng, INCREMENTAL_VISITS))
+    print(f"  {'costo por visita':<38} {(triggered - plain) / INCREMENTAL_VISITS * 1e6:>9.1f} µs")
+    _, report = _timed("verificación", lambda: verify_join_index(conn))
+    assert report["ok"], report
+
+    print("\nLatencia al duplicar las visitas:")
+    _timed("insert con triggers", lambda: add_visits(conn, clients, rng))
+    visits = conn.execute("SELECT COUNT(*) FROM visitan").fetchone()[0]
+    print(f"  {'visitan':<38} {visits:>9,} filas")
+    _, eligible = _timed("consulta EXISTS", lambda: _count(conn, ELIGIBLE_CLIENTS_EXISTS))
+    _, joined = _timed("consulta índice de join", lambda: _count(conn, ELIGIBLE_CLIENTS_JOIN_INDEX))
+    _timed("primera página (100)", lambda: eligible_clients(conn))
+    assert eligible == joined, (eligible, joined)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CLIENTS)
@@ -0,0 +1,84 @@
+"""
+Benchmark de escalamiento del perfil de producción con el número de workers.
+
+Levanta gunicorn (`gunicorn_conf.py`) con el backend en memoria para 1, 2,
+4, ... workers hasta el número de CPUs, y mide las peticiones por segundo a
+`GET /funds/` con varios clientes concurrentes usando conexiones keep-alive.
+
+Uso (desde la carpeta `app`):
+    python -m benchmarks.bench_serving_scaling [segundos] [clientes]
+"""
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PORT = 8765
+PATH = "/funds/"
+
+
+def wait_until_ready(timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            connection.request("GET", PATH)
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def client_loop(stop: threading.Event, counts: list[int], index: int) -> None:
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=10)
+    while not stop.is_set():
+        connection.request("GET", PATH)
+        response = connection.getresponse()
+        response.read()
+        counts[index] += 1
+
+
+def measure(duration: float, clients: int) -> float:
+    stop = threading.Event()
+    counts = [0] * clients
+    threads = [threading.Thread(target=client_loop, args=(stop, counts, i)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+def run(workers: int, duration: float, clients: int) -> float:
+    env = {**os.environ, "ENV": "bench", "WEB_CONCURRENCY": str(workers), "PORT": str(PORT)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready()
+        measure(1.0, clients)  # calentamiento
+        return measure(duration, clients)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    cpus = multiprocessing.cpu_count()
+    counts = sorted({1, *[2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus], cpus})
+
+    baseline = None
+    print(f"{'workers':>8}{'req/s':>12}{'escala':>10}")
+    for workers in counts:
+        rps = run(workers, duration, clients)
+        baseline = baseline or rps
+        print(f"{workers:>8}{rps:>12.0f}{rps / baseline:>10.2f}x")
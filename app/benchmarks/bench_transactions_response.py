@@ -0,0 +1,97 @@
+"""
+Benchmark de serialización y bytes en la red para `/funds/get/transactions`.
+
+Compara el camino por defecto de FastAPI (`jsonable_encoder` + `json.dumps`)
+con `FastJSONResponse` (orjson), y el tamaño del cuerpo sin comprimir,
+con gzip y con brotli.
+
+Uso (desde la carpeta `app`):
+    python -m benchmarks.bench_transactions_response [filas ...]
+"""
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from responses import FastJSONResponse
+from schema.transactions import Transaction, TransactionType
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_SIZES = (1_000, 100_000)
+
+
+def build_transactions(rows: int, seed: int = 42) -> list[Transaction]:
+    rng = random.Random(seed)
+    user_id = str(ObjectId())
+    fund_ids = [str(ObjectId()) for _ in range(5)]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        Transaction(
+            id=str(ObjectId()),
+            user_id=user_id,
+            fund_id=rng.choice(fund_ids),
+            amount=rng.randrange(50_000, 500_000, 1_000),
+            transaction_type=rng.choice(list(TransactionType)),
+            timestamp=start + timedelta(seconds=i * 37),
+        )
+        for i in range(rows)
+    ]
+
+
+def default_render(transactions: list[Transaction]) -> bytes:
+    # Lo que hace FastAPI cuando el endpoint devuelve los modelos sin response_model
+    return JSONResponse(content=None).render(jsonable_encoder(transactions))
+
+
+def orjson_render(transactions: list[Transaction]) -> bytes:
+    return FastJSONResponse(content=None).render([t.model_dump() for t in transactions])
+
+
+def best_of(fn, *args, repeat: int) -> tuple[float, bytes]:
+    best, result = float("inf"), b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(rows: int) -> None:
+    transactions = build_transactions(rows)
+    repeat = 5 if rows <= 10_000 else 2
+
+    default_time, default_body = best_of(default_render, transactions, repeat=repeat)
+    orjson_time, orjson_body = best_of(orjson_render, transactions, repeat=repeat)
+    assert json.loads(default_body) == json.loads(orjson_body)
+
+    print(f"\n== {rows:,} transacciones ==")
+    print(f"{'serializador':<22}{'tiempo (ms)':>14}{'bytes':>14}")
+    print(f"{'jsonable_encoder+json':<22}{default_time * 1000:>14.1f}{len(default_body):>14,}")
+    print(f"{'orjson':<22}{orjson_time * 1000:>14.1f}{len(orjson_body):>14,}")
+    print(f"speedup: {default_time / orjson_time:.1f}x")
+
+    print(f"{'codificación':<22}{'tiempo (ms)':>14}{'bytes':>14}")
+    gzip_time, gzip_body = best_of(gzip.compress, orjson_body, 6, repeat=repeat)
+    print(f"{'identity':<22}{0:>14.1f}{len(orjson_body):>14,}")
+    print(f"{'gzip (6)':<22}{gzip_time * 1000:>14.1f}{len(gzip_body):>14,}")
+    if brotli is not None:
+        br_time, br_body = best_of(lambda body: brotli.compress(body, quality=4), orjson_body, repeat=repeat)
+        print(f"{'brotli (4)':<22}{br_time * 1000:>14.1f}{len(br_body):>14,}")
+    else:
+        print("brotli no está instalado, se omite")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    for size in sizes:
+        run(size)
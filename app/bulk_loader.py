@@ -0,0 +1,365 @@
+"""
+Carga masiva de fondos, usuarios y transacciones desde CSV o NDJSON.
+
+El proceso principal lee el archivo en streaming y lo parte en bloques de
+`--chunk-size` filas; un pool de procesos valida cada bloque con Pydantic y
+lo escribe con un `insert_many` no ordenado (un bulk write del driver).
+
+Cada documento recibe un `_id` determinista derivado de su llave natural,
+así que volver a cargar un bloque no duplica datos: los duplicados se cuentan
+y se ignoran. Eso hace que la carga se pueda reanudar desde el checkpoint
+(los bloques terminados se saltan y los que estaban en curso se repiten).
+
+Si la colección está vacía al empezar, sus índices secundarios no únicos se
+eliminan y se construyen al final con `ensure_indexes`, que es mucho más
+rápido que mantenerlos fila a fila. Los únicos (p.ej. `email`, `cognito_id`,
+`fund_id`) se mantienen durante la carga: una fila que choca con otra distinta
+en uno de ellos se rechaza y queda en `--rejects`, en vez de romper la
+reconstrucción de los índices al final.
+
+Uso (desde la carpeta `app`):
+    python bulk_loader.py transactions historico.ndjson --workers 8
+    python bulk_loader.py users usuarios.csv --checkpoint usuarios.ckpt.json
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel, ConfigDict, EmailStr, TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError
+
+from config import settings
+from db import MEMORY_ENVS, ensure_indexes, get_db, reset_db
+from repositories.backend import Database
+from repositories.users import DEFAULT_INITIAL_BALANCE
+from schema.funds import FundsCategories
+from schema.transactions import TransactionType
+from schema.users import NotificationOptions
+
+DUPLICATE_KEY = 11000
+
+
+class FundRow(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    fund_id: int
+    name: str
+    min_amount: int
+    category: FundsCategories
+
+
+class UserRow(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    email: EmailStr
+    phone: str
+    cognito_id: str
+    balance: int = DEFAULT_INITIAL_BALANCE
+    notif_options: NotificationOptions = NotificationOptions.email
+
+
+class TransactionRow(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    # Identificador en el sistema de origen; si no viene, la llave son todos los campos
+    legacy_id: str | None = None
+    user_id: str
+    fund_id: str
+    amount: int
+    transaction_type: TransactionType
+    timestamp: datetime
+
+
+@dataclass(frozen=True)
+class LoadSpec:
+    """Cómo se valida y se identifica cada tipo de fila."""
+    collection: str
+    model: type[BaseModel]
+    natural_key: Callable[[BaseModel], str]
+    exclude: frozenset[str] = frozenset()
+
+
+def _transaction_key(row: TransactionRow) -> str:
+    if row.legacy_id:
+        return row.legacy_id
+    return f"{row.user_id}|{row.fund_id}|{row.transaction_type}|{row.amount}|{row.timestamp.isoformat()}"
+
+
+SPECS = {
+    "funds": LoadSpec("funds", FundRow, lambda row: str(row.fund_id)),
+    "users": LoadSpec("users", UserRow, lambda row: row.email.lower()),
+    "transactions": LoadSpec("transactions", TransactionRow, _transaction_key, exclude=frozenset({"legacy_id"})),
+}
+
+
+def deterministic_id(kind: str, key: str) -> ObjectId:
+    """`_id` estable para una llave natural: la misma fila siempre produce el mismo documento."""
+    return ObjectId(hashlib.blake2b(f"{kind}:{key}".encode(), digest_size=12).digest())
+
+
+@dataclass
+class ChunkResult:
+    chunk_no: int
+    rows: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: list[dict] = field(default_factory=list)
+
+
+# Estado de cada proceso del pool
+_header: list[str] | None = None
+
+
+def _init_worker(header: list[str] | None) -> None:
+    global _header
+    _header = header
+    # La conexión heredada del proceso principal no se puede usar después del fork
+    reset_db()
+
+
+def _parse(raw: Any) -> dict:
+    if _header is None:
+        return orjson.loads(raw)
+    # En CSV las celdas vacías son valores ausentes (se usan los defaults del modelo)
+    return {name: value for name, value in zip(_header, raw) if value != ""}
+
+
+def _validate(spec: LoadSpec, kind: str, rows: list, result: ChunkResult) -> list[dict]:
+    parsed = []
+    for raw in rows:
+        try:
+            parsed.append(_parse(raw))
+        except (orjson.JSONDecodeError, TypeError) as e:
+            result.rejected.append({"row": raw if isinstance(raw, (str, list)) else raw.decode(errors="replace"), "error": str(e)})
+
+    adapter = TypeAdapter(list[spec.model])
+    try:
+        models = adapter.validate_python(parsed)
+    except ValidationError:
+        # Algún registro es inválido: se valida fila a fila para aislar los rechazados
+        models = []
+        for row in parsed:
+            try:
+                models.append(spec.model.model_validate(row))
+            except ValidationError as e:
+                result.rejected.append({"row": row, "error": e.errors(include_url=False, include_context=False)})
+
+    documents = []
+    for model in models:
+        document = model.model_dump(exclude=spec.exclude)
+        document["_id"] = deterministic_id(kind, spec.natural_key(model))
+        documents.append(document)
+    return documents
+
+
+def load_chunk(kind: str, chunk_no: int, rows: list) -> ChunkResult:
+    """
+    Valida y escribe un bloque de filas. Corre en los procesos del pool.
+
+    Args:
+        kind (str): "funds", "users" o "transactions".
+        chunk_no (int): El número de bloque (para el checkpoint).
+        rows (list): Las líneas NDJSON o las filas CSV sin procesar.
+
+    Returns:
+        ChunkResult: Filas leídas, insertadas, duplicadas y rechazadas.
+    """
+    spec = SPECS[kind]
+    result = ChunkResult(chunk_no, rows=len(rows))
+    documents = _validate(spec, kind, rows, result)
+    if not documents:
+        return result
+    try:
+        inserted = get_db()[spec.collection].insert_many(documents, ordered=False)
+        result.inserted = len(inserted.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        other = [error for error in errors if error["code"] != DUPLICATE_KEY]
+        if other:
+            raise RuntimeError(f"Chunk {chunk_no}: {other[0]['errmsg']}") from e
+        result.inserted = e.details["nInserted"]
+        for error in errors:
+            if _is_reload(error):
+                result.duplicates += 1
+            else:
+                result.rejected.append({"row": documents[error["index"]], "error": error["errmsg"]})
+    return result
+
+
+def _is_reload(error: dict) -> bool:
+    """Si el duplicado es la misma fila cargada antes (mismo `_id`) y no un choque en otro índice único."""
+    if "keyPattern" in error:
+        return error["keyPattern"] == {"_id": 1}
+    return "index: _id_ " in error["errmsg"]
+
+
+class Checkpoint:
+    """
+    Progreso de una carga: los bloques terminados se guardan como una marca
+    de agua (todos los anteriores terminados) más los terminados fuera de orden.
+    """
+
+    def __init__(self, path: str | None, source: str, kind: str, chunk_size: int):
+        self.path = path
+        self.identity = {"source": os.path.abspath(source), "kind": kind, "chunk_size": chunk_size}
+        self.watermark = -1
+        self.done: set[int] = set()
+        self.totals = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("identity") != self.identity:
+                raise SystemExit(f"Checkpoint {path} belongs to another load: {state.get('identity')}")
+            self.watermark = state["watermark"]
+            self.done = set(state["done"])
+            self.totals = state["totals"]
+
+    def is_done(self, chunk_no: int) -> bool:
+        return chunk_no <= self.watermark or chunk_no in self.done
+
+    def mark(self, result: ChunkResult) -> None:
+        self.done.add(result.chunk_no)
+        while self.watermark + 1 in self.done:
+            self.watermark += 1
+            self.done.discard(self.watermark)
+        self.totals["rows"] += result.rows
+        self.totals["inserted"] += result.inserted
+        self.totals["duplicates"] += result.duplicates
+        self.totals["rejected"] += len(result.rejected)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        state = {"identity": self.identity, "watermark": self.watermark, "done": sorted(self.done), "totals": self.totals}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+def read_rows(path: str, fmt: str) -> tuple[list[str] | None, Iterator]:
+    """
+    Abre el archivo de entrada.
+
+    Returns:
+        tuple: (encabezado CSV o None, iterador de filas sin procesar).
+    """
+    if fmt == "ndjson":
+        f = open(path, "rb")
+        # El parseo del JSON se hace en los procesos del pool
+        return None, (line for line in f if line.strip())
+    f = open(path, newline="", encoding="utf-8")
+    reader = csv.reader(f)
+    return next(reader), reader
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def defer_indexes(database: Database, collection_name: str) -> bool:
+    """
+    Elimina los índices secundarios no únicos si la colección está vacía; se
+    reconstruyen al final. Los únicos se conservan para rechazar los choques fila a fila.
+    """
+    collection = database[collection_name]
+    if collection.count_documents({}, limit=1):
+        return False
+    for name, info in collection.index_information().items():
+        if name != "_id_" and not info.get("unique"):
+            collection.drop_index(name)
+    return True
+
+
+def run(args: argparse.Namespace) -> dict:
+    spec = SPECS[args.kind]
+    fmt = args.format or ("csv" if args.source.endswith(".csv") else "ndjson")
+    if settings.env in MEMORY_ENVS and args.workers > 0:
+        raise SystemExit("The in-memory backend is per process: use --workers 0")
+
+    checkpoint = Checkpoint(args.checkpoint, args.source, args.kind, args.chunk_size)
+    rejects = open(args.rejects, "ab") if args.rejects else None
+    deferred = args.defer_indexes and defer_indexes(get_db(), spec.collection)
+    header, rows = read_rows(args.source, fmt)
+
+    started = time.perf_counter()
+    loaded = 0
+
+    def handle(result: ChunkResult) -> None:
+        nonlocal loaded
+        checkpoint.mark(result)
+        checkpoint.save()
+        loaded += result.rows
+        if rejects is not None:
+            for rejected in result.rejected:
+                rejects.write(orjson.dumps(rejected, default=str) + b"\n")
+        elapsed = time.perf_counter() - started
+        print(f"chunk {result.chunk_no}: {loaded:,} rows, {loaded / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    chunks = (
+        (chunk_no, chunk) for chunk_no, chunk in enumerate(chunked(rows, args.chunk_size))
+        if not checkpoint.is_done(chunk_no)
+    )
+    if args.workers == 0:
+        _init_worker(header)
+        for chunk_no, chunk in chunks:
+            handle(load_chunk(args.kind, chunk_no, chunk))
+    else:
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(header,)) as pool:
+            pending = set()
+            for chunk_no, chunk in chunks:
+                pending.add(pool.submit(load_chunk, args.kind, chunk_no, chunk))
+                # Como máximo dos bloques en cola por proceso: memoria acotada
+                if len(pending) >= args.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        handle(future.result())
+            for future in wait(pending).done:
+                handle(future.result())
+
+    load_seconds = time.perf_counter() - started
+    index_started = time.perf_counter()
+    ensure_indexes(get_db())
+    if rejects is not None:
+        rejects.close()
+
+    return {
+        "kind": args.kind,
+        "source": args.source,
+        **checkpoint.totals,
+        "load_seconds": round(load_seconds, 2),
+        "docs_per_second": round(loaded / load_seconds) if load_seconds else None,
+        "indexes_deferred": deferred,
+        "index_seconds": round(time.perf_counter() - index_started, 2),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Carga masiva de fondos, usuarios y transacciones.")
+    parser.add_argument("kind", choices=sorted(SPECS))
+    parser.add_argument("source", help="Archivo CSV (con encabezado) o NDJSON")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Por defecto según la extensión")
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 = sin pool de procesos")
+    parser.add_argument("--checkpoint", help="Archivo de checkpoint para reanudar la carga")
+    parser.add_argument("--rejects", help="Archivo NDJSON donde se guardan las filas rechazadas")
+    parser.add_argument("--no-defer-indexes", dest="defer_indexes", action="store_false")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(parse_args())))
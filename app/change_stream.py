@@ -0,0 +1,213 @@
+"""
+Reparto de cambios de Mongo a las conexiones SSE de cada usuario.
+
+Cada worker abre un solo change stream sobre `transactions` y `users` en un
+hilo de fondo (al llegar la primera conexión) y reparte cada cambio a las
+colas asyncio de las conexiones del usuario afectado. Así muchos clientes
+escuchando cuestan un cursor por worker en lugar de una consulta por sondeo.
+
+En DocumentDB los change streams se habilitan por colección
+(`modifyChangeStreams`) y su retención limita cuánto se puede reanudar.
+"""
+import asyncio
+import logging
+import threading
+from typing import Callable
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import settings
+from db import get_db
+from metrics import registry
+from repositories.backend import Database
+from responses import dumps_bson
+from schema.transactions import Transaction
+
+logger = logging.getLogger(__name__)
+
+sse_connections = registry.gauge("sse_connections", "Conexiones SSE abiertas")
+change_events = registry.counter("change_stream_events_total", "Cambios recibidos del change stream")
+change_errors = registry.counter("change_stream_errors_total", "Errores del change stream (se reabre)")
+sse_overflows = registry.counter("sse_overflows_total", "Conexiones que se quedaron atrás y recibieron un resync")
+
+WATCHED_COLLECTIONS = ("transactions", "users")
+
+# Lo que sale a los clientes: los campos de `Transaction`, igual que el historial
+# (no los internos como `user_version`); `id` es el `_id` del documento
+TRANSACTION_KEYS = {("_id" if field == "id" else field): field for field in Transaction.model_fields}
+
+# Evento que le indica al cliente que perdió cambios y debe volver a leer el historial
+RESYNC = ("resync", b"{}")
+
+
+def _offer(queue: asyncio.Queue, item: tuple[str, bytes]) -> None:
+    # Corre en el event loop de la conexión
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+        sse_overflows.inc()
+
+
+def change_to_event(change: dict) -> tuple[str, str, bytes] | None:
+    """
+    Traduce un cambio de Mongo al evento SSE del usuario afectado.
+
+    Args:
+        change (dict): El documento de cambio del change stream.
+
+    Returns:
+        tuple[str, str, bytes] | None: (id del usuario, nombre del evento, datos en JSON),
+        o None si el cambio no interesa a los clientes.
+    """
+    collection = change["ns"]["coll"]
+    operation = change["operationType"]
+    if collection == "transactions" and operation == "insert":
+        document = change["fullDocument"]
+        transaction = {field: document[key] for key, field in TRANSACTION_KEYS.items() if key in document}
+        return document["user_id"], "transaction", dumps_bson(transaction)
+    if collection == "users" and operation in ("update", "replace"):
+        if operation == "replace":
+            fields = change["fullDocument"]
+        else:
+            fields = change["updateDescription"]["updatedFields"]
+        if "balance" not in fields:
+            return None
+        return str(change["documentKey"]["_id"]), "balance", dumps_bson({"balance": fields["balance"]})
+    return None
+
+
+class ChangeStreamHub:
+    """
+    Un change stream por proceso repartido entre las conexiones de los usuarios.
+
+    Args:
+        get_database (Callable[[], Database]): Obtiene la base de datos.
+        queue_size (int): Eventos pendientes por conexión; si se llena se envía un resync.
+        max_await_ms (int): Espera máxima de cada lectura del cursor.
+        retry_delay (float): Segundos antes de reabrir el stream tras un error.
+    """
+
+    def __init__(self, get_database: Callable[[], Database], queue_size: int = 100, max_await_ms: int = 1000, retry_delay: float = 1.0):
+        self._get_database = get_database
+        self.queue_size = queue_size
+        self.max_await_ms = max_await_ms
+        self.retry_delay = retry_delay
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """
+        Registra una conexión del usuario. Se debe llamar desde el event loop.
+
+        Args:
+            user_id (str): El ID del usuario.
+
+        Returns:
+            asyncio.Queue: La cola con tuplas (evento, datos JSON) para la conexión.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="change-stream-hub", daemon=True)
+                self._thread.start()
+        sse_connections.inc()
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is None:
+                return
+            subscribers.discard((asyncio.get_running_loop(), queue))
+            if not subscribers:
+                del self._subscribers[user_id]
+        sse_connections.dec()
+
+    def publish(self, user_id: str, item: tuple[str, bytes]) -> None:
+        """Entrega un evento a todas las conexiones del usuario (desde cualquier hilo)."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, item)
+            except RuntimeError:
+                # El event loop de la conexión ya se cerró
+                pass
+
+    def _broadcast_resync(self) -> None:
+        with self._lock:
+            user_ids = list(self._subscribers)
+        for user_id in user_ids:
+            self.publish(user_id, RESYNC)
+
+    def _watch(self, resume_token: dict | None):
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }}]
+        return self._get_database().watch(pipeline, resume_after=resume_token, max_await_time_ms=self.max_await_ms)
+
+    def _run(self) -> None:
+        resume_token = None
+        while not self._stopped.is_set():
+            try:
+                with self._watch(resume_token) as stream:
+                    while not self._stopped.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._dispatch(change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                change_errors.inc(error=type(e).__name__)
+                if resume_token is not None:
+                    # El token ya no es válido (p.ej. fuera de la retención): se pierden
+                    # cambios, así que los clientes deben volver a leer el historial
+                    resume_token = None
+                    self._broadcast_resync()
+                self._stopped.wait(self.retry_delay)
+            except PyMongoError as e:
+                change_errors.inc(error=type(e).__name__)
+                self._stopped.wait(self.retry_delay)
+            except Exception as e:
+                # Un error inesperado no puede terminar el hilo: el worker se quedaría
+                # sin eventos hasta reiniciarse. Se registra y se reabre el stream
+                change_errors.inc(error=type(e).__name__)
+                logger.exception("Change stream failed; reopening")
+                self._stopped.wait(self.retry_delay)
+
+    def _dispatch(self, change: dict) -> None:
+        try:
+            change_events.inc(collection=change["ns"]["coll"])
+            event = change_to_event(change)
+        except Exception as e:
+            # Un cambio con una forma inesperada se descarta (y se avanza el token);
+            # si se reabriera el stream se volvería a leer el mismo cambio
+            change_errors.inc(error=type(e).__name__)
+            logger.exception("Skipping change stream event %s", change.get("_id"))
+            return
+        if event is not None:
+            user_id, name, data = event
+            self.publish(user_id, (name, data))
+
+    def stop(self) -> None:
+        """Detiene el hilo del change stream (se reinicia con la siguiente conexión)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped.set()
+        if thread is not None:
+            thread.join(timeout=self.max_await_ms / 1000 + 1)
+
+
+change_hub = ChangeStreamHub(
+    get_db,
+    queue_size=settings.sse_queue_size,
+    max_await_ms=settings.change_stream_max_await_ms,
+    retry_delay=settings.change_stream_retry_delay,
+)
@@ -1,5 +1,13 @@
+import importlib.util
+
+from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Compresores de protocolo soportados por pymongo y el paquete que requiere cada uno
+MONGO_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+MONGO_READ_PREFERENCES = {"primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"}
+
 
 # Definir las variables de ambiente
 class Settings(BaseSettings):
@@ -7,6 +15,8 @@ class Settings(BaseSettings):
         env_file=".env",
         env_file_encoding="utf-8",
     )
+    # "local" usa mongo_uri, "memory"/"test"/"bench" el backend en memoria
+    # y cualquier otro valor lee la cadena de conexión de Secrets Manager
     env: str = "dev"
     region: str = "us-east-1"
 
@@ -15,13 +25,67 @@ class Settings(BaseSettings):
     mongo_db: str = "btg"
     mongo_host: str = "mongodb://localhost:27017"
 
+    # Pool de conexiones, compresión y timeouts del cliente de MongoDB.
+    # El pool es por proceso: con N workers el total es N * mongo_max_pool_size
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int | None = 60_000
+    mongo_wait_queue_timeout_ms: int | None = 5_000
+    mongo_compressors: str = ""  # p.ej. "zstd,snappy,zlib" en orden de preferencia
+    mongo_zlib_compression_level: int = -1
+    mongo_server_selection_timeout_ms: int = 5_000
+    mongo_connect_timeout_ms: int = 5_000
+    mongo_socket_timeout_ms: int | None = None
+    # Sin definir se respeta la de la cadena de conexión (y si no trae, primary)
+    mongo_read_preference: str | None = None
+
+    # Las lecturas de solo consulta (catálogo, historial) van a las secundarias
+    # con un retraso máximo acotado; el flujo de suscripción siempre lee del primario.
+    # Con sesiones causales un usuario ve sus propias escrituras en las secundarias
+    mongo_secondary_reads: bool = True
+    mongo_max_staleness_seconds: int = 90  # mínimo que acepta el servidor
+    mongo_causal_consistency: bool = True
+    # Segundos que se recuerda el tiempo de clúster de cada usuario para leer sus
+    # escrituras. Por defecto el retraso máximo de las secundarias, o 300 si no
+    # tiene límite (mongo_max_staleness_seconds = -1)
+    mongo_causal_window_seconds: int | None = None
+
+    # Segundos que se reutiliza el resultado de las consultas agrupadas (0 = solo agrupar)
+    singleflight_user_ttl: float = 0.0
+    singleflight_fund_ttl: float = 1.0
+
+    # Caché de perfiles de usuario por `sub` de Cognito
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 5.0
+
     # Variables para conexión de cognito
     cognito_user_pool_id: str = ""
     cognito_client_id: str = ""
     cognito_client_secret: str = ""
 
+    # Timeouts y reintentos de los clientes de AWS
+    aws_connect_timeout: float = 2.0
+    aws_read_timeout: float = 5.0
+    aws_max_attempts: int = 2
+
+    # Circuit breaker y bulkhead por dependencia (ses, sns, cognito, secretsmanager)
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    bulkhead_limits: dict[str, int] = {"ses": 8, "sns": 16, "cognito": 32, "secretsmanager": 4}
+    bulkhead_default_limit: int = 16
+    bulkhead_max_wait: float = 0.1
+
     # Notificaciones variables
     ses_sender: str = "no-reply@example.com"
+    # Idioma por defecto de las plantillas de notificación
+    notification_locale: str = "en"
+    # Ventana (s) en la que se agrupan notificaciones del mismo usuario y evento,
+    # y tiempo (s) durante el que se descarta reenviar un evento ya entregado (p.ej. la misma transacción)
+    notification_coalesce_window: float = 2.0
+    notification_dedup_ttl: float = 300.0
+    # Llamadas simultáneas máximas por proveedor
+    ses_concurrency: int = 4
+    sns_concurrency: int = 10
 
     # Seguridad JWT
     jwt_secret: str = "basic_secret"
@@ -29,9 +93,113 @@ class Settings(BaseSettings):
     # Seguridad / CORS
     allowed_origins: str = "*"
 
+    # Caché HTTP del catálogo de fondos. La versión (ETags y caché en memoria) es un
+    # hash del contenido de `funds`, releído como mucho cada `catalog_revision_ttl`
+    # segundos; `catalog_version` (CATALOG_VERSION) se antepone para invalidar a mano
+    # (p.ej. si cambia el formato de las respuestas).
+    catalog_version: str = "1"
+    catalog_revision_ttl: float = 1.0
+    catalog_cache_max_age: int = 60
+    # Segundos que cada worker guarda el catálogo en memoria
+    catalog_cache_ttl: float = 300.0
+    # Catálogo inicial de fondos (init_db y el backend en memoria); por defecto app/funds.json
+    funds_catalog_path: str | None = None
+
+    # Servidor: workers de gunicorn (0 = uno por CPU), puerto y tiempos de apagado
+    web_concurrency: int = 0
+    port: int = 8000
+    graceful_timeout: int = 30
+
+    # Stream de eventos (SSE) alimentado por un change stream compartido por worker
+    sse_heartbeat_seconds: float = 15.0
+    sse_queue_size: int = 100  # eventos pendientes por conexión antes de pedir un resync
+    change_stream_max_await_ms: int = 1_000
+    change_stream_retry_delay: float = 1.0
+
+    # Archivo de transacciones: las más antiguas pasan a buckets mensuales por usuario
+    archive_after_days: int = 365
+    archive_batch_size: int = 1_000
+
+    # Escrituras condicionadas a la versión del usuario: intentos ante conflictos
+    # y espera base (s) antes de reintentar, con backoff exponencial y jitter
+    user_write_max_attempts: int = 5
+    user_write_retry_backoff: float = 0.01
+    # Operaciones de un mismo usuario que se escriben juntas en cada worker
+    write_batch_max_size: int = 50
+
+    # Snapshots de balance: uno nuevo cada N transacciones del usuario, solo sobre
+    # transacciones con más de `settle` segundos, revisando cada `interval` segundos
+    balance_snapshot_every: int = 100
+    balance_snapshot_settle_seconds: float = 60.0
+    balance_compaction_interval: float = 30.0
+
+    # Reportes sobre el esquema relacional de init.sql en SQLite embebido
+    reporting_db_path: str = "reporting.db"
+    reporting_schema_path: str | None = None  # por defecto app/init.sql (viaja en la imagen)
+
+    # Compresión de respuestas (bytes mínimos y niveles de gzip / brotli)
+    compression_minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
 
     secret_mongo_db: str = "your_mongo_secret"
 
+    @field_validator("mongo_compressors")
+    @classmethod
+    def validate_compressors(cls, value: str) -> str:
+        compressors = [c.strip() for c in value.split(",") if c.strip()]
+        for compressor in compressors:
+            module = MONGO_COMPRESSOR_MODULES.get(compressor)
+            if module is None:
+                raise ValueError(f"Unsupported Mongo compressor '{compressor}'")
+            if importlib.util.find_spec(module) is None:
+                raise ValueError(f"Mongo compressor '{compressor}' requires the '{module}' package")
+        return ",".join(compressors)
+
+    @field_validator("mongo_read_preference")
+    @classmethod
+    def validate_read_preference(cls, value: str | None) -> str | None:
+        if value is not None and value not in MONGO_READ_PREFERENCES:
+            raise ValueError(f"Invalid read preference '{value}'")
+        return value
+
+    @field_validator("mongo_zlib_compression_level")
+    @classmethod
+    def validate_zlib_level(cls, value: int) -> int:
+        if not -1 <= value <= 9:
+            raise ValueError("mongo_zlib_compression_level must be between -1 and 9")
+        return value
+
+    @field_validator("mongo_max_staleness_seconds")
+    @classmethod
+    def validate_max_staleness(cls, value: int) -> int:
+        if value != -1 and value < 90:
+            raise ValueError("mongo_max_staleness_seconds must be -1 (no limit) or at least 90")
+        return value
+
+    @field_validator("mongo_causal_window_seconds")
+    @classmethod
+    def validate_causal_window(cls, value: int | None) -> int | None:
+        if value is not None and value < 1:
+            raise ValueError("mongo_causal_window_seconds must be at least 1")
+        return value
+
+    @field_validator("user_write_max_attempts")
+    @classmethod
+    def validate_write_attempts(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("user_write_max_attempts must be at least 1")
+        return value
+
+    @model_validator(mode="after")
+    def validate_pool(self) -> "Settings":
+        if self.mongo_max_pool_size < 1:
+            raise ValueError("mongo_max_pool_size must be at least 1")
+        if not 0 <= self.mongo_min_pool_size <= self.mongo_max_pool_size:
+            raise ValueError("mongo_min_pool_size must be between 0 and mongo_max_pool_size")
+        return self
+
 
 
 settings = Settings()  # sin _env_file en v2
\ No newline at end of file
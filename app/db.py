@@ -1,8 +1,171 @@
-from pymongo import MongoClient
+import threading
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator
+
+from pymongo import ASCENDING, MongoClient, monitoring
+from pymongo.client_session import ClientSession
+from pymongo.read_preferences import Primary, SecondaryPreferred
 from config import settings
 import boto3
 from botocore.exceptions import ClientError
 
+from cache import TTLCache
+from metrics import registry
+from repositories.backend import Collection, Database
+from resilience import aws_client_config, get_dependency
+
+# Ambientes que usan el backend en memoria en lugar de MongoDB
+MEMORY_ENVS = {"memory", "test", "bench"}
+
+# Índices de cada colección: (campos, opciones)
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("cognito_id", ASCENDING)], {"unique": True}),
+    ],
+    "transactions": [
+        # Resuelve sin ordenar en memoria la última transacción de un fondo, que desempata
+        # por versión y `_id` (ver `repositories.transactions.CHRONOLOGICAL_KEYS`)
+        ([("user_id", ASCENDING), ("fund_id", ASCENDING), ("timestamp", ASCENDING),
+          ("user_version", ASCENDING), ("_id", ASCENDING)], {}),
+        ([("user_id", ASCENDING), ("timestamp", ASCENDING)], {}),
+        # Para que el archivador encuentre las transacciones viejas sin recorrer la colección
+        ([("timestamp", ASCENDING)], {}),
+        # Cada escritura del flujo de suscripción toma una versión del usuario: dos
+        # peticiones concurrentes no pueden registrar la misma (las históricas no la tienen)
+        ([("user_id", ASCENDING), ("user_version", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"user_version": {"$exists": True}}, "name": "user_version_unique"}),
+    ],
+    "transactions_archive": [
+        ([("user_id", ASCENDING), ("month", ASCENDING)], {}),
+        # Multikey: los buckets de un usuario que tienen transacciones de un fondo
+        ([("user_id", ASCENDING), ("transactions.fund_id", ASCENDING)], {}),
+    ],
+    "funds": [
+        ([("fund_id", ASCENDING)], {"unique": True}),
+        ([("category", ASCENDING)], {}),
+    ],
+    "balance_snapshots": [
+        ([("user_id", ASCENDING), ("as_of", ASCENDING)], {"unique": True}),
+    ],
+    "fund_stats_daily": [
+        ([("fund_id", ASCENDING), ("day", ASCENDING)], {}),
+    ],
+}
+
+# Índices sin los que la API no es correcta (no solo más lenta): colección -> nombre
+REQUIRED_INDEXES = {"transactions": ["user_version_unique"]}
+
+pool_checkouts = registry.counter("mongo_pool_checkouts_total", "Conexiones tomadas del pool")
+pool_checkout_failures = registry.counter("mongo_pool_checkout_failures_total", "Fallos al tomar una conexión del pool")
+pool_checkout_wait = registry.summary("mongo_pool_checkout_wait_seconds", "Espera en la cola del pool hasta obtener una conexión")
+pool_checked_out = registry.gauge("mongo_pool_checked_out", "Conexiones en uso")
+pool_connections = registry.gauge("mongo_pool_connections", "Conexiones abiertas")
+pool_cleared = registry.counter("mongo_pool_cleared_total", "Veces que el pool se vació por un error")
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Exporta a /metrics la actividad del pool de conexiones de pymongo."""
+
+    @staticmethod
+    def _address(event) -> str:
+        return "%s:%s" % event.address
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pool_cleared.inc(address=self._address(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_connections.inc(address=self._address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections.dec(address=self._address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool_checkout_failures.inc(address=self._address(event), reason=str(event.reason))
+        if event.duration is not None:
+            pool_checkout_wait.observe(event.duration, address=self._address(event))
+
+    def connection_checked_out(self, event):
+        address = self._address(event)
+        pool_checkouts.inc(address=address)
+        pool_checked_out.inc(address=address)
+        if event.duration is not None:
+            pool_checkout_wait.observe(event.duration, address=address)
+
+    def connection_checked_in(self, event):
+        pool_checked_out.dec(address=self._address(event))
+
+
+def mongo_client_options() -> dict:
+    """
+    Opciones del MongoClient a partir de `settings` (pool, compresión, timeouts
+    y preferencia de lectura). Las opciones en None se dejan con el valor de la
+    cadena de conexión o, si no lo trae, el del driver.
+
+    Returns:
+        dict: Argumentos para `MongoClient`.
+    """
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "connectTimeoutMS": settings.mongo_connect_timeout_ms,
+        "socketTimeoutMS": settings.mongo_socket_timeout_ms,
+        "readPreference": settings.mongo_read_preference,
+        "event_listeners": [PoolMetricsListener()],
+    }
+    if settings.mongo_compressors:
+        options["compressors"] = settings.mongo_compressors
+        if "zlib" in settings.mongo_compressors:
+            options["zlibCompressionLevel"] = settings.mongo_zlib_compression_level
+    return {name: value for name, value in options.items() if value is not None}
+
+
+class ReadRoute(str, Enum):
+    """A qué miembros del replica set se envía una lectura."""
+    # Flujo de suscripción/cancelación: balance y suscripciones al día
+    PRIMARY = "primary"
+    # Catálogo e historial: toleran un retraso acotado
+    SECONDARY = "secondary"
+
+
+_client: MongoClient | None = None
+_db: Database | None = None
+_db_lock = threading.Lock()
+
+# Ventana de read-your-writes cuando las secundarias no tienen un retraso máximo
+DEFAULT_CAUSAL_WINDOW_SECONDS = 300
+
+def causal_window_seconds() -> int:
+    """Segundos que se recuerda el tiempo de clúster de un usuario (siempre positivo)."""
+    if settings.mongo_causal_window_seconds is not None:
+        return settings.mongo_causal_window_seconds
+    if settings.mongo_max_staleness_seconds > 0:
+        return settings.mongo_max_staleness_seconds
+    return DEFAULT_CAUSAL_WINDOW_SECONDS
+
+# Último (clusterTime, operationTime) visto por usuario. Pasado el retraso máximo
+# de las secundarias ya no hace falta esperar a que alcancen esas escrituras
+_causal_times = TTLCache(maxsize=settings.user_cache_size, ttl=causal_window_seconds())
+
 def get_secret():
 
     secret_name = settings.secret_mongo_db
@@ -12,11 +175,13 @@ def get_secret():
     session = boto3.session.Session()
     client = session.client(
         service_name='secretsmanager',
-        region_name=region_name
+        region_name=region_name,
+        config=aws_client_config()
     )
 
     try:
-        get_secret_value_response = client.get_secret_value(
+        get_secret_value_response = get_dependency("secretsmanager").call(
+            client.get_secret_value,
             SecretId=secret_name
         )
     except ClientError as e:
@@ -34,6 +199,139 @@ def get_connection_string():
         return settings.mongo_uri
     else:
         return get_secret()
-# Creaa la conexion a la base de datos MongoDB
-client = MongoClient(get_connection_string())
-db = client[settings.mongo_db]
\ No newline at end of file
+
+def ensure_indexes(database: Database) -> None:
+    """
+    Crea los índices de `INDEXES` (operación idempotente).
+
+    Args:
+        database (Database): La base de datos sobre la que se crean los índices.
+    """
+    for collection_name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            database[collection_name].create_index(keys, **options)
+
+def verify_indexes(database: Database) -> None:
+    """
+    Verifica que existan los índices de `REQUIRED_INDEXES`.
+
+    Args:
+        database (Database): La base de datos a revisar.
+
+    Raises:
+        RuntimeError: Si falta alguno.
+    """
+    missing = [
+        f"{collection_name}.{name}"
+        for collection_name, names in REQUIRED_INDEXES.items()
+        for name in names
+        if name not in database[collection_name].index_information()
+    ]
+    if missing:
+        raise RuntimeError(f"Missing required indexes: {', '.join(missing)}")
+
+def _create_database() -> Database:
+    global _client
+    if settings.env in MEMORY_ENVS:
+        # Import diferido: init_db depende de este módulo
+        from repositories.memory import InMemoryDatabase
+        from init_db import seed_funds
+
+        database = InMemoryDatabase(settings.mongo_db)
+        ensure_indexes(database)
+        seed_funds(database)
+        return database
+
+    # Creaa la conexion a la base de datos MongoDB
+    _client = MongoClient(get_connection_string(), **mongo_client_options())
+    return _client[settings.mongo_db]
+
+def get_db() -> Database:
+    """
+    Obtiene la base de datos del backend configurado por `settings.env`.
+    La conexión se crea en el primer uso y se reutiliza.
+
+    Returns:
+        Database: La base de datos de MongoDB o la base de datos en memoria.
+    """
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = _create_database()
+    return _db
+
+def read_preference(route: ReadRoute):
+    """
+    Preferencia de lectura de pymongo para una ruta.
+
+    Args:
+        route (ReadRoute): La ruta de la lectura.
+
+    Returns:
+        La preferencia de lectura (`Primary` o `SecondaryPreferred` con `maxStalenessSeconds`).
+    """
+    if route == ReadRoute.SECONDARY and settings.mongo_secondary_reads:
+        return SecondaryPreferred(max_staleness=settings.mongo_max_staleness_seconds)
+    return Primary()
+
+def get_collection(name: str, route: ReadRoute = ReadRoute.PRIMARY) -> Collection:
+    """
+    Obtiene una colección que envía sus lecturas según `route`.
+    El backend en memoria ignora la preferencia de lectura.
+
+    Args:
+        name (str): El nombre de la colección.
+        route (ReadRoute): La ruta de las lecturas.
+
+    Returns:
+        Collection: La colección.
+    """
+    return get_db().get_collection(name, read_preference=read_preference(route))
+
+@contextmanager
+def causal_session(user_id: str) -> Iterator[ClientSession | None]:
+    """
+    Sesión con consistencia causal para las operaciones de un usuario.
+
+    La sesión parte del último tiempo de clúster visto para el usuario, así una
+    lectura en una secundaria espera a que esta tenga sus escrituras previas
+    (read-your-writes). Al salir se guarda el tiempo alcanzado por la sesión.
+    El tiempo se guarda por proceso: con varios workers solo se garantiza
+    dentro del mismo worker, y entre workers el límite es `mongo_max_staleness_seconds`.
+
+    Args:
+        user_id (str): El ID del usuario.
+
+    Yields:
+        ClientSession | None: La sesión, o None con el backend en memoria o
+        si la consistencia causal está desactivada.
+    """
+    get_db()
+    if _client is None or not settings.mongo_causal_consistency:
+        yield None
+        return
+
+    with _client.start_session(causal_consistency=True) as session:
+        times = _causal_times.get(user_id)
+        if times is not None:
+            session.advance_cluster_time(times[0])
+            session.advance_operation_time(times[1])
+        yield session
+        if session.operation_time is not None:
+            if times is None or session.operation_time > times[1]:
+                _causal_times.set(user_id, (session.cluster_time, session.operation_time))
+
+def reset_db() -> None:
+    """
+    Cierra la conexión actual; la siguiente llamada a `get_db` crea una nueva.
+    Se usa después de un fork, porque un MongoClient no se puede compartir
+    entre procesos. El backend en memoria no tiene conexión y se conserva.
+    """
+    global _client, _db
+    with _db_lock:
+        if _client is None:
+            return
+        _client.close()
+        _client = None
+        _db = None
@@ -0,0 +1,24 @@
+class DependencyUnavailableError(Exception):
+    """Una dependencia externa (SES, SNS, Cognito, Secrets Manager) no está disponible."""
+
+    def __init__(self, dependency: str, message: str, retry_after: float | None = None):
+        super().__init__(f"{dependency}: {message}")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class VersionConflictError(Exception):
+    """Otra escritura cambió al usuario en cada uno de los intentos de una escritura condicional."""
+
+    def __init__(self, user_id: str, attempts: int):
+        super().__init__(f"User {user_id} changed concurrently {attempts} times; retry the request")
+        self.user_id = user_id
+        self.attempts = attempts
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    """El circuito de la dependencia está abierto: la llamada falla de inmediato."""
+
+
+class BulkheadFullError(DependencyUnavailableError):
+    """Se alcanzó el máximo de llamadas simultáneas a la dependencia."""
@@ -0,0 +1,54 @@
+"""
+Perfil de producción: gunicorn hace pre-fork de N workers de uvicorn.
+
+La aplicación se importa en el proceso maestro antes del fork
+(`preload_app`), de modo que los módulos y el catálogo de fondos ya cargado
+se comparten copy-on-write entre los workers. Cada worker abre su propio
+pool de conexiones a Mongo después del fork.
+
+Uso (desde la carpeta `app`):
+    gunicorn -c gunicorn_conf.py main:app
+
+Recargas:
+    kill -HUP <master>    reinicia los workers de forma ordenada (nueva config, nuevos pools)
+    kill -USR2 <master>   arranca un maestro nuevo con el código nuevo; luego
+                          kill -QUIT <master viejo> cuando el nuevo esté listo
+"""
+import gc
+import multiprocessing
+
+from config import settings
+
+bind = f"0.0.0.0:{settings.port}"
+workers = settings.web_concurrency or multiprocessing.cpu_count()
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+graceful_timeout = settings.graceful_timeout
+timeout = 60
+keepalive = 5
+accesslog = "-"
+
+
+def when_ready(server):
+    # Import diferido: con preload_app la app ya está importada en este punto
+    from db import reset_db
+    from repositories.funds import warm_catalog
+
+    try:
+        server.log.info("Catálogo precargado: %s fondos", warm_catalog())
+    except Exception as e:
+        server.log.warning("No se pudo precargar el catálogo: %s", e)
+    finally:
+        # El cliente de Mongo no se debe compartir entre procesos
+        reset_db()
+
+    # Los objetos creados hasta aquí no los recorre el GC de los workers,
+    # así no se tocan (ni se copian) las páginas compartidas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from db import reset_db
+
+    # Cada worker crea su propio pool de Mongo en el primer uso
+    reset_db()
@@ -0,0 +1,59 @@
+import hashlib
+
+from fastapi import Request, Response
+from config import settings
+from repositories.funds import fetch_catalog_version
+
+async def catalog_etag(resource: str) -> str:
+    """
+    Calcula un ETag fuerte para un recurso del catálogo.
+
+    Args:
+        resource (str): Identificador del recurso (p.ej. "funds", "fund:<id>").
+
+    Returns:
+        str: El ETag entre comillas, listo para la cabecera.
+    """
+    version = await fetch_catalog_version()
+    digest = hashlib.sha1(f"{version}:{resource}".encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def catalog_headers(etag: str) -> dict[str, str]:
+    """Cabeceras de caché que comparten las respuestas del catálogo."""
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.catalog_cache_max_age}",
+    }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Indica si el cliente ya tiene la representación identificada por `etag`.
+
+    "*" coincide con cualquier representación: solo se debe preguntar cuando
+    ya se sabe que el recurso existe.
+
+    Args:
+        request (Request): La petición entrante.
+        etag (str): El ETag actual del recurso.
+
+    Returns:
+        bool: True si `If-None-Match` contiene el ETag (o "*").
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        # If-None-Match usa comparación débil (RFC 9110 13.1.2)
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """Respuesta 304 sin cuerpo para un recurso del catálogo."""
+    return Response(status_code=304, headers=catalog_headers(etag))
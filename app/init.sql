@@ -14,7 +14,7 @@ CREATE TABLE IF NOT EXISTS sucursal (
 CREATE TABLE IF NOT EXISTS producto (
     id INTEGER PRIMARY KEY,
     nombre VARCHAR(100) NOT NULL,
-    tipo_producto VARCHAR(100) NOT NULL,
+    tipo_producto VARCHAR(100) NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS inscripcion (
@@ -1,25 +1,52 @@
+import json
 import os
 from pymongo import MongoClient
 from config import settings
-from db import get_secret
+from db import get_secret, ensure_indexes
+
+# Catálogo inicial de fondos (mismos campos que `FundsOut`). Es la única fuente:
+# viaja en la imagen y `mongo.tf` lo copia al paquete de la lambda que siembra DocumentDB
+DEFAULT_FUNDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "funds.json")
+
+def load_default_funds(path: str | None = None) -> list[dict]:
+    """
+    Lee el catálogo inicial de fondos.
+
+    Args:
+        path (str | None): El archivo JSON; por defecto el configurado o `app/funds.json`.
+
+    Returns:
+        list[dict]: Los fondos.
+    """
+    with open(path or settings.funds_catalog_path or DEFAULT_FUNDS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def seed_funds(db) -> int:
+    """
+    Inserta el catálogo inicial de fondos si la colección está vacía.
+
+    Args:
+        db: La base de datos (MongoDB o en memoria).
+
+    Returns:
+        int: El número de fondos insertados.
+    """
+    funds_collection = db.funds
+    if funds_collection.count_documents({}) > 0:
+        return 0
+    result = funds_collection.insert_many(load_default_funds())
+    return len(result.inserted_ids)
 
 def initialize_funds_collection():
     try:
         secret_string = get_secret()
         client = MongoClient(secret_string)
         db = client[settings.mongo_db]
-        funds_collection = db.funds
+
+        ensure_indexes(db)
 
         # Check if the collection is empty before inserting
-        if funds_collection.count_documents({}) == 0:
-            funds_data = [
-                {"fund_id": 1, "Nombre": "FPV_BTG_PACTUAL_RECAUDADORA", "Monto_minimo": 75000, "Categoria": "FPV"},
-                {"fund_id": 2, "Nombre": "FPV_BTG_PACTUAL_ECOPETROL", "Monto_minimo": 125000, "Categoria": "FPV"},
-                {"fund_id": 3, "Nombre": "DEUDAPRIVADA", "Monto_minimo": 50000, "Categoria": "FIC"},
-                {"fund_id": 4, "Nombre": "FDO-ACCIONES", "Monto_minimo": 250000, "Categoria": "FIC"},
-                {"fund_id": 5, "Nombre": "FPV_BTG_PACTUAL_DINAMICA", "Monto_minimo": 100000, "Categoria": "FPV"}
-            ]
-            funds_collection.insert_many(funds_data)
+        if seed_funds(db):
             print("Funds collection initialized successfully.")
         else:
             print("Funds collection already contains data. Skipping initialization.")
@@ -1,8 +1,37 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers import funds, auth
+from routers import funds, auth, events, reports
+from change_stream import change_hub
+from balance_compactor import balance_compactor
+from config import settings
+from db import ensure_indexes, get_db, verify_indexes
+from repositories.funds import get_catalog_version
+from responses import FastJSONResponse
+from middleware.compression import CompressionMiddleware
+from metrics import registry
+from exceptions import DependencyUnavailableError, VersionConflictError
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Las escrituras de balance dependen del índice único de `user_version`:
+    # sin él el worker no arranca en lugar de aceptar escrituras incorrectas
+    database = await asyncio.to_thread(get_db)
+    await asyncio.to_thread(ensure_indexes, database)
+    await asyncio.to_thread(verify_indexes, database)
+    # La primera versión del catálogo lee todos los fondos: mejor antes de
+    # aceptar peticiones que dentro de la primera de ellas
+    await asyncio.to_thread(get_catalog_version)
+    yield
+    # Entregar las notificaciones que siguen en la ventana de agrupación
+    funds.notification_coalescer.flush()
+    change_hub.stop()
+    balance_compactor.stop()
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Permisos de CORS
 app.add_middleware(
@@ -13,10 +42,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión gzip / brotli negociada con Accept-Encoding
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality,
+)
+
+@app.exception_handler(DependencyUnavailableError)
+async def dependency_unavailable_handler(request: Request, exc: DependencyUnavailableError):
+    # Falla rápido con 503 cuando el circuito está abierto o el bulkhead lleno
+    headers = {"Retry-After": str(int(exc.retry_after) + 1)} if exc.retry_after is not None else None
+    return FastJSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
+@app.exception_handler(VersionConflictError)
+async def version_conflict_handler(request: Request, exc: VersionConflictError):
+    # Contención sostenida sobre la misma cuenta: el cliente puede reintentar enseguida
+    return FastJSONResponse(status_code=409, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return registry.render()
+
 # Se corrigen las llamadas para incluir los routers
 app.include_router(funds.router)
-app.include_router(auth.router)
\ No newline at end of file
+app.include_router(auth.router)
+app.include_router(events.router)
+app.include_router(reports.router)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional, sin él solo se negocia gzip
+    brotli = None
+
+# Tipos de contenido que no vale la pena comprimir o que son streams
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "audio/")
+
+
+def select_encoding(accept_encoding: str) -> str | None:
+    """
+    Selecciona la codificación a usar a partir de la cabecera `Accept-Encoding`.
+
+    Args:
+        accept_encoding (str): El valor de la cabecera enviada por el cliente.
+
+    Returns:
+        str | None: "br", "gzip" o None si no se debe comprimir.
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token] = quality
+
+    wildcard = weights.get("*")
+    best, best_quality = None, 0.0
+    # El orden de `supported` define la preferencia del servidor en caso de empate
+    for encoding in supported:
+        quality = weights.get(encoding, wildcard if wildcard is not None else 0.0)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime con brotli o gzip las respuestas que superan
+    `minimum_size`. Las respuestas en streaming se envían sin comprimir.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.initial_message: Message | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Se retiene el inicio hasta saber si el cuerpo se va a comprimir
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES)
+            )
+            return
+
+        if message["type"] != "http.response.body" or self.initial_message is None:
+            await self._send(message)
+            return
+
+        initial_message, self.initial_message = self.initial_message, None
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough or more_body:
+            await self._send(initial_message)
+            await self._send(message)
+            return
+
+        headers = MutableHeaders(raw=initial_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if len(body) >= self.middleware.minimum_size:
+            body = self.middleware.compress(body, self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(body))
+            # El cuerpo codificado ya no es idéntico byte a byte: el ETag pasa a ser débil
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            message = {**message, "body": body}
+
+        await self._send(initial_message)
+        await self._send(message)
@@ -0,0 +1,193 @@
+import re
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from html import escape
+from string import Template
+
+from botocore.exceptions import ClientError
+from config import settings
+
+
+class NotificationEvent(str, Enum):
+    """Eventos que generan una notificación al usuario."""
+    SUBSCRIBE = "subscribe"
+    CANCEL = "cancel"
+    INSUFFICIENT_FUNDS = "insufficient_funds"
+    DIGEST = "digest"
+
+
+@dataclass(frozen=True)
+class RenderedNotification:
+    subject: str
+    text: str
+    html: str
+
+
+# `$var` / `${var}` -> `{{var}}` (sintaxis de las plantillas de SES)
+_PLACEHOLDER = re.compile(r"\$(?:\{(\w+)\}|(\w+))")
+
+
+def _to_ses_syntax(source: str) -> str:
+    return _PLACEHOLDER.sub(lambda m: "{{" + (m.group(1) or m.group(2)) + "}}", source)
+
+
+@dataclass(frozen=True)
+class NotificationTemplate:
+    """Plantilla compilada de un evento en un idioma."""
+    event: NotificationEvent
+    locale: str
+    subject: Template
+    text: Template
+    html: Template
+
+    @property
+    def ses_name(self) -> str:
+        """Nombre con el que la plantilla se registra en SES."""
+        return f"amaris-{self.event.value.replace('_', '-')}-{self.locale}"
+
+    def to_ses(self) -> dict:
+        return {
+            "TemplateName": self.ses_name,
+            "SubjectPart": _to_ses_syntax(self.subject.template),
+            "TextPart": _to_ses_syntax(self.text.template),
+            "HtmlPart": _to_ses_syntax(self.html.template),
+        }
+
+
+HTML_LAYOUT = """
+    <html>
+    <head></head>
+    <body>
+    <h1>${greeting}</h1>
+    <p>${body}</p>
+    </body>
+    </html>
+"""
+
+GREETINGS = {"en": "Hello!", "es": "¡Hola!"}
+
+
+class TemplateRegistry:
+    """
+    Registro de plantillas de notificación por (evento, idioma).
+
+    Las plantillas se compilan una vez al registrarse y los textos
+    renderizados se guardan en caché por (evento, idioma, variables).
+    """
+
+    def __init__(self, default_locale: str = "en"):
+        self.default_locale = default_locale
+        self._templates: dict[tuple[NotificationEvent, str], NotificationTemplate] = {}
+        self._render = lru_cache(maxsize=4096)(self._render_uncached)
+
+    def register(self, event: NotificationEvent, locale: str, subject: str, text: str) -> NotificationTemplate:
+        """
+        Compila y registra la plantilla de un evento.
+
+        Args:
+            event (NotificationEvent): El evento.
+            locale (str): El idioma ("en", "es", ...).
+            subject (str): El asunto, con variables `${nombre}`.
+            text (str): El cuerpo en texto plano, con variables `${nombre}`.
+
+        Returns:
+            NotificationTemplate: La plantilla compilada.
+        """
+        html = Template(HTML_LAYOUT).safe_substitute(greeting=GREETINGS.get(locale, GREETINGS["en"]), body=text)
+        template = NotificationTemplate(event, locale, Template(subject), Template(text), Template(html))
+        self._templates[(event, locale)] = template
+        self._render.cache_clear()
+        return template
+
+    def get(self, event: NotificationEvent, locale: str | None = None) -> NotificationTemplate:
+        """Obtiene la plantilla del idioma pedido o, si no existe, la del idioma por defecto."""
+        template = self._templates.get((event, locale or self.default_locale))
+        if template is None:
+            template = self._templates[(event, self.default_locale)]
+        return template
+
+    def _render_uncached(self, event: NotificationEvent, locale: str, variables: tuple) -> RenderedNotification:
+        template = self.get(event, locale)
+        values = dict(variables)
+        return RenderedNotification(
+            subject=template.subject.substitute(values),
+            text=template.text.substitute(values),
+            # Las variables (p.ej. el nombre del fondo) se escapan en el HTML; SES ya lo hace con `{{var}}`
+            html=template.html.substitute({name: escape(value) for name, value in values.items()}),
+        )
+
+    def render(self, event: NotificationEvent, locale: str | None = None, **variables) -> RenderedNotification:
+        """
+        Renderiza una notificación (con caché para entradas idénticas).
+
+        Args:
+            event (NotificationEvent): El evento.
+            locale (str | None): El idioma; por defecto `default_locale`.
+            **variables: Los valores de las variables de la plantilla.
+
+        Returns:
+            RenderedNotification: Asunto, texto y HTML renderizados.
+        """
+        key = tuple(sorted((name, str(value)) for name, value in variables.items()))
+        return self._render(event, locale or self.default_locale, key)
+
+    def register_with_ses(self, ses_client) -> None:
+        """
+        Crea o actualiza en SES todas las plantillas registradas, para que los
+        envíos solo lleven las variables.
+
+        Args:
+            ses_client: Cliente de boto3 para SES.
+        """
+        for template in self._templates.values():
+            try:
+                ses_client.create_template(Template=template.to_ses())
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "AlreadyExists":
+                    raise
+                ses_client.update_template(Template=template.to_ses())
+
+
+templates = TemplateRegistry(default_locale=settings.notification_locale)
+
+templates.register(
+    NotificationEvent.SUBSCRIBE, "en",
+    subject="Subscription Successful",
+    text="You have successfully subscribed to the fund '${fund_name}' with an amount of ${amount}.",
+)
+templates.register(
+    NotificationEvent.SUBSCRIBE, "es",
+    subject="Suscripción exitosa",
+    text="Se ha vinculado exitosamente al fondo '${fund_name}' con un monto de ${amount}.",
+)
+templates.register(
+    NotificationEvent.CANCEL, "en",
+    subject="Cancellation Successful",
+    text="Your subscription to the fund '${fund_name}' was cancelled. ${amount} was returned to your balance.",
+)
+templates.register(
+    NotificationEvent.CANCEL, "es",
+    subject="Cancelación exitosa",
+    text="Su vinculación al fondo '${fund_name}' fue cancelada. Se devolvieron ${amount} a su saldo.",
+)
+templates.register(
+    NotificationEvent.INSUFFICIENT_FUNDS, "en",
+    subject="Insufficient Funds",
+    text="You do not have enough balance to subscribe to the fund '${fund_name}'.",
+)
+templates.register(
+    NotificationEvent.INSUFFICIENT_FUNDS, "es",
+    subject="Saldo insuficiente",
+    text="No tiene saldo disponible para vincularse al fondo ${fund_name}.",
+)
+templates.register(
+    NotificationEvent.DIGEST, "en",
+    subject="You have ${count} new notifications",
+    text="${items}",
+)
+templates.register(
+    NotificationEvent.DIGEST, "es",
+    subject="Tiene ${count} notificaciones nuevas",
+    text="${items}",
+)
@@ -1,89 +1,391 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Hashable, Optional
+from cache import TTLCache
 from config import settings
+from metrics import registry
+from notification_templates import TemplateRegistry
+from resilience import aws_client_config, get_dependency
 
 import boto3
 from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
+
+# Cuerpo HTML de los correos; se arma una sola vez por proceso
+EMAIL_HTML_TEMPLATE = """
+    <html>
+    <head></head>
+    <body>
+    <h1>Hello!</h1>
+    <p>{body}</p>
+    </body>
+    </html>
+"""
+
+# Plantilla equivalente registrada en SES para los envíos masivos
+BULK_TEMPLATE_NAME = "amaris-notification"
+BULK_TEMPLATE_HTML = EMAIL_HTML_TEMPLATE.replace("{body}", "{{body}}")
+
+# Límite de destinos por llamada a SendBulkTemplatedEmail
+SES_BULK_MAX_DESTINATIONS = 50
+
+notifications_sent = registry.counter("notifications_sent_total", "Mensajes entregados al proveedor")
+notifications_failed = registry.counter("notifications_failed_total", "Mensajes rechazados por el proveedor")
+notifications_calls = registry.counter("notifications_provider_calls_total", "Llamadas al API del proveedor")
+notifications_latency = registry.summary("notifications_provider_call_seconds", "Duración de las llamadas al proveedor")
+notifications_inflight = registry.gauge("notifications_inflight", "Llamadas al proveedor en curso")
+notifications_deduplicated = registry.counter("notifications_deduplicated_total", "Mensajes duplicados descartados")
+notifications_coalesced = registry.counter("notifications_coalesced_total", "Mensajes fusionados en un resumen")
+notifications_errors = registry.counter("notifications_errors_total", "Errores al entregar notificaciones por origen (ses, sns o coalescer)")
+
 
 @dataclass
 class Message:
     subject: str
     body: str
     recipient: str
+    # Plantilla registrada en SES y sus variables; si no hay, se usa la genérica
+    template: Optional[str] = None
+    template_data: Optional[dict] = None
 
-class Notifier:
-    """Contrato para proveedores de notificación."""
-    def send(self, message: Message, email: Optional[str], phone: Optional[str]) -> bool:
-        raise NotImplementedError
-    
-class EmailNotifier(Notifier):
-    """Implementación de Notifier para enviar correos electrónicos usando AWS SES."""
-    def __init__ (self):
-        super().__init__()
-        self.client = boto3.client('ses', region_name=settings.region)
-    
-    def send(self, message: Message, email: str) -> bool:
-
-        sender_email = settings.ses_sender
-        subject = message.subject
-        body = message.body
-        body_html = f"""
-            <html>
-            <head></head>
-            <body>
-            <h1>Hello!</h1>
-            <p>{body}</p>
-            </body>
-            </html>
-        """
+@dataclass
+class DeliveryReport:
+    """Resultado de un envío masivo por proveedor."""
+    provider: str
+    sent: int = 0
+    failed: int = 0
+    calls: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Mensajes entregados por segundo."""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+class DeliveryEngine:
+    """
+    Motor de entrega de notificaciones.
+
+    Los correos se agrupan en llamadas a `SendBulkTemplatedEmail` (hasta 50
+    destinos cada una) y los SMS se publican en paralelo. Cada proveedor tiene
+    su propio pool de hilos, cuyo tamaño es el límite de concurrencia, y un
+    cliente de boto3 con el mismo número de conexiones HTTP.
+    """
+
+    def __init__(
+        self,
+        ses_concurrency: int = 4,
+        sns_concurrency: int = 10,
+        templates: TemplateRegistry | None = None,
+    ):
+        self.templates = templates
+        self.ses = boto3.client(
+            "ses", region_name=settings.region,
+            config=aws_client_config(max_pool_connections=ses_concurrency),
+        )
+        self.sns = boto3.client(
+            "sns", region_name=settings.region,
+            config=aws_client_config(max_pool_connections=sns_concurrency),
+        )
+        self._pools = {
+            "ses": ThreadPoolExecutor(max_workers=ses_concurrency, thread_name_prefix="ses"),
+            "sns": ThreadPoolExecutor(max_workers=sns_concurrency, thread_name_prefix="sns"),
+        }
+        self._template_ready = False
+
+    def ensure_template(self) -> None:
+        """Registra en SES la plantilla genérica y las del registro si aún no existen."""
+        if self._template_ready:
+            return
+        if self.templates is not None:
+            self.templates.register_with_ses(self.ses)
         try:
-            response = self.client.send_email(
-                Source=sender_email,
-                Destination={
-                    'ToAddresses': [
-                        email,
-                    ],
-                },
-                Message={
-                    'Subject': {
-                        'Data': subject,
-                        'Charset': 'UTF-8'
-                    },
-                    'Body': {
-                        'Text': {
-                            'Data': body,
-                            'Charset': 'UTF-8'
-                        },
-                        'Html': {
-                            'Data': body_html,
-                            'Charset': 'UTF-8'
-                        }
+            self.ses.create_template(Template={
+                "TemplateName": BULK_TEMPLATE_NAME,
+                "SubjectPart": "{{subject}}",
+                "TextPart": "{{body}}",
+                "HtmlPart": BULK_TEMPLATE_HTML,
+            })
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "AlreadyExists":
+                raise
+        self._template_ready = True
+
+    def _call(self, provider: str, fn, **kwargs) -> dict:
+        notifications_inflight.inc(provider=provider)
+        start = time.perf_counter()
+        try:
+            return get_dependency(provider).call(fn, **kwargs)
+        finally:
+            notifications_inflight.dec(provider=provider)
+            notifications_calls.inc(provider=provider)
+            notifications_latency.observe(time.perf_counter() - start, provider=provider)
+
+    @staticmethod
+    def _template_data(message: Message) -> str:
+        if message.template:
+            return json.dumps(message.template_data or {})
+        return json.dumps({"subject": message.subject, "body": message.body})
+
+    def _send_email_batch(self, batch: list[Message]) -> tuple[int, int]:
+        # Todos los mensajes de un lote comparten plantilla (ver send_emails)
+        template = batch[0].template or BULK_TEMPLATE_NAME
+        try:
+            self.ensure_template()
+            response = self._call(
+                "ses", self.ses.send_bulk_templated_email,
+                Source=settings.ses_sender,
+                Template=template,
+                DefaultTemplateData=self._template_data(batch[0]),
+                Destinations=[
+                    {
+                        "Destination": {"ToAddresses": [message.recipient]},
+                        "ReplacementTemplateData": self._template_data(message),
                     }
-                }
+                    for message in batch
+                ],
             )
         except Exception as e:
-            print(f"Error sending email: {e}")
-            return False
-        print(f"Email sent! Message ID: {response['MessageId']}")
-        return True
+            notifications_errors.inc(source="ses", error=type(e).__name__)
+            logger.warning("Error sending bulk email: %s", e)
+            return self._count("ses", 0, len(batch))
+        sent = sum(1 for status in response["Status"] if status["Status"] == "Success")
+        return self._count("ses", sent, len(batch) - sent)
+
+    def _send_sms(self, message: Message) -> tuple[int, int]:
+        try:
+            self._call("sns", self.sns.publish, PhoneNumber=message.recipient, Message=message.body)
+        except Exception as e:
+            notifications_errors.inc(source="sns", error=type(e).__name__)
+            logger.warning("Error sending SMS: %s", e)
+            return self._count("sns", 0, 1)
+        return self._count("sns", 1, 0)
+
+    @staticmethod
+    def _count(provider: str, sent: int, failed: int) -> tuple[int, int]:
+        notifications_sent.inc(sent, provider=provider)
+        notifications_failed.inc(failed, provider=provider)
+        return sent, failed
+
+    @staticmethod
+    def _collect(provider: str, futures: list[Future], start: float) -> DeliveryReport:
+        report = DeliveryReport(provider=provider, calls=len(futures))
+        for future in futures:
+            sent, failed = future.result()
+            report.sent += sent
+            report.failed += failed
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def send_emails(self, messages: list[Message]) -> DeliveryReport:
+        """
+        Envía correos agrupados por plantilla en llamadas masivas a SES.
+
+        Args:
+            messages (list[Message]): Los mensajes; `recipient` es el correo.
+
+        Returns:
+            DeliveryReport: Conteo de enviados, fallidos y tiempo total.
+        """
+        start = time.perf_counter()
+        by_template: dict[str | None, list[Message]] = {}
+        for message in messages:
+            by_template.setdefault(message.template, []).append(message)
+        futures = [
+            self._pools["ses"].submit(self._send_email_batch, group[i:i + SES_BULK_MAX_DESTINATIONS])
+            for group in by_template.values()
+            for i in range(0, len(group), SES_BULK_MAX_DESTINATIONS)
+        ]
+        return self._collect("ses", futures, start)
 
+    def send_sms(self, messages: list[Message]) -> DeliveryReport:
+        """
+        Publica SMS en paralelo a través de SNS.
+
+        Args:
+            messages (list[Message]): Los mensajes; `recipient` es el teléfono.
+
+        Returns:
+            DeliveryReport: Conteo de enviados, fallidos y tiempo total.
+        """
+        start = time.perf_counter()
+        futures = [self._pools["sns"].submit(self._send_sms, message) for message in messages]
+        return self._collect("sns", futures, start)
 
-class SMSNotifier(Notifier):
-    def __init__ (self):
-        super().__init__()
-        self.client = boto3.client('sns', region_name=settings.region)
-    """Implementación de Notifier para enviar SMS usando AWS SNS."""""
-    def send(self, message: Message, phone: str) -> bool:
-        print("Sending SMS to", phone)
-        print("Message:", message.body)
+    def submit(self, message: Message, channel: str) -> Future:
+        """
+        Encola un mensaje individual sin bloquear al llamador.
+
+        Args:
+            message (Message): El mensaje a enviar.
+            channel (str): "email" o "sms".
+
+        Returns:
+            Future: Se resuelve con la tupla (enviados, fallidos).
+        """
+        if channel == "email":
+            return self._pools["ses"].submit(self._send_email_batch, [message])
+        return self._pools["sns"].submit(self._send_sms, message)
+
+    def shutdown(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+
+
+def default_digest(messages: list[Message]) -> Message:
+    """Resumen por defecto: el asunto del primero y los cuerpos uno por línea."""
+    return Message(
+        subject=f"{messages[0].subject} (+{len(messages) - 1})",
+        body="\n".join(message.body for message in messages),
+        recipient=messages[0].recipient,
+    )
+
+
+def content_key(key: Hashable, message: Message) -> str:
+    """Huella de un mensaje: su llave de agrupación (usuario, evento) y su contenido."""
+    return hashlib.sha1(repr((key, message.subject, message.body)).encode("utf-8")).hexdigest()
+
+
+def _delivered(result: object) -> bool:
+    # `DeliveryEngine.submit` resuelve con (enviados, fallidos)
+    return not (isinstance(result, tuple) and len(result) == 2 and result[1])
+
+
+class NotificationCoalescer:
+    """
+    Etapa previa a la entrega que reduce las llamadas al proveedor.
+
+    - Descarta los reenvíos de un mismo evento: los mensajes con un `dedup_key`
+      (p.ej. el id de la transacción) ya entregado en los últimos `dedup_ttl`
+      segundos, o en camino. Un evento cuenta como entregado solo cuando el
+      proveedor lo acepta, así que tras un fallo se puede volver a enviar.
+      Sin `dedup_key` la identidad es el contenido: la llave (usuario, evento)
+      y el asunto y cuerpo del mensaje.
+    - Agrupa los mensajes con la misma llave (usuario, evento) que llegan dentro
+      de `window` segundos y los entrega como un único resumen.
+
+    Args:
+        deliver (Callable): Función que entrega un mensaje: `deliver(message, channel)`.
+            Puede devolver un `Future`; si resuelve con (enviados, fallidos), algún
+            fallido cuenta como no entregado.
+        window (float): Ventana de agrupación en segundos (0 = entrega inmediata).
+        dedup_ttl (float): Segundos que se recuerda un evento ya entregado.
+        digest (Callable): Construye el mensaje resumen a partir de los agrupados.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[Message, str], object],
+        window: float = 2.0,
+        dedup_ttl: float = 300.0,
+        digest: Callable[[list[Message]], Message] = default_digest,
+        max_tracked: int = 100_000,
+    ):
+        self.deliver = deliver
+        self.window = window
+        self.digest = digest
+        self._seen = TTLCache(maxsize=max_tracked, ttl=dedup_ttl)
+        self._inflight: set[Hashable] = set()
+        self._pending: dict[Hashable, tuple[float, str, list[Message], list[Hashable]]] = {}
+        self._cond = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+    def submit(self, key: Hashable, message: Message, channel: str, dedup_key: Hashable | None = None) -> bool:
+        """
+        Recibe un mensaje para entregar.
+
+        Args:
+            key (Hashable): Llave de agrupación, p.ej. (id de usuario, evento).
+            message (Message): El mensaje.
+            channel (str): "email" o "sms".
+            dedup_key (Hashable | None): Identidad del evento que notifica (p.ej. el
+                id de la transacción); con None se usa `content_key`.
+
+        Returns:
+            bool: False si el mensaje se descartó por ser un reenvío del mismo evento.
+        """
+        if dedup_key is None:
+            dedup_key = content_key(key, message)
+        dedup_keys = [(channel, dedup_key)]
+        with self._cond:
+            if dedup_keys[0] in self._inflight or self._seen.get(dedup_keys[0]) is not None:
+                notifications_deduplicated.inc(channel=channel)
+                return False
+            self._inflight.update(dedup_keys)
+
+            if self.window > 0:
+                pending = self._pending.get((key, channel))
+                if pending is None:
+                    self._pending[(key, channel)] = (time.monotonic() + self.window, channel, [message], dedup_keys)
+                    self._ensure_worker()
+                    self._cond.notify()
+                else:
+                    pending[2].append(message)
+                    pending[3].extend(dedup_keys)
+                    notifications_coalesced.inc(channel=channel)
+                return True
+        self._deliver(message, channel, dedup_keys)
+        return True
+
+    def _deliver(self, message: Message, channel: str, dedup_keys: list[Hashable]) -> None:
         try:
-            response = self.client.publish(
-                PhoneNumber=phone, Message=message.body
-            )
-            message_id = response["MessageId"]
-        except ClientError:
-            print("Error sending SMS")
+            result = self.deliver(message, channel)
+        except Exception:
+            self._settle(dedup_keys, False)
             raise
+        if isinstance(result, Future):
+            result.add_done_callback(
+                lambda future: self._settle(dedup_keys, future.exception() is None and _delivered(future.result()))
+            )
         else:
-            return message_id
\ No newline at end of file
+            self._settle(dedup_keys, _delivered(result))
+
+    def _settle(self, dedup_keys: list[Hashable], delivered: bool) -> None:
+        # Solo lo entregado se recuerda; lo fallido se puede volver a enviar
+        with self._cond:
+            for dedup_key in dedup_keys:
+                self._inflight.discard(dedup_key)
+                if delivered:
+                    self._seen.set(dedup_key, True)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="notification-coalescer", daemon=True)
+            self._worker.start()
+
+    def _take_due(self, force: bool = False) -> list[tuple[str, list[Message], list[Hashable]]]:
+        now = time.monotonic()
+        due = [k for k, (deadline, _, _, _) in self._pending.items() if force or deadline <= now]
+        return [self._pending.pop(k)[1:] for k in due]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                next_deadline = min(deadline for deadline, _, _, _ in self._pending.values())
+                self._cond.wait(timeout=max(0.0, next_deadline - time.monotonic()))
+                batches = self._take_due()
+            self._flush(batches)
+
+    def _flush(self, batches: list[tuple[str, list[Message], list[Hashable]]]) -> None:
+        for channel, messages, dedup_keys in batches:
+            message = messages[0] if len(messages) == 1 else self.digest(messages)
+            try:
+                self._deliver(message, channel, dedup_keys)
+            except Exception as e:
+                notifications_errors.inc(source="coalescer", error=type(e).__name__)
+                logger.exception("Error delivering notification")
+
+    def flush(self) -> None:
+        """Entrega de inmediato todo lo pendiente (p.ej. al apagar el proceso)."""
+        with self._cond:
+            batches = self._take_due(force=True)
+        self._flush(batches)
@@ -0,0 +1,181 @@
+"""
+Recalcula `fund_stats` y `fund_stats_daily` desde el ledger de transacciones.
+
+El espacio de `_id` de `transactions` se parte en rangos contiguos de
+ObjectId (el índice de `_id` resuelve cada rango) y cada rango se agrega en
+paralelo con un `$group` por fondo, día y tipo. Las transacciones archivadas
+(`transactions_archive`) se agregan en una tarea más con `$unwind`. Los
+parciales se suman en el proceso y se escriben con upserts; los buckets que ya
+no corresponden a ninguna transacción se borran.
+
+Las escrituras que lleguen mientras corre pueden quedar contadas dos veces o
+ninguna: se debe correr con la API detenida o justo después de una carga
+masiva.
+
+Uso (desde la carpeta `app`):
+    python rebuild_fund_stats.py --workers 8 --partitions 32
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from db import ensure_indexes, get_db
+from repositories.backend import Collection, Database
+from repositories.fund_stats import DAILY_COLLECTION, STATS_COLLECTION, daily_id, flow_fields
+from repositories.transactions import ARCHIVE_COLLECTION
+
+# Clave de cada grupo parcial: (fondo, día, tipo) -> [transacciones, monto, última fecha]
+GroupKey = tuple[str, str, str]
+
+
+def id_ranges(collection: Collection, partitions: int) -> list[tuple[ObjectId, ObjectId | None]]:
+    """
+    Parte el rango de `_id` de la colección en `partitions` intervalos [inicio, fin).
+
+    Returns:
+        list[tuple[ObjectId, ObjectId | None]]: Los intervalos; el último no tiene fin.
+    """
+    first = collection.find_one({}, {"_id": 1}, sort=[("_id", 1)])
+    last = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    if first is None:
+        return []
+    low, high = int(str(first["_id"]), 16), int(str(last["_id"]), 16) + 1
+    step = max(1, -(-(high - low) // partitions))
+    bounds = [ObjectId(f"{value:024x}") for value in range(low, high, step)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def _group_stage(prefix: str = "$") -> dict:
+    # Agrupa por fondo, día UTC y tipo de transacción; `prefix` apunta a la transacción
+    return {"$group": {
+        "_id": {
+            "fund_id": f"{prefix}fund_id",
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": f"{prefix}timestamp"}},
+            "type": f"{prefix}transaction_type",
+        },
+        "count": {"$sum": 1},
+        "amount": {"$sum": f"{prefix}amount"},
+        "last": {"$max": f"{prefix}timestamp"},
+    }}
+
+
+def aggregate_range(collection: Collection, start: ObjectId, end: ObjectId | None) -> dict[GroupKey, list]:
+    """Agrega un rango de `_id` del tier caliente por fondo, día UTC y tipo de transacción."""
+    id_filter = {"$gte": start} if end is None else {"$gte": start, "$lt": end}
+    return _collect(collection, [{"$match": {"_id": id_filter}}, _group_stage()])
+
+
+def aggregate_archive(collection: Collection) -> dict[GroupKey, list]:
+    """Agrega las transacciones archivadas (tier frío) igual que `aggregate_range`."""
+    return _collect(collection, [{"$unwind": "$transactions"}, _group_stage("$transactions.")])
+
+
+def _collect(collection: Collection, pipeline: list[dict]) -> dict[GroupKey, list]:
+    return {
+        (group["_id"]["fund_id"], group["_id"]["day"], group["_id"]["type"]): [group["count"], group["amount"], group["last"]]
+        for group in collection.aggregate(pipeline, allowDiskUse=True)
+    }
+
+
+def merge(partials: list[dict[GroupKey, list]]) -> dict[GroupKey, list]:
+    merged: dict[GroupKey, list] = {}
+    for partial in partials:
+        for key, (count, amount, last) in partial.items():
+            current = merged.setdefault(key, [0, 0, last])
+            current[0] += count
+            current[1] += amount
+            current[2] = max(current[2], last)
+    return merged
+
+
+def build_documents(groups: dict[GroupKey, list]) -> tuple[dict[str, dict], dict[str, dict]]:
+    """
+    Arma los documentos de totales por fondo y de buckets diarios.
+
+    Returns:
+        tuple: (totales por `_id`, buckets por `_id`).
+    """
+    totals: dict[str, dict] = {}
+    daily: dict[str, dict] = {}
+    for (fund_id, day, transaction_type), (count, amount, last) in groups.items():
+        fields = flow_fields(transaction_type, count, amount)
+        fund = totals.setdefault(fund_id, {
+            "_id": fund_id, "fund_id": fund_id, "aum": 0, "active_subscribers": 0, "subscriptions": 0,
+            "cancellations": 0, "subscribed_amount": 0, "cancelled_amount": 0, "last_transaction_at": last,
+        })
+        for field, value in fields.items():
+            fund[field] += value
+        fund["last_transaction_at"] = max(fund["last_transaction_at"], last)
+
+        bucket = daily.setdefault(daily_id(fund_id, day), {
+            "_id": daily_id(fund_id, day), "fund_id": fund_id, "day": day, "subscriptions": 0,
+            "cancellations": 0, "subscribed_amount": 0, "cancelled_amount": 0, "net_flow": 0,
+        })
+        for field, value in fields.items():
+            if field == "aum":
+                bucket["net_flow"] += value
+            elif field != "active_subscribers":
+                bucket[field] += value
+    return totals, daily
+
+
+def _replace_all(collection: Collection, documents: dict[str, dict]) -> int:
+    for document in documents.values():
+        collection.replace_one({"_id": document["_id"]}, document, upsert=True)
+    stale = collection.delete_many({"_id": {"$nin": list(documents)}})
+    return stale.deleted_count
+
+
+def rebuild(database: Database, workers: int = 4, partitions: int | None = None) -> dict:
+    """
+    Recalcula las estadísticas de todos los fondos.
+
+    Args:
+        database (Database): La base de datos (MongoDB o en memoria).
+        workers (int): Agregaciones concurrentes.
+        partitions (int | None): Rangos de `_id`; por defecto cuatro por worker.
+
+    Returns:
+        dict: Resumen con los conteos y los tiempos.
+    """
+    started = time.perf_counter()
+    ensure_indexes(database)
+    transactions = database["transactions"]
+    ranges = id_ranges(transactions, partitions or workers * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        archived = pool.submit(aggregate_archive, database[ARCHIVE_COLLECTION])
+        partials = list(pool.map(lambda bounds: aggregate_range(transactions, *bounds), ranges))
+        partials.append(archived.result())
+    groups = merge(partials)
+    aggregate_seconds = time.perf_counter() - started
+
+    totals, daily = build_documents(groups)
+    stale_funds = _replace_all(database[STATS_COLLECTION], totals)
+    stale_days = _replace_all(database[DAILY_COLLECTION], daily)
+    return {
+        "rebuilt_at": datetime.now(timezone.utc).isoformat(),
+        "partitions": len(ranges),
+        "workers": workers,
+        "transactions": sum(count for count, _, _ in groups.values()),
+        "funds": len(totals),
+        "daily_buckets": len(daily),
+        "stale_removed": stale_funds + stale_days,
+        "aggregate_seconds": round(aggregate_seconds, 2),
+        "total_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recalcula las estadísticas de los fondos desde las transacciones.")
+    parser.add_argument("--workers", type=int, default=4, help="Agregaciones concurrentes")
+    parser.add_argument("--partitions", type=int, help="Rangos de _id (por defecto 4 por worker)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(rebuild(get_db(), workers=args.workers, partitions=args.partitions), indent=2))
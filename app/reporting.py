@@ -0,0 +1,325 @@
+"""
+Reportes sobre el esquema relacional de sucursales y productos (`init.sql`).
+
+El esquema se carga en un SQLite embebido con índices secundarios sobre las
+llaves de los joins, además de las llaves primarias del esquema:
+
+- `inscripcion (id_cliente, id_producto)`: la PK empieza por el producto, así
+  que sin este índice buscar las inscripciones de un cliente recorre la tabla.
+- `disponibilidad (id_producto, id_sucursal)`: la PK empieza por la sucursal.
+- `visitan (id_sucursal)`: la PK `(id_cliente, id_sucursal)` sirve para el
+  join; este índice evita recorrer la tabla en los borrados en cascada.
+
+La consulta de `query.sql` se resuelve como semi-join (`EXISTS`): cada cliente
+aparece una vez aunque cumpla con varios productos o sucursales, y SQLite deja
+de buscar en la primera coincidencia.
+
+El reporte se sirve desde un índice de join materializado
+(`cliente_producto_sucursal`): el resultado del join de las tres tablas, es
+decir, las ternas (cliente, producto, sucursal) en las que el cliente está
+inscrito en un producto disponible en una sucursal que visita. Se guarda la
+sucursal (y no solo el par cliente-producto) para que un borrado quite
+exactamente las ternas que dependían de la fila borrada, sin recalcular.
+
+Triggers sobre `inscripcion`, `visitan` y `disponibilidad` mantienen la tabla
+en la misma transacción que cada cambio: un insert agrega las ternas nuevas
+buscando por índice en las otras dos tablas, y un delete borra por prefijo.
+Con eso el reporte es un recorrido del índice de los clientes elegibles, con
+latencia independiente del volumen de visitas. `--verify` compara la tabla
+contra el recálculo completo del join.
+
+El esquema (`init.sql`) vive en esta carpeta para que viaje en la imagen de
+Docker. La base (`REPORTING_DB_PATH`) arranca vacía: los datos se cargan con
+`--load`, desde un script SQL con los `INSERT` o desde una carpeta con un CSV
+por tabla (`cliente.csv`, `sucursal.csv`, `producto.csv`, `inscripcion.csv`,
+`disponibilidad.csv`, `visitan.csv`, con encabezados). Los triggers mantienen
+el índice de join durante la carga. En el contenedor:
+    docker exec <contenedor> python reporting.py --load /ruta/datos.sql
+
+Uso (desde la carpeta `app`):
+    python reporting.py [--load RUTA] [--exists] [--verify] [--rebuild-join-index]
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from config import settings
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "init.sql")
+
+# Tablas de `init.sql` en orden de carga (las referenciadas primero)
+TABLES = ("cliente", "sucursal", "producto", "inscripcion", "disponibilidad", "visitan")
+
+SECONDARY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS inscripcion_cliente_producto ON inscripcion (id_cliente, id_producto)",
+    "CREATE INDEX IF NOT EXISTS disponibilidad_producto_sucursal ON disponibilidad (id_producto, id_sucursal)",
+    "CREATE INDEX IF NOT EXISTS visitan_sucursal ON visitan (id_sucursal)",
+)
+
+JOIN_INDEX_TABLE = """
+CREATE TABLE IF NOT EXISTS cliente_producto_sucursal (
+    id_cliente  INTEGER NOT NULL,
+    id_producto INTEGER NOT NULL,
+    id_sucursal INTEGER NOT NULL,
+    PRIMARY KEY (id_cliente, id_producto, id_sucursal)
+) WITHOUT ROWID
+"""
+
+# Índices del índice de join para los borrados por visita y por disponibilidad
+JOIN_INDEX_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS cps_cliente_sucursal ON cliente_producto_sucursal (id_cliente, id_sucursal)",
+    "CREATE INDEX IF NOT EXISTS cps_producto_sucursal ON cliente_producto_sucursal (id_producto, id_sucursal)",
+)
+
+# Ternas que aporta o quita cada fila; los UPDATE de llaves se tratan como delete + insert
+_ADD_INSCRIPCION = """
+    INSERT OR IGNORE INTO cliente_producto_sucursal (id_cliente, id_producto, id_sucursal)
+    SELECT NEW.id_cliente, NEW.id_producto, v.id_sucursal
+    FROM visitan v
+    JOIN disponibilidad d ON d.id_sucursal = v.id_sucursal AND d.id_producto = NEW.id_producto
+    WHERE v.id_cliente = NEW.id_cliente;"""
+_REMOVE_INSCRIPCION = """
+    DELETE FROM cliente_producto_sucursal WHERE id_cliente = OLD.id_cliente AND id_producto = OLD.id_producto;"""
+_ADD_VISITA = """
+    INSERT OR IGNORE INTO cliente_producto_sucursal (id_cliente, id_producto, id_sucursal)
+    SELECT NEW.id_cliente, i.id_producto, NEW.id_sucursal
+    FROM inscripcion i
+    JOIN disponibilidad d ON d.id_producto = i.id_producto AND d.id_sucursal = NEW.id_sucursal
+    WHERE i.id_cliente = NEW.id_cliente;"""
+_REMOVE_VISITA = """
+    DELETE FROM cliente_producto_sucursal WHERE id_cliente = OLD.id_cliente AND id_sucursal = OLD.id_sucursal;"""
+_ADD_DISPONIBILIDAD = """
+    INSERT OR IGNORE INTO cliente_producto_sucursal (id_cliente, id_producto, id_sucursal)
+    SELECT v.id_cliente, NEW.id_producto, NEW.id_sucursal
+    FROM visitan v
+    JOIN inscripcion i ON i.id_cliente = v.id_cliente AND i.id_producto = NEW.id_producto
+    WHERE v.id_sucursal = NEW.id_sucursal;"""
+_REMOVE_DISPONIBILIDAD = """
+    DELETE FROM cliente_producto_sucursal WHERE id_producto = OLD.id_producto AND id_sucursal = OLD.id_sucursal;"""
+
+JOIN_INDEX_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS inscripcion_ai AFTER INSERT ON inscripcion BEGIN{_ADD_INSCRIPCION}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS inscripcion_ad AFTER DELETE ON inscripcion BEGIN{_REMOVE_INSCRIPCION}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS inscripcion_au AFTER UPDATE OF id_cliente, id_producto ON inscripcion BEGIN{_REMOVE_INSCRIPCION}{_ADD_INSCRIPCION}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS visitan_ai AFTER INSERT ON visitan BEGIN{_ADD_VISITA}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS visitan_ad AFTER DELETE ON visitan BEGIN{_REMOVE_VISITA}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS visitan_au AFTER UPDATE OF id_cliente, id_sucursal ON visitan BEGIN{_REMOVE_VISITA}{_ADD_VISITA}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS disponibilidad_ai AFTER INSERT ON disponibilidad BEGIN{_ADD_DISPONIBILIDAD}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS disponibilidad_ad AFTER DELETE ON disponibilidad BEGIN{_REMOVE_DISPONIBILIDAD}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS disponibilidad_au AFTER UPDATE OF id_sucursal, id_producto ON disponibilidad BEGIN{_REMOVE_DISPONIBILIDAD}{_ADD_DISPONIBILIDAD}\nEND",
+)
+
+# Clientes inscritos en algún producto disponible en una sucursal que visitan
+ELIGIBLE_CLIENTS_EXISTS = """
+SELECT c.id, c.nombre, c.apellidos
+FROM cliente c
+WHERE EXISTS (
+    SELECT 1
+    FROM inscripcion i
+    JOIN disponibilidad d ON d.id_producto = i.id_producto
+    JOIN visitan v ON v.id_sucursal = d.id_sucursal AND v.id_cliente = i.id_cliente
+    WHERE i.id_cliente = c.id
+)
+ORDER BY c.id
+LIMIT ? OFFSET ?
+"""
+
+# Recorre solo los clientes elegibles (prefijo de la PK) y busca cada uno por id
+ELIGIBLE_CLIENTS_JOIN_INDEX = """
+SELECT c.id, c.nombre, c.apellidos
+FROM (
+    SELECT DISTINCT id_cliente FROM cliente_producto_sucursal
+    ORDER BY id_cliente
+    LIMIT ? OFFSET ?
+) e
+JOIN cliente c ON c.id = e.id_cliente
+ORDER BY c.id
+"""
+
+JOIN_RESULT = """
+SELECT i.id_cliente, i.id_producto, v.id_sucursal
+FROM inscripcion i
+JOIN visitan v ON v.id_cliente = i.id_cliente
+JOIN disponibilidad d ON d.id_sucursal = v.id_sucursal AND d.id_producto = i.id_producto
+"""
+
+REBUILD_JOIN_INDEX = "INSERT INTO cliente_producto_sucursal (id_cliente, id_producto, id_sucursal)" + JOIN_RESULT
+
+_local = threading.local()
+
+
+def load_schema(conn: sqlite3.Connection, schema_path: str | None = None) -> None:
+    """
+    Crea las tablas de `init.sql`, los índices secundarios y el índice de join con
+    sus triggers. Si el índice de join no existía se llena desde los datos actuales.
+
+    Args:
+        conn (sqlite3.Connection): La conexión.
+        schema_path (str | None): El archivo del esquema; por defecto el configurado.
+    """
+    path = schema_path or settings.reporting_schema_path or DEFAULT_SCHEMA_PATH
+    with open(path, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    created = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cliente_producto_sucursal'"
+    ).fetchone() is None
+    for statement in (*SECONDARY_INDEXES, JOIN_INDEX_TABLE, *JOIN_INDEX_INDEXES, *JOIN_INDEX_TRIGGERS):
+        conn.execute(statement)
+    conn.commit()
+    if created:
+        rebuild_join_index(conn)
+
+
+def connect(path: str | None = None, schema_path: str | None = None) -> sqlite3.Connection:
+    """
+    Abre la base de reportes y se asegura de que tenga el esquema.
+
+    Args:
+        path (str | None): El archivo SQLite (o ":memory:"); por defecto el configurado.
+        schema_path (str | None): El archivo del esquema.
+
+    Returns:
+        sqlite3.Connection: La conexión.
+    """
+    conn = sqlite3.connect(path or settings.reporting_db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    load_schema(conn, schema_path)
+    # Actualiza las estadísticas del planificador solo si hace falta (barato en cada conexión)
+    conn.execute("PRAGMA optimize")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Conexión de reportes del hilo actual (sqlite3 no comparte conexiones entre hilos)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+
+def load_data(conn: sqlite3.Connection, path: str) -> dict[str, int]:
+    """
+    Carga datos en las tablas del esquema en una sola transacción.
+
+    Args:
+        conn (sqlite3.Connection): La conexión.
+        path (str): Un script `.sql` con los `INSERT`, o una carpeta con un CSV
+            por tabla (`<tabla>.csv`, con encabezados); las tablas sin archivo se omiten.
+
+    Returns:
+        dict[str, int]: Filas de cada tabla tras la carga.
+    """
+    if os.path.isdir(path):
+        with conn:
+            for table in TABLES:
+                csv_path = os.path.join(path, f"{table}.csv")
+                if not os.path.exists(csv_path):
+                    continue
+                with open(csv_path, newline="", encoding="utf-8") as f:
+                    reader = csv.reader(f)
+                    columns = next(reader)
+                    placeholders = ", ".join("?" * len(columns))
+                    conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", reader
+                    )
+    else:
+        with open(path, encoding="utf-8") as f:
+            script = f.read()
+        # executescript confirma lo pendiente antes de correr: la transacción va en el script
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nCOMMIT;")
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+def rebuild_join_index(conn: sqlite3.Connection) -> int:
+    """
+    Recalcula la tabla `cliente_producto_sucursal` desde las tres tablas del join
+    (p.ej. tras una carga masiva con los triggers eliminados).
+
+    Returns:
+        int: Número de ternas (cliente, producto, sucursal) materializadas.
+    """
+    with conn:
+        conn.execute("DELETE FROM cliente_producto_sucursal")
+        conn.execute(REBUILD_JOIN_INDEX)
+    return conn.execute("SELECT COUNT(*) FROM cliente_producto_sucursal").fetchone()[0]
+
+
+def verify_join_index(conn: sqlite3.Connection) -> dict:
+    """
+    Compara el índice de join con el recálculo completo del join.
+
+    Returns:
+        dict: Ternas en la tabla, ternas del recálculo, faltantes y sobrantes
+        (con una muestra de cada una) y si coinciden.
+    """
+    stored = conn.execute("SELECT COUNT(*) FROM cliente_producto_sucursal").fetchone()[0]
+    expected = conn.execute(f"SELECT COUNT(*) FROM ({JOIN_RESULT})").fetchone()[0]
+    missing_query = f"{JOIN_RESULT} EXCEPT SELECT id_cliente, id_producto, id_sucursal FROM cliente_producto_sucursal"
+    extra_query = f"SELECT id_cliente, id_producto, id_sucursal FROM cliente_producto_sucursal EXCEPT {JOIN_RESULT}"
+    missing = conn.execute(f"SELECT COUNT(*) FROM ({missing_query})").fetchone()[0]
+    extra = conn.execute(f"SELECT COUNT(*) FROM ({extra_query})").fetchone()[0]
+    return {
+        "stored": stored,
+        "expected": expected,
+        "missing": missing,
+        "extra": extra,
+        "missing_sample": conn.execute(f"{missing_query} LIMIT 10").fetchall(),
+        "extra_sample": conn.execute(f"{extra_query} LIMIT 10").fetchall(),
+        "ok": missing == 0 and extra == 0,
+    }
+
+
+def eligible_clients(conn: sqlite3.Connection, limit: int = 100, offset: int = 0, use_join_index: bool = True) -> list[dict]:
+    """
+    Clientes inscritos en algún producto disponible en una sucursal que visitan.
+
+    Args:
+        conn (sqlite3.Connection): La conexión.
+        limit (int): Máximo de clientes a devolver.
+        offset (int): Clientes a saltar (orden por id).
+        use_join_index (bool): Si se usa el índice de join materializado; con False se
+            recalcula el join con el `EXISTS`.
+
+    Returns:
+        list[dict]: Los clientes con id, nombre y apellidos.
+    """
+    query = ELIGIBLE_CLIENTS_JOIN_INDEX if use_join_index else ELIGIBLE_CLIENTS_EXISTS
+    rows = conn.execute(query, (limit, offset)).fetchall()
+    return [{"id": id, "nombre": nombre, "apellidos": apellidos} for id, nombre, apellidos in rows]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Clientes con productos disponibles en las sucursales que visitan.")
+    parser.add_argument("--db", help="Archivo SQLite (por defecto REPORTING_DB_PATH)")
+    parser.add_argument("--load", metavar="RUTA", help="Cargar datos desde un script .sql o una carpeta de CSV por tabla")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--exists", action="store_true", help="Recalcular el join con EXISTS en lugar del índice de join")
+    parser.add_argument("--verify", action="store_true", help="Comparar el índice de join con el recálculo completo")
+    parser.add_argument("--rebuild-join-index", action="store_true", help="Reconstruir el índice de join antes de consultar")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    conn = connect(args.db)
+    if args.load:
+        for table, rows in load_data(conn, args.load).items():
+            print(f"{table}: {rows:,} filas")
+    if args.rebuild_join_index:
+        print(f"cliente_producto_sucursal: {rebuild_join_index(conn):,} ternas")
+    if args.verify:
+        report = verify_join_index(conn)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["ok"] else 1)
+    for client in eligible_clients(conn, args.limit, args.offset, use_join_index=not args.exists):
+        print(client["id"], client["nombre"], client["apellidos"], sep="\t")
@@ -0,0 +1,70 @@
+from typing import Any, Iterable, Iterator, Mapping, Protocol
+
+
+class Cursor(Protocol):
+    """Cursor devuelto por `Collection.find`."""
+
+    def sort(self, key_or_list: Any, direction: int | None = None) -> "Cursor": ...
+
+    def skip(self, skip: int) -> "Cursor": ...
+
+    def limit(self, limit: int) -> "Cursor": ...
+
+    def __iter__(self) -> Iterator[dict]: ...
+
+
+class Collection(Protocol):
+    """
+    Contrato de almacenamiento que usan los repositorios.
+
+    Es el subconjunto de `pymongo.collection.Collection` del que dependen los
+    repositorios; lo implementan pymongo y `repositories.memory.InMemoryCollection`.
+    """
+
+    def create_index(self, keys: Any, unique: bool = False, **kwargs) -> str: ...
+
+    def index_information(self) -> dict[str, dict]: ...
+
+    def drop_index(self, index_or_name: str, **kwargs) -> None: ...
+
+    def find(self, filter: Mapping | None = None, projection: Any = None, **kwargs) -> Cursor: ...
+
+    def find_one(self, filter: Mapping | None = None, projection: Any = None, **kwargs) -> dict | None: ...
+
+    def find_raw_batches(self, filter: Mapping | None = None, projection: Any = None, **kwargs) -> Iterable[bytes]: ...
+
+    def aggregate(self, pipeline: list[Mapping], **kwargs) -> Iterable[dict]: ...
+
+    def count_documents(self, filter: Mapping, **kwargs) -> int: ...
+
+    def insert_one(self, document: dict, **kwargs) -> Any: ...
+
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> Any: ...
+
+    def update_one(self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs) -> Any: ...
+
+    def update_many(self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs) -> Any: ...
+
+    def bulk_write(self, requests: Iterable[Any], ordered: bool = True, **kwargs) -> Any: ...
+
+    def replace_one(self, filter: Mapping, replacement: dict, upsert: bool = False, **kwargs) -> Any: ...
+
+    def delete_one(self, filter: Mapping, **kwargs) -> Any: ...
+
+    def delete_many(self, filter: Mapping, **kwargs) -> Any: ...
+
+    def with_options(self, **kwargs) -> "Collection": ...
+
+
+class Database(Protocol):
+    """Base de datos: da acceso a las colecciones por atributo o por nombre."""
+
+    name: str
+
+    def get_collection(self, name: str, **kwargs) -> Collection: ...
+
+    def watch(self, pipeline: list | None = None, **kwargs) -> Any: ...
+
+    def __getitem__(self, name: str) -> Collection: ...
+
+    def __getattr__(self, name: str) -> Collection: ...
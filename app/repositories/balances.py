@@ -0,0 +1,185 @@
+"""
+Balances como ledger más snapshots periódicos por usuario.
+
+El ledger son las transacciones (tier caliente y archivo): cada suscripción
+resta su monto y cada cancelación lo devuelve. `balance_snapshots` guarda el
+balance de un usuario a una fecha (`as_of`), así que el balance a cualquier
+fecha es el snapshot más cercano más (o menos) las transacciones entre los
+dos: el costo depende de las transacciones desde el snapshot, no de todo el
+historial.
+
+El campo `balance` de `users` se sigue escribiendo en el flujo de suscripción
+(es lo que se valida al suscribirse); el ledger es la fuente para auditar y
+reconstruir. La compactación (`balance_compactor`) escribe un snapshot nuevo
+cuando un usuario acumula `BALANCE_SNAPSHOT_EVERY` transacciones desde el
+último, y nunca más cerca del presente que `BALANCE_SNAPSHOT_SETTLE_SECONDS`,
+para no dejar fuera una transacción con timestamp anterior que aún se está
+escribiendo.
+"""
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+from db import ReadRoute, get_collection
+from repositories.transactions import ARCHIVE_COLLECTION
+from schema.transactions import TransactionType
+from schema.users import BalanceOut
+
+SNAPSHOT_COLLECTION = "balance_snapshots"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _utc(timestamp: datetime) -> datetime:
+    # Mongo devuelve fechas sin zona horaria que están en UTC
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+
+def delta(transaction: dict) -> int:
+    """Efecto de una transacción en el balance: las suscripciones restan y las cancelaciones devuelven."""
+    if transaction["transaction_type"] == TransactionType.SUBSCRIBE.value:
+        return -transaction["amount"]
+    return transaction["amount"]
+
+
+def ledger_between(user_id: str, after: datetime, until: datetime, route: ReadRoute = ReadRoute.PRIMARY) -> list[dict]:
+    """
+    Transacciones del usuario con `after < timestamp <= until`, de ambos tiers.
+
+    El tier caliente usa el índice (user_id, timestamp) y del archivo solo se
+    leen los buckets de los meses del rango.
+
+    Returns:
+        list[dict]: Las transacciones en orden cronológico.
+    """
+    projection = {"transaction_type": 1, "amount": 1, "timestamp": 1}
+    hot = list(get_collection("transactions", route).find(
+        {"user_id": user_id, "timestamp": {"$gt": after, "$lte": until}}, projection
+    ))
+    seen = {transaction["_id"] for transaction in hot}
+    buckets = get_collection(ARCHIVE_COLLECTION, route).find(
+        {"user_id": user_id, "month": {"$gte": _utc(after).strftime("%Y-%m"), "$lte": _utc(until).strftime("%Y-%m")}},
+        {"transactions": 1},
+    )
+    archived = [
+        transaction
+        for bucket in buckets
+        for transaction in bucket["transactions"]
+        if after < _utc(transaction["timestamp"]) <= until and transaction["_id"] not in seen
+    ]
+    return sorted(archived + hot, key=lambda transaction: _utc(transaction["timestamp"]))
+
+
+def _snapshot(user_id: str, as_of: datetime, before: bool, route: ReadRoute) -> dict | None:
+    # El snapshot más cercano a `as_of`: el último anterior o el primero posterior
+    condition, direction = ("$lte", -1) if before else ("$gt", 1)
+    return get_collection(SNAPSHOT_COLLECTION, route).find_one(
+        {"user_id": user_id, "as_of": {condition: as_of}}, sort=[("as_of", direction)]
+    )
+
+
+def save_snapshot(user_id: str, as_of: datetime, balance: int, entries: int = 0) -> bool:
+    """
+    Guarda el balance de un usuario a una fecha.
+
+    Args:
+        user_id (str): El ID del usuario.
+        as_of (datetime): La fecha del balance (incluye las transacciones con ese timestamp).
+        balance (int): El balance.
+        entries (int): Transacciones del ledger que resume desde el snapshot anterior.
+
+    Returns:
+        bool: False si ya había un snapshot del usuario a esa fecha.
+    """
+    try:
+        get_collection(SNAPSHOT_COLLECTION).insert_one({
+            "user_id": user_id,
+            "as_of": as_of,
+            "balance": balance,
+            "entries": entries,
+            "created_at": datetime.now(timezone.utc),
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def balance_at(user_id: str, as_of: datetime | None = None, route: ReadRoute = ReadRoute.PRIMARY) -> BalanceOut | None:
+    """
+    Calcula el balance de un usuario a una fecha desde el ledger y los snapshots.
+
+    Parte del último snapshot anterior a `as_of` y suma las transacciones
+    posteriores; si no hay, del primero posterior restando las transacciones
+    intermedias. Si el usuario aún no tiene snapshots, parte del `balance`
+    guardado en `users` (costo proporcional a su historial hasta la primera
+    compactación).
+
+    Args:
+        user_id (str): El ID del usuario.
+        as_of (datetime | None): La fecha; None es ahora.
+        route (ReadRoute): Desde dónde se lee.
+
+    Returns:
+        BalanceOut | None: El balance, o None si el usuario no existe.
+    """
+    as_of = _utc(as_of) if as_of is not None else datetime.now(timezone.utc)
+    snapshot = _snapshot(user_id, as_of, before=True, route=route)
+    if snapshot is not None:
+        anchor, anchor_balance, sign = _utc(snapshot["as_of"]), snapshot["balance"], 1
+        entries = ledger_between(user_id, anchor, as_of, route)
+    else:
+        snapshot = _snapshot(user_id, as_of, before=False, route=route)
+        if snapshot is None:
+            user = get_collection("users", route).find_one({"_id": ObjectId(user_id)}, {"balance": 1})
+            if user is None:
+                return None
+            snapshot = {"as_of": None, "balance": user["balance"]}
+            anchor = datetime.now(timezone.utc)
+        else:
+            anchor = _utc(snapshot["as_of"])
+        anchor_balance, sign = snapshot["balance"], -1
+        entries = ledger_between(user_id, as_of, anchor, route)
+    return BalanceOut(
+        user_id=user_id,
+        balance=anchor_balance + sign * sum(delta(entry) for entry in entries),
+        as_of=as_of,
+        snapshot_as_of=snapshot["as_of"] and _utc(snapshot["as_of"]),
+        ledger_entries=len(entries),
+    )
+
+
+def compact_user(user_id: str, every: int | None = None, settle_seconds: float | None = None) -> bool:
+    """
+    Escribe un snapshot nuevo si el usuario acumula suficientes transacciones desde el último.
+
+    El snapshot queda en el timestamp de la última transacción asentada (más
+    antigua que `settle_seconds`), así las lecturas posteriores parten de ahí.
+
+    Args:
+        user_id (str): El ID del usuario.
+        every (int | None): Transacciones mínimas desde el último snapshot.
+        settle_seconds (float | None): Antigüedad mínima de las transacciones que se resumen.
+
+    Returns:
+        bool: Si se escribió un snapshot.
+    """
+    every = settings.balance_snapshot_every if every is None else every
+    settle_seconds = settings.balance_snapshot_settle_seconds if settle_seconds is None else settle_seconds
+    until = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+    latest = _snapshot(user_id, until, before=True, route=ReadRoute.PRIMARY)
+    if latest is None:
+        # Primer snapshot: el balance inicial se deduce del balance guardado y de todo el ledger
+        current = balance_at(user_id, until)
+        if current is None:
+            return False
+        entries = ledger_between(user_id, EPOCH, until)
+        opening = current.balance - sum(delta(entry) for entry in entries)
+        save_snapshot(user_id, EPOCH, opening)
+        latest = {"as_of": EPOCH, "balance": opening}
+    entries = ledger_between(user_id, _utc(latest["as_of"]), until)
+    if len(entries) < max(every, 1):
+        return False
+    as_of = _utc(entries[-1]["timestamp"])
+    balance = latest["balance"] + sum(delta(entry) for entry in entries)
+    return save_snapshot(user_id, as_of, balance, entries=len(entries))
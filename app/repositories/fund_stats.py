@@ -0,0 +1,138 @@
+"""
+Estadísticas por fondo mantenidas en cada escritura de transacciones.
+
+- `fund_stats`: un documento por fondo (`_id` = id del fondo) con los totales:
+  activos bajo administración (AUM), suscriptores activos y flujos acumulados.
+- `fund_stats_daily`: un bucket por fondo y día UTC (`_id` = "fondo:AAAA-MM-DD")
+  con las suscripciones y cancelaciones del día.
+
+Cada escritura de transacciones agrupa los incrementos por fondo y por
+(fondo, día) y los manda en un `bulk_write` de `$inc` con upsert por
+colección (dos viajes por lote, no dos por transacción), así que leer las
+estadísticas de un fondo es una búsqueda por `_id` más un rango acotado de
+días, sin recorrer `transactions`. Las cargas masivas (`bulk_loader`,
+`synthetic_data`) escriben directo en `transactions`; después de ellas, o si
+un `$inc` falló, `rebuild_fund_stats.py` recalcula todo desde el ledger.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Mapping
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from db import ReadRoute, get_collection
+from metrics import registry
+from schema.funds import FundDailyStats, FundStatsOut
+from schema.transactions import TransactionType
+
+STATS_COLLECTION = "fund_stats"
+DAILY_COLLECTION = "fund_stats_daily"
+
+stats_errors = registry.counter("fund_stats_errors_total", "Incrementos de estadísticas de fondos que fallaron")
+
+
+def day_of(timestamp: datetime) -> str:
+    """Día UTC (AAAA-MM-DD) de un timestamp; los naive se toman como UTC, igual que Mongo."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.strftime("%Y-%m-%d")
+
+
+def daily_id(fund_id: str, day: str) -> str:
+    return f"{fund_id}:{day}"
+
+
+def flow_fields(transaction_type: str, count: int, amount: int) -> dict:
+    """
+    Campos de flujo que aporta un grupo de transacciones del mismo tipo.
+
+    Las cancelaciones devuelven el monto de la suscripción, así que el AUM es
+    lo suscrito menos lo cancelado y cada cancelación cierra una suscripción.
+
+    Args:
+        transaction_type (str): "subscribe" o "cancel".
+        count (int): Número de transacciones.
+        amount (int): Suma de sus montos.
+
+    Returns:
+        dict: Los incrementos de los totales del fondo.
+    """
+    if transaction_type == TransactionType.SUBSCRIBE.value:
+        return {"subscriptions": count, "subscribed_amount": amount, "aum": amount, "active_subscribers": count}
+    return {"cancellations": count, "cancelled_amount": amount, "aum": -amount, "active_subscribers": -count}
+
+
+def record_transactions(transactions: Iterable[Mapping]) -> None:
+    """
+    Suma transacciones nuevas a las estadísticas de sus fondos.
+
+    Un fallo no revierte las transacciones: se cuenta en `fund_stats_errors_total`
+    y se corrige con una reconstrucción.
+
+    Args:
+        transactions (Iterable[Mapping]): Las transacciones tal como se guardaron.
+    """
+    totals: dict[str, dict] = {}
+    last_at: dict[str, datetime] = {}
+    daily: dict[tuple[str, str], dict] = {}
+    for transaction in transactions:
+        fund_id = transaction["fund_id"]
+        timestamp = transaction["timestamp"]
+        flows = flow_fields(transaction["transaction_type"], 1, transaction["amount"])
+        fund_totals = totals.setdefault(fund_id, {})
+        for field, value in flows.items():
+            fund_totals[field] = fund_totals.get(field, 0) + value
+        last_at[fund_id] = max(last_at.get(fund_id, timestamp), timestamp)
+        day_flows = {field: value for field, value in flows.items() if field not in ("aum", "active_subscribers")}
+        day_flows["net_flow"] = flows["aum"]
+        day_totals = daily.setdefault((fund_id, day_of(timestamp)), {})
+        for field, value in day_flows.items():
+            day_totals[field] = day_totals.get(field, 0) + value
+    if not totals:
+        return
+    try:
+        get_collection(STATS_COLLECTION).bulk_write([
+            UpdateOne(
+                {"_id": fund_id},
+                {"$inc": fund_totals, "$max": {"last_transaction_at": last_at[fund_id]}, "$setOnInsert": {"fund_id": fund_id}},
+                upsert=True,
+            )
+            for fund_id, fund_totals in totals.items()
+        ], ordered=False)
+        get_collection(DAILY_COLLECTION).bulk_write([
+            UpdateOne(
+                {"_id": daily_id(fund_id, day)},
+                {"$inc": day_totals, "$setOnInsert": {"fund_id": fund_id, "day": day}},
+                upsert=True,
+            )
+            for (fund_id, day), day_totals in daily.items()
+        ], ordered=False)
+    except PyMongoError as e:
+        stats_errors.inc(error=type(e).__name__)
+
+
+def record_transaction(transaction: Mapping) -> None:
+    """Suma una transacción nueva a las estadísticas de su fondo (ver `record_transactions`)."""
+    record_transactions([transaction])
+
+def get_fund_stats(fund_id: str, days: int = 30) -> FundStatsOut:
+    """
+    Obtiene los totales de un fondo y sus buckets diarios recientes.
+
+    Args:
+        fund_id (str): El ID del fondo.
+        days (int): Días hacia atrás (incluido hoy) de los buckets diarios.
+
+    Returns:
+        FundStatsOut: Las estadísticas (en cero si el fondo no tiene transacciones).
+    """
+    # Tableros: se leen de las secundarias
+    totals = get_collection(STATS_COLLECTION, ReadRoute.SECONDARY).find_one({"_id": fund_id}) or {}
+    now = datetime.now(timezone.utc)
+    since, today = day_of(now - timedelta(days=days - 1)), day_of(now)
+    buckets = get_collection(DAILY_COLLECTION, ReadRoute.SECONDARY).find(
+        {"fund_id": fund_id, "day": {"$gte": since, "$lte": today}}
+    ).sort("day", 1)
+    totals.pop("_id", None)
+    totals["fund_id"] = fund_id
+    return FundStatsOut(**totals, daily=[FundDailyStats(**bucket) for bucket in buckets])
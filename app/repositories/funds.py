@@ -1,19 +1,124 @@
-from db import db
+import asyncio
+import hashlib
+import threading
+import time
+
+import bson
+
+from db import ReadRoute, get_collection
+from config import settings
 from schema.funds import FundsOut
 from bson import ObjectId
+from repositories.singleflight import SingleFlight
+from cache import TTLCache
+from repositories.projection import Fields, narrow, normalize_fields
+
+_fund_flight = SingleFlight(ttl=settings.singleflight_fund_ttl)
+
+# Caché del catálogo por versión: un cambio de versión invalida todas las entradas
+_catalog_cache = TTLCache(maxsize=256, ttl=settings.catalog_cache_ttl)
+
+# Revisión del catálogo: (hash del contenido, cuándo vence)
+_revision: tuple[str, float] | None = None
+_revision_lock = threading.Lock()
+_revision_refreshing = False
+
+def _catalog_revision() -> str:
+    # Todo el catálogo en orden de `_id`: cualquier escritura cambia el hash.
+    # Se lee del primario: con secundarias atrasadas cada worker vería otro ETag
+    digest = hashlib.sha1()
+    for fund in get_collection("funds", ReadRoute.PRIMARY).find({}).sort("_id", 1):
+        digest.update(bson.encode(fund))
+    return digest.hexdigest()[:16]
+
+def _refresh_revision() -> str:
+    global _revision, _revision_refreshing
+    try:
+        revision = _catalog_revision()
+        with _revision_lock:
+            _revision = (revision, time.monotonic() + settings.catalog_revision_ttl)
+        return revision
+    finally:
+        _revision_refreshing = False
+
+def get_catalog_version() -> str:
+    """
+    Obtiene la versión actual del catálogo de fondos.
+
+    Se deriva del contenido de `funds`, así que la cambia cualquier escritura
+    (`init_db`, la carga masiva, la lambda de Terraform) y coincide en todos los
+    workers sin coordinarse. Vencida la revisión se sigue usando la anterior
+    mientras un hilo la relee; solo la primera lectura espera a Mongo.
+
+    Returns:
+        str: La versión del catálogo.
+    """
+    global _revision_refreshing
+    current = _revision
+    if current is None:
+        return f"{settings.catalog_version}.{_refresh_revision()}"
+    revision, expires = current
+    if time.monotonic() >= expires:
+        with _revision_lock:
+            start = not _revision_refreshing
+            _revision_refreshing = True
+        if start:
+            threading.Thread(target=_refresh_revision, name="catalog-revision", daemon=True).start()
+    return f"{settings.catalog_version}.{revision}"
+
+async def fetch_catalog_version() -> str:
+    """
+    Versión asíncrona de `get_catalog_version`: la primera lectura del catálogo
+    se hace en un hilo para no bloquear el event loop; después es inmediata.
+
+    Returns:
+        str: La versión del catálogo.
+    """
+    if _revision is None:
+        return await asyncio.to_thread(get_catalog_version)
+    return get_catalog_version()
 
-def get_funds() -> list[FundsOut]:
+def warm_catalog() -> int:
+    """
+    Carga el catálogo completo en la caché (todos, por ID y por categoría).
+    Se llama en el proceso maestro antes del fork para que los workers lo compartan.
+
+    Returns:
+        int: El número de fondos cargados.
+    """
+    version = get_catalog_version()
+    funds = _load_funds({})
+    _catalog_cache.set((version, "all"), funds)
+    for category in {fund.category.value for fund in funds}:
+        _catalog_cache.set((version, "category", category), [f for f in funds if f.category.value == category])
+    for fund in funds:
+        _catalog_cache.set((version, "fund", fund.id), fund)
+    return len(funds)
+
+def _funds():
+    # El catálogo cambia poco: se lee de las secundarias
+    return get_collection("funds", ReadRoute.SECONDARY)
+
+def _load_funds(query: dict) -> list[FundsOut]:
+    return [FundsOut(id=str(fund["_id"]), **fund) for fund in _funds().find(query)]
+
+def get_funds(fields: Fields = None) -> list[FundsOut]:
     """Obtiene todos los fondos disponibles.
 
+    Args:
+        fields (Iterable[str] | None): Los campos de `FundsOut` que se necesitan; None son todos.
+
     Returns:
-        list[FundsOut]: Una lista de todos los fondos.
+        list[FundsOut]: Una lista de todos los fondos (modelos parciales si se pasa `fields`).
     """
-    funds_cursor = db.funds.find()
-    funds = []
-    print("funds: ", funds_cursor)
-    for fund in funds_cursor:
-        funds.append(FundsOut(id=str(fund["_id"]),**fund))
-    return funds
+    fields = normalize_fields(FundsOut, fields)
+    key = (get_catalog_version(), "all")
+    funds = _catalog_cache.get(key)
+    if funds is None:
+        funds = _load_funds({})
+        _catalog_cache.set(key, funds)
+    # El catálogo completo ya está en caché: se recorta en memoria sin ir a Mongo
+    return funds if fields is None else [narrow(fund, fields) for fund in funds]
 
 def get_fund_by_id(fund_id: str) -> FundsOut | None:
     """
@@ -25,23 +130,46 @@ def get_fund_by_id(fund_id: str) -> FundsOut | None:
     Returns:
         FundsOut | None: Los detalles del fondo.
     """
+    key = (get_catalog_version(), "fund", fund_id)
+    cached = _catalog_cache.get(key)
+    if cached is not None:
+        return cached
+
     obj_id = ObjectId(fund_id)
-    fund = db.funds.find_one({"_id": obj_id})
+    fund = _funds().find_one({"_id": obj_id})
     if fund:
-        return FundsOut(id=str(fund["_id"]),**fund)
+        fund_out = FundsOut(id=str(fund["_id"]),**fund)
+        _catalog_cache.set(key, fund_out)
+        return fund_out
     return None
 
-def get_funds_by_category(category: str) -> list[FundsOut]:
+async def fetch_fund_by_id(fund_id: str) -> FundsOut | None:
+    """
+    Versión asíncrona de `get_fund_by_id`: las peticiones concurrentes por el
+    mismo fondo comparten una sola consulta.
+
+    Args:
+        fund_id (str): El ID del fondo a recuperar.
+
+    Returns:
+        FundsOut | None: Los detalles del fondo.
+    """
+    return await _fund_flight.do(fund_id, get_fund_by_id, fund_id)
+
+def get_funds_by_category(category: str, fields: Fields = None) -> list[FundsOut]:
     """ Obtiene fondos por categoría.
 
     Args:
         category (str): La categoría de fondos a recuperar.
+        fields (Iterable[str] | None): Los campos de `FundsOut` que se necesitan; None son todos.
 
     Returns:
         list[FundsOut]: Una lista de fondos de la categoría especificada.
     """
-    funds_cursor = db.funds.find({"category": category})
-    funds = []
-    for fund in funds_cursor:
-        funds.append(FundsOut(id=str(fund["_id"]),**fund))
-    return funds
\ No newline at end of file
+    fields = normalize_fields(FundsOut, fields)
+    key = (get_catalog_version(), "category", category)
+    funds = _catalog_cache.get(key)
+    if funds is None:
+        funds = _load_funds({"category": category})
+        _catalog_cache.set(key, funds)
+    return funds if fields is None else [narrow(fund, fields) for fund in funds]
\ No newline at end of file
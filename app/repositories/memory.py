@@ -0,0 +1,801 @@
+"""
+Backend en memoria con la misma interfaz (subconjunto) de pymongo.
+
+Se usa cuando `settings.env` es uno de `MEMORY_ENVS`: permite correr la API,
+las pruebas y los benchmarks sin Mongo ni AWS. Respeta los índices únicos
+(lanza `DuplicateKeyError` igual que el driver) y usa los demás índices para
+resolver las búsquedas por igualdad sin recorrer toda la colección.
+`InMemoryDatabase.watch` ofrece un change stream mínimo (insert, update,
+replace y delete, con etapas `$match`) y `aggregate` las etapas `$match`,
+`$group`, `$sort`, `$limit` y `$unwind`.
+"""
+import itertools
+import queue
+import threading
+from datetime import timezone
+from typing import Any, Iterable, Iterator, Mapping
+
+import bson
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.operations import UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+
+def _clone(value: Any) -> Any:
+    """Copia profunda de dicts y listas (más barata que `copy.deepcopy`)."""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _get_path(doc: Mapping, path: str) -> Any:
+    value: Any = doc
+    parts = path.split(".")
+    for position, part in enumerate(parts):
+        if isinstance(value, Mapping) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and not part.isdigit():
+            # Como en Mongo, una ruta que atraviesa un arreglo da el campo de cada elemento
+            rest = ".".join(parts[position:])
+            values = []
+            for item in value:
+                found = _get_path(item, rest) if isinstance(item, Mapping) else _MISSING
+                if found is not _MISSING:
+                    values.extend(found if isinstance(found, list) else [found])
+            return values if values else _MISSING
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(doc: dict, path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: dict, path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {op}")
+
+
+def _equals(value: Any, expected: Any) -> bool:
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not (isinstance(condition, Mapping) and condition and all(k.startswith("$") for k in condition)):
+        return _equals(value, condition)
+
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = _equals(value, operand)
+        elif op == "$ne":
+            ok = not _equals(value, operand)
+        elif op == "$in":
+            ok = any(_equals(value, item) for item in operand)
+        elif op == "$nin":
+            ok = not any(_equals(value, item) for item in operand)
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(operand)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is _MISSING:
+                ok = False
+            elif isinstance(value, list):
+                ok = any(_compare(item, op, operand) for item in value)
+            else:
+                ok = _compare(value, op, operand)
+        else:
+            raise ValueError(f"Unsupported query operator {op}")
+        if not ok:
+            return False
+    return True
+
+
+def match(doc: Mapping, query: Mapping | None) -> bool:
+    """
+    Evalúa un filtro de Mongo sobre un documento.
+
+    Soporta igualdad, `$eq`, `$ne`, `$in`, `$nin`, `$exists`, `$gt(e)`,
+    `$lt(e)`, `$and`, `$or` y `$nor`.
+    """
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(match(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(match(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(match(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _apply_update(doc: dict, update: Mapping, inserting: bool = False) -> None:
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                _set_path(doc, path, _clone(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set_path(doc, path, _clone(value))
+        elif op == "$unset":
+            for path in fields:
+                _unset_path(doc, path)
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op in ("$min", "$max"):
+            for path, value in fields.items():
+                current = _get_path(doc, path)
+                if current is _MISSING or (value < current if op == "$min" else value > current):
+                    _set_path(doc, path, _clone(value))
+        elif op in ("$push", "$addToSet"):
+            for path, value in fields.items():
+                items = value["$each"] if isinstance(value, Mapping) and "$each" in value else [value]
+                current = _get_path(doc, path)
+                target = [] if current is _MISSING else current
+                for item in items:
+                    if op == "$push" or item not in target:
+                        target.append(_clone(item))
+                _set_path(doc, path, target)
+        elif op == "$pull":
+            for path, value in fields.items():
+                current = _get_path(doc, path)
+                if isinstance(current, list):
+                    _set_path(doc, path, [item for item in current if not _equals(item, value)])
+        else:
+            raise ValueError(f"Unsupported update operator {op}")
+
+
+def _project(doc: dict, projection: Mapping | Iterable[str] | None) -> dict:
+    if not projection:
+        return _clone(doc)
+    if not isinstance(projection, Mapping):
+        projection = {field: 1 for field in projection}
+
+    include_id = bool(projection.get("_id", 1))
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(not v for v in fields.values()):
+        result = _clone(doc)
+        for path in fields:
+            _unset_path(result, path)
+    else:
+        result = {}
+        for path in fields:
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(result, path, _clone(value))
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _evaluate(doc: Mapping, expression: Any) -> Any:
+    # Expresiones de agregación: "$campo", documentos de expresiones y $dateToString
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, Mapping):
+        if "$dateToString" in expression:
+            spec = expression["$dateToString"]
+            date = _evaluate(doc, spec["date"])
+            if date is None:
+                return None
+            if date.tzinfo is not None:
+                date = date.astimezone(timezone.utc)
+            return date.strftime(spec.get("format", "%Y-%m-%dT%H:%M:%S.%LZ").replace("%L", f"{date.microsecond // 1000:03d}"))
+        return {key: _evaluate(doc, value) for key, value in expression.items()}
+    return expression
+
+
+def _group(docs: Iterable[dict], spec: Mapping) -> list[dict]:
+    groups: dict[Any, dict] = {}
+    accumulators = {field: next(iter(acc.items())) for field, acc in spec.items() if field != "_id"}
+    for doc in docs:
+        key = _evaluate(doc, spec["_id"])
+        group = groups.get(_hashable(key))
+        if group is None:
+            group = groups[_hashable(key)] = {"_id": key}
+            for field, (op, _) in accumulators.items():
+                group[field] = 0 if op == "$sum" else _MISSING
+        for field, (op, expression) in accumulators.items():
+            value = _evaluate(doc, expression)
+            current = group[field]
+            if op == "$sum":
+                group[field] = current + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$first":
+                if current is _MISSING:
+                    group[field] = value
+            elif op == "$last":
+                group[field] = value
+            elif op in ("$min", "$max"):
+                if value is not None and (current is _MISSING or (value < current if op == "$min" else value > current)):
+                    group[field] = value
+            else:
+                raise ValueError(f"Unsupported accumulator {op}")
+    for group in groups.values():
+        for field in accumulators:
+            if group[field] is _MISSING:
+                group[field] = None
+    return list(groups.values())
+
+
+def _unwind(docs: Iterable[dict], path: str) -> list[dict]:
+    # Un documento por elemento del arreglo; los que no tienen arreglo (o está vacío) se descartan
+    unwound = []
+    for doc in docs:
+        items = _get_path(doc, path)
+        if not isinstance(items, list):
+            continue
+        *parents, leaf = path.split(".")
+        for item in items:
+            # Se copian solo los niveles de la ruta, no el documento completo
+            copy = target = dict(doc)
+            for part in parents:
+                target[part] = dict(target[part])
+                target = target[part]
+            target[leaf] = item
+            unwound.append(copy)
+    return unwound
+
+
+def _normalize_keys(keys: str | list) -> list[tuple[str, int]]:
+    if isinstance(keys, str):
+        return [(keys, ASCENDING)]
+    return [(key, direction) for key, direction in keys]
+
+
+class _Index:
+    def __init__(self, name: str, keys: list[tuple[str, int]], unique: bool, partial: Mapping | None = None):
+        self.name = name
+        self.keys = keys
+        self.unique = unique
+        # `partialFilterExpression`: solo se indexan los documentos que lo cumplen
+        self.partial = partial
+        self.fields = [key for key, _ in keys]
+        # Valor del primer campo -> ids, para búsquedas por igualdad
+        self.buckets: dict[Any, set] = {}
+        # Solo para índices únicos: tupla de valores -> id
+        self.entries: dict[tuple, Any] = {}
+
+    def key_for(self, doc: Mapping) -> tuple:
+        values = []
+        for field in self.fields:
+            value = _get_path(doc, field)
+            values.append(None if value is _MISSING else _hashable(value))
+        return tuple(values)
+
+    def covers(self, doc: Mapping) -> bool:
+        return self.partial is None or match(doc, self.partial)
+
+    def check(self, doc: Mapping, doc_id: Any) -> None:
+        if not self.unique or not self.covers(doc):
+            return
+        key = self.key_for(doc)
+        owner = self.entries.get(key, doc_id)
+        if owner != doc_id:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error index: {self.name} dup key: {dict(zip(self.fields, key))}",
+                code=11000,
+            )
+
+    def add(self, doc: Mapping, doc_id: Any) -> None:
+        if not self.covers(doc):
+            return
+        key = self.key_for(doc)
+        self.buckets.setdefault(key[0], set()).add(doc_id)
+        if self.unique:
+            self.entries[key] = doc_id
+
+    def remove(self, doc: Mapping, doc_id: Any) -> None:
+        if not self.covers(doc):
+            return
+        key = self.key_for(doc)
+        bucket = self.buckets.get(key[0])
+        if bucket is not None:
+            bucket.discard(doc_id)
+            if not bucket:
+                del self.buckets[key[0]]
+        if self.unique and self.entries.get(key) == doc_id:
+            del self.entries[key]
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+class InMemoryCursor:
+    """Cursor perezoso compatible con `find()` de pymongo."""
+
+    def __init__(self, collection: "InMemoryCollection", query: Mapping | None, projection: Any = None):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: list[tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Iterator[dict] | None = None
+
+    def sort(self, key_or_list: str | list, direction: int | None = None) -> "InMemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or ASCENDING)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, skip: int) -> "InMemoryCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "InMemoryCursor":
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> "InMemoryCursor":
+        return self
+
+    def _execute(self) -> Iterator[dict]:
+        docs = self._collection._select(self._query)
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=direction < 0)
+        if self._skip:
+            docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[: self._limit]
+        return iter([_project(doc, self._projection) for doc in docs])
+
+    def __iter__(self) -> "InMemoryCursor":
+        return self
+
+    def __next__(self) -> dict:
+        if self._results is None:
+            self._results = self._execute()
+        return next(self._results)
+
+    def to_list(self, length: int | None = None) -> list[dict]:
+        docs = list(self)
+        return docs if length is None else docs[:length]
+
+    def close(self) -> None:
+        self._results = iter(())
+
+
+def _sort_key(value: Any) -> tuple:
+    # Mongo ordena los valores ausentes / nulos antes que cualquier otro
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+
+class InMemoryCollection:
+    """Colección en memoria, segura entre hilos."""
+
+    def __init__(self, name: str, database: "InMemoryDatabase | None" = None):
+        self.name = name
+        self._database = database
+        self._docs: dict[Any, dict] = {}
+        self._indexes: dict[str, _Index] = {}
+        self._lock = threading.RLock()
+
+    # Índices
+
+    def create_index(self, keys: str | list, unique: bool = False, name: str | None = None, **kwargs) -> str:
+        normalized = _normalize_keys(keys)
+        name = name or "_".join(f"{key}_{direction}" for key, direction in normalized)
+        with self._lock:
+            if name in self._indexes:
+                return name
+            index = _Index(name, normalized, unique, kwargs.get("partialFilterExpression"))
+            for doc_id, doc in self._docs.items():
+                index.check(doc, doc_id)
+                index.add(doc, doc_id)
+            self._indexes[name] = index
+        return name
+
+    def index_information(self) -> dict[str, dict]:
+        with self._lock:
+            info = {"_id_": {"key": [("_id", ASCENDING)]}}
+            for index in self._indexes.values():
+                info[index.name] = {"key": index.keys, "unique": index.unique}
+                if index.partial is not None:
+                    info[index.name]["partialFilterExpression"] = index.partial
+            return info
+
+    def drop_index(self, index_or_name: str, **kwargs) -> None:
+        with self._lock:
+            if self._indexes.pop(index_or_name, None) is None:
+                raise OperationFailure(f"index not found with name [{index_or_name}]", code=27)
+
+    def drop_indexes(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def _candidate_ids(self, query: Mapping | None) -> Iterable[Any]:
+        if query:
+            if "_id" in query and not isinstance(query["_id"], Mapping):
+                return [query["_id"]]
+            if "_id" in query and set(query["_id"]) == {"$in"}:
+                # Búsqueda por lista de _id (p.ej. borrar un lote): no se recorre la colección
+                return list(dict.fromkeys(_hashable(value) for value in query["_id"]["$in"]))
+            for index in self._indexes.values():
+                if index.partial is not None:
+                    # No tiene todos los documentos: no sirve para resolver la consulta
+                    continue
+                value = query.get(index.fields[0], _MISSING)
+                if value is not _MISSING and not isinstance(value, (Mapping, list)):
+                    return list(index.buckets.get(value, ()))
+        return list(self._docs)
+
+    def _select(self, query: Mapping | None) -> list[dict]:
+        with self._lock:
+            return [
+                doc for doc_id in self._candidate_ids(query)
+                if (doc := self._docs.get(doc_id)) is not None and match(doc, query)
+            ]
+
+    def _store(self, doc: dict, previous: dict | None = None) -> None:
+        doc_id = doc["_id"]
+        if previous is None and doc_id in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error index: _id_ dup key: {doc_id}", code=11000)
+        for index in self._indexes.values():
+            index.check(doc, doc_id)
+        if previous is not None:
+            for index in self._indexes.values():
+                index.remove(previous, doc_id)
+        for index in self._indexes.values():
+            index.add(doc, doc_id)
+        self._docs[doc_id] = doc
+        if self._database is not None:
+            self._database._publish(self.name, doc, previous)
+
+    def _remove(self, doc_id: Any) -> None:
+        doc = self._docs.pop(doc_id)
+        for index in self._indexes.values():
+            index.remove(doc, doc_id)
+        if self._database is not None:
+            self._database._publish(self.name, None, doc)
+
+    # Lecturas
+
+    def find(self, filter: Mapping | None = None, projection: Any = None, **kwargs) -> InMemoryCursor:
+        cursor = InMemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("skip"):
+            cursor.skip(kwargs["skip"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    def find_one(self, filter: Mapping | None = None, projection: Any = None, **kwargs) -> dict | None:
+        kwargs["limit"] = 1
+        return next(self.find(filter, projection, **kwargs), None)
+
+    def find_raw_batches(
+        self, filter: Mapping | None = None, projection: Any = None, batch_size: int = 1000, **kwargs
+    ) -> Iterator[bytes]:
+        # Igual que el driver: cada lote son los documentos BSON concatenados
+        documents = list(self.find(filter, projection, **kwargs))
+        for start in range(0, len(documents), batch_size):
+            yield b"".join(bson.encode(document) for document in documents[start:start + batch_size])
+
+    def aggregate(self, pipeline: list[Mapping], **kwargs) -> Iterator[dict]:
+        # Subconjunto de etapas: $match, $group ($sum, $first, $last, $min, $max), $sort, $limit y $unwind
+        pipeline = list(pipeline)
+        # Un $match inicial usa los índices, como en Mongo
+        if pipeline and "$match" in pipeline[0]:
+            docs = self._select(pipeline.pop(0)["$match"])
+        else:
+            docs = self._select(None)
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if match(doc, spec)]
+            elif name == "$group":
+                docs = _group(docs, spec)
+            elif name == "$sort":
+                for key, direction in reversed(list(spec.items())):
+                    docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=direction < 0)
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$unwind":
+                docs = _unwind(docs, (spec["path"] if isinstance(spec, Mapping) else spec)[1:])
+            else:
+                raise ValueError(f"Unsupported aggregation stage {name}")
+        return iter([_clone(doc) for doc in docs])
+
+    def count_documents(self, filter: Mapping | None = None, **kwargs) -> int:
+        return len(self._select(filter))
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    # Escrituras
+
+    def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        with self._lock:
+            document.setdefault("_id", ObjectId())
+            self._store(_clone(document))
+        return InsertOneResult(document["_id"], True)
+
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        # Igual que el driver: con ordered=False sigue tras un duplicado y al final
+        # lanza BulkWriteError con todos los errores
+        inserted_ids, errors = [], []
+        with self._lock:
+            for position, document in enumerate(documents):
+                document.setdefault("_id", ObjectId())
+                try:
+                    self._store(_clone(document))
+                except DuplicateKeyError as e:
+                    errors.append({"index": position, "code": e.code, "errmsg": str(e), "op": document})
+                    if ordered:
+                        break
+                    continue
+                inserted_ids.append(document["_id"])
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted_ids),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return InsertManyResult(inserted_ids, True)
+
+    def _update(self, filter: Mapping, update: Mapping, upsert: bool, many: bool) -> UpdateResult:
+        with self._lock:
+            docs = self._select(filter)
+            if not many:
+                docs = docs[:1]
+            modified = 0
+            for doc in docs:
+                updated = _clone(doc)
+                _apply_update(updated, update)
+                if updated != doc:
+                    self._store(updated, previous=doc)
+                    modified += 1
+            if docs or not upsert:
+                return UpdateResult({"n": len(docs), "nModified": modified}, True)
+
+            new_doc = {
+                key: _clone(value) for key, value in filter.items()
+                if not key.startswith("$") and not isinstance(value, Mapping)
+            }
+            _apply_update(new_doc, update, inserting=True)
+            new_doc.setdefault("_id", ObjectId())
+            self._store(new_doc)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": new_doc["_id"]}, True)
+
+    def update_one(self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, many=False)
+
+    def update_many(self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, many=True)
+
+    def bulk_write(self, requests: Iterable[UpdateOne | UpdateMany], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        # Solo las operaciones de actualización; corren en orden con el lock tomado
+        matched = modified = 0
+        upserted = []
+        with self._lock:
+            for position, request in enumerate(requests):
+                if not isinstance(request, (UpdateOne, UpdateMany)):
+                    raise ValueError(f"Unsupported bulk operation {type(request).__name__}")
+                result = self._update(request._filter, request._doc, request._upsert, many=isinstance(request, UpdateMany))
+                if result.upserted_id is not None:
+                    upserted.append({"index": position, "_id": result.upserted_id})
+                else:
+                    matched += result.matched_count
+                    modified += result.modified_count
+        return BulkWriteResult({
+            "nInserted": 0, "nUpserted": len(upserted), "nMatched": matched, "nModified": modified,
+            "nRemoved": 0, "upserted": upserted, "writeErrors": [], "writeConcernErrors": [],
+        }, True)
+
+    def replace_one(self, filter: Mapping, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        with self._lock:
+            docs = self._select(filter)[:1]
+            if docs:
+                new_doc = _clone(replacement)
+                new_doc["_id"] = docs[0]["_id"]
+                self._store(new_doc, previous=docs[0])
+                return UpdateResult({"n": 1, "nModified": 1}, True)
+            if not upsert:
+                return UpdateResult({"n": 0, "nModified": 0}, True)
+            new_doc = _clone(replacement)
+            new_doc.setdefault("_id", filter.get("_id", ObjectId()))
+            self._store(new_doc)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": new_doc["_id"]}, True)
+
+    def delete_one(self, filter: Mapping, **kwargs) -> DeleteResult:
+        with self._lock:
+            docs = self._select(filter)[:1]
+            for doc in docs:
+                self._remove(doc["_id"])
+        return DeleteResult({"n": len(docs)}, True)
+
+    def delete_many(self, filter: Mapping, **kwargs) -> DeleteResult:
+        with self._lock:
+            docs = self._select(filter)
+            for doc in docs:
+                self._remove(doc["_id"])
+        return DeleteResult({"n": len(docs)}, True)
+
+    def drop(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            for index in self._indexes.values():
+                index.buckets.clear()
+                index.entries.clear()
+
+    def with_options(self, **kwargs) -> "InMemoryCollection":
+        # No hay réplicas ni codecs: las opciones no cambian el comportamiento
+        return self
+
+
+def _change_event(token: int, database: str, collection: str, doc: dict | None, previous: dict | None) -> dict:
+    source = doc if doc is not None else previous
+    event = {
+        "_id": {"_data": f"{token:016x}"},
+        "ns": {"db": database, "coll": collection},
+        "documentKey": {"_id": source["_id"]},
+    }
+    if previous is None:
+        event.update(operationType="insert", fullDocument=_clone(doc))
+    elif doc is None:
+        event["operationType"] = "delete"
+    else:
+        # Se reporta como update (lo que genera `update_one`); `replace_one` también llega aquí
+        event["operationType"] = "update"
+        event["updateDescription"] = {
+            "updatedFields": {k: _clone(v) for k, v in doc.items() if previous.get(k, _MISSING) != v},
+            "removedFields": [k for k in previous if k not in doc],
+        }
+    return event
+
+
+class InMemoryChangeStream:
+    """Change stream compatible con el que devuelve `Database.watch()` de pymongo."""
+
+    def __init__(self, database: "InMemoryDatabase", pipeline: list | None, full_document: str | None, max_await_time_ms: int | None):
+        self._database = database
+        self._filters = [stage["$match"] for stage in pipeline or [] if "$match" in stage]
+        self._full_document = full_document
+        self._max_await = (max_await_time_ms or 1000) / 1000
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.alive = True
+        self.resume_token: dict | None = None
+
+    def _push(self, event: dict, doc: dict | None) -> None:
+        if all(match(event, query) for query in self._filters):
+            if self._full_document == "updateLookup" and event["operationType"] == "update":
+                event = {**event, "fullDocument": _clone(doc)}
+            self._queue.put(event)
+
+    def try_next(self) -> dict | None:
+        """Siguiente cambio, o None si no llega ninguno en `max_await_time_ms`."""
+        if not self.alive:
+            raise StopIteration
+        try:
+            event = self._queue.get(timeout=self._max_await)
+        except queue.Empty:
+            return None
+        self.resume_token = event["_id"]
+        return event
+
+    def next(self) -> dict:
+        while True:
+            event = self.try_next()
+            if event is not None:
+                return event
+
+    __next__ = next
+
+    def __iter__(self) -> "InMemoryChangeStream":
+        return self
+
+    def close(self) -> None:
+        self.alive = False
+        self._database._unwatch(self)
+
+    def __enter__(self) -> "InMemoryChangeStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class InMemoryDatabase:
+    """Base de datos en memoria; las colecciones se crean al primer acceso."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: dict[str, InMemoryCollection] = {}
+        self._lock = threading.Lock()
+        self._streams: list[InMemoryChangeStream] = []
+        self._tokens = itertools.count(1)
+
+    def get_collection(self, name: str, **kwargs) -> InMemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = InMemoryCollection(name, database=self)
+            return self._collections[name]
+
+    def watch(
+        self, pipeline: list | None = None, full_document: str | None = None,
+        max_await_time_ms: int | None = None, **kwargs
+    ) -> InMemoryChangeStream:
+        # Solo cambios nuevos: `resume_after` y `start_at_operation_time` se ignoran
+        stream = InMemoryChangeStream(self, pipeline, full_document, max_await_time_ms)
+        with self._lock:
+            self._streams.append(stream)
+        return stream
+
+    def _unwatch(self, stream: InMemoryChangeStream) -> None:
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def _publish(self, collection: str, doc: dict | None, previous: dict | None) -> None:
+        if not self._streams:
+            return
+        event = _change_event(next(self._tokens), self.name, collection, doc, previous)
+        for stream in list(self._streams):
+            stream._push(event, doc)
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    def list_collection_names(self) -> list[str]:
+        with self._lock:
+            return list(self._collections)
+
+    def drop_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
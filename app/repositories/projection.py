@@ -0,0 +1,110 @@
+"""
+Consultas con proyección: los repositorios reciben un conjunto opcional de
+campos del modelo de salida, piden a Mongo solo esos campos y devuelven un
+modelo parcial tipado con los mismos tipos y validaciones del modelo completo.
+"""
+from functools import lru_cache
+from typing import Any, Iterable, Mapping
+
+from pydantic import BaseModel, create_model
+
+Fields = Iterable[str] | None
+
+
+def normalize_fields(model: type[BaseModel], fields: Fields) -> frozenset[str] | None:
+    """
+    Valida los campos pedidos contra el modelo.
+
+    Args:
+        model (type[BaseModel]): El modelo completo.
+        fields (Iterable[str] | None): Los campos pedidos; None son todos.
+
+    Returns:
+        frozenset[str] | None: Los campos, o None si se piden todos.
+
+    Raises:
+        ValueError: Si algún campo no existe en el modelo.
+    """
+    if fields is None:
+        return None
+    fields = frozenset(fields)
+    unknown = fields - model.model_fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields for {model.__name__}: {', '.join(sorted(unknown))}")
+    if fields == model.model_fields.keys():
+        return None
+    return fields
+
+
+@lru_cache(maxsize=None)
+def partial_model(model: type[BaseModel], fields: frozenset[str]) -> type[BaseModel]:
+    """
+    Modelo con solo `fields` del modelo completo (se crea una vez por combinación).
+
+    Args:
+        model (type[BaseModel]): El modelo completo.
+        fields (frozenset[str]): Los campos del modelo parcial.
+
+    Returns:
+        type[BaseModel]: El modelo parcial.
+    """
+    definitions = {
+        name: (info.annotation, info)
+        for name, info in model.model_fields.items()
+        if name in fields
+    }
+    return create_model(f"{model.__name__}Partial", __doc__=model.__doc__, **definitions)
+
+
+def mongo_projection(fields: frozenset[str] | None) -> dict | None:
+    """
+    Proyección de Mongo para los campos de un modelo de salida (`id` es `_id`).
+
+    Args:
+        fields (frozenset[str] | None): Los campos pedidos; None son todos.
+
+    Returns:
+        dict | None: La proyección, o None para traer el documento completo.
+    """
+    if fields is None:
+        return None
+    projection = {name: 1 for name in fields if name != "id"}
+    if "id" not in fields:
+        projection["_id"] = 0
+    return projection
+
+
+def to_model(model: type[BaseModel], document: Mapping[str, Any], fields: frozenset[str] | None) -> BaseModel:
+    """
+    Convierte un documento de Mongo en el modelo completo o en el parcial.
+
+    Args:
+        model (type[BaseModel]): El modelo completo.
+        document (Mapping[str, Any]): El documento (completo o proyectado).
+        fields (frozenset[str] | None): Los campos pedidos; None son todos.
+
+    Returns:
+        BaseModel: Una instancia de `model` o de su modelo parcial.
+    """
+    if "_id" in document:
+        document = {**document, "id": str(document["_id"])}
+    if fields is None:
+        return model(**document)
+    return partial_model(model, fields)(**document)
+
+
+def narrow(instance: BaseModel, fields: frozenset[str] | None) -> BaseModel:
+    """
+    Reduce un modelo ya validado (p.ej. de la caché) a los campos pedidos, sin volver a validar.
+
+    Args:
+        instance (BaseModel): El modelo completo.
+        fields (frozenset[str] | None): Los campos pedidos; None son todos.
+
+    Returns:
+        BaseModel: La misma instancia o una del modelo parcial.
+    """
+    if fields is None:
+        return instance
+    values = {name: getattr(instance, name) for name in fields}
+    return partial_model(type(instance), fields).model_construct(**values)
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Agrupa las consultas concurrentes con la misma llave en una sola.
+
+    La primera llamada para una llave lanza la consulta (en un hilo, porque
+    pymongo es bloqueante) y las demás esperan ese mismo resultado. Con
+    `ttl > 0` el resultado se reutiliza durante `ttl` segundos.
+    """
+
+    def __init__(self, ttl: float = 0.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+        self.calls = 0
+        self.shared = 0
+        self.cached = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecuta `fn(*args, **kwargs)` una sola vez por llave entre llamadas concurrentes.
+
+        Args:
+            key (Hashable): La llave que identifica la consulta.
+            fn (Callable): La función bloqueante a ejecutar.
+
+        Returns:
+            Any: El resultado de `fn`, compartido entre los llamadores.
+        """
+        self.calls += 1
+        if self.ttl > 0:
+            entry = self._results.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.cached += 1
+                    return entry[1]
+                del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+
+        # shield: si un cliente se desconecta no se cancela la consulta de los demás
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if self.ttl <= 0 or task.cancelled() or task.exception() is not None:
+            return
+        if len(self._results) >= self.maxsize:
+            self._results.pop(next(iter(self._results)))
+        self._results[key] = (time.monotonic() + self.ttl, task.result())
+
+    def forget(self, key: Hashable) -> None:
+        """Descarta el resultado guardado para una llave."""
+        self._results.pop(key, None)
+
+    def clear(self) -> None:
+        """Descarta todos los resultados guardados."""
+        self._results.clear()
@@ -1,18 +1,117 @@
-from db import db
+from db import ReadRoute, causal_session, get_collection
+from pymongo.client_session import ClientSession
+from pymongo.errors import BulkWriteError
 from schema.transactions import Transaction
+from repositories.projection import Fields, mongo_projection, normalize_fields, to_model
+from repositories.fund_stats import record_transaction, record_transactions
+from responses import raw_batches_to_json
 
-def get_transactions(user_id: str) -> list[Transaction]:
+# Tier frío: un bucket por usuario y mes con las transacciones embebidas (sin `user_id`)
+ARCHIVE_COLLECTION = "transactions_archive"
+
+# Orden cronológico estable: Mongo guarda los timestamps al milisegundo, así que
+# una suscripción y una cancelación del mismo lote pueden empatar; desempata la
+# versión del usuario (el orden en que se registraron) y, sin ella, el `_id`
+CHRONOLOGICAL_KEYS = ("timestamp", "user_version", "_id")
+
+def get_archived_transactions(
+    user_id: str, fund_id: str | None = None, route: ReadRoute = ReadRoute.SECONDARY, session: ClientSession | None = None,
+) -> list[dict]:
+    """
+    Obtiene las transacciones archivadas de un usuario, en orden cronológico.
+
+    Args:
+        user_id (str): El ID del usuario.
+        fund_id (str | None): Si se pasa, solo las de ese fondo.
+        route (ReadRoute): Desde dónde se lee.
+        session (ClientSession | None): La sesión causal, si hay.
+
+    Returns:
+        list[dict]: Documentos con la misma forma que los de `transactions`.
+    """
+    archive = get_collection(ARCHIVE_COLLECTION, route)
+    if fund_id is not None:
+        # Solo los buckets con transacciones del fondo (índice multikey) y de ellos solo esas
+        return [
+            {**document["transactions"], "user_id": user_id}
+            for document in archive.aggregate(_fund_pipeline(user_id, fund_id, 1), session=session)
+        ]
+    buckets = archive.find({"user_id": user_id}, {"transactions": 1}, session=session).sort("month", 1)
+    archived = []
+    for bucket in buckets:
+        for transaction in sorted(bucket["transactions"], key=lambda t: t["timestamp"]):
+            archived.append({**transaction, "user_id": user_id})
+    return archived
+
+def _fund_pipeline(user_id: str, fund_id: str, direction: int) -> list[dict]:
+    # Las transacciones archivadas de un fondo, en orden cronológico estable
+    return [
+        {"$match": {"user_id": user_id, "transactions.fund_id": fund_id}},
+        {"$unwind": "$transactions"},
+        {"$match": {"transactions.fund_id": fund_id}},
+        {"$sort": {f"transactions.{key}": direction for key in CHRONOLOGICAL_KEYS}},
+    ]
+
+def _project_archived(documents: list[dict], fields: frozenset[str] | None) -> list[dict]:
+    # Misma proyección que `mongo_projection` sobre los documentos del tier frío
+    if fields is None:
+        return documents
+    keys = {("_id" if field == "id" else field) for field in fields}
+    return [{key: value for key, value in document.items() if key in keys} for document in documents]
+
+def _without_duplicates(archived: list[dict], hot: list[dict]) -> list[dict]:
+    # Mientras el archivador mueve un lote, una transacción puede estar en ambos tiers
+    hot_ids = {document.get("_id") for document in hot}
+    return [document for document in archived if document.get("_id") not in hot_ids]
+
+def get_transactions(user_id: str, fields: Fields = None) -> list[Transaction]:
+    """
+    Obtiene todas las transacciones asociadas a un usuario específico, primero
+    las archivadas (tier frío) y luego las de `transactions`.
+
+    Args:
+        user_id (str): El ID del usuario para el cual se obtendrán las transacciones.
+        fields (Iterable[str] | None): Los campos de `Transaction` que se necesitan; None son todos.
+
+    Returns:
+        list[Transaction]: Una lista de transacciones asociadas al usuario
+        (modelos parciales si se pasa `fields`).
+    """
+    fields = normalize_fields(Transaction, fields)
+    # Historial: se lee de las secundarias, con sesión causal para ver las escrituras del propio usuario
+    with causal_session(user_id) as session:
+        hot = list(get_collection("transactions", ReadRoute.SECONDARY).find(
+            {"user_id": user_id}, mongo_projection(fields and fields | {"id"}), session=session
+        ))
+        archived = get_archived_transactions(user_id, session=session)
+    # El _id se trae para descartar duplicados aunque no se haya pedido; el modelo parcial lo ignora
+    archived = _project_archived(_without_duplicates(archived, hot), fields)
+    return [to_model(Transaction, transaction, fields) for transaction in archived + hot]
+
+def get_transactions_json(user_id: str, fields: Fields = None) -> bytes:
     """
-    Obtiene todas las transacciones asociadas a un usuario específico.
+    Igual que `get_transactions`, pero devuelve directamente el arreglo JSON.
+
+    Lee los lotes de BSON crudo del driver y los convierte a JSON sin crear
+    diccionarios de pymongo ni modelos de Pydantic por documento. Para los
+    historiales grandes y las exportaciones.
 
     Args:
         user_id (str): El ID del usuario para el cual se obtendrán las transacciones.
+        fields (Iterable[str] | None): Los campos de `Transaction` que se necesitan; None son todos.
 
     Returns:
-        list[Transaction]: Una lista de transacciones asociadas al usuario.
+        bytes: El JSON con las transacciones del usuario.
     """
-    transactions = db.transactions.find({"user_id": user_id})
-    return [Transaction(id = str(transaction["_id"]), **transaction) for transaction in transactions]
+    # Sin `fields` también se proyecta: solo salen los campos del esquema `Transaction`
+    fields = normalize_fields(Transaction, fields) or frozenset(Transaction.model_fields)
+    with causal_session(user_id) as session:
+        archived = get_archived_transactions(user_id, session=session)
+        batches = get_collection("transactions", ReadRoute.SECONDARY).find_raw_batches(
+            {"user_id": user_id}, mongo_projection(fields), session=session
+        )
+        # Los duplicados entre tiers se descartan por `id`, que viene salvo que se excluya
+        return raw_batches_to_json(batches, older=_project_archived(archived, fields))
 
 def create_transaction(transaction_data: dict) -> Transaction:
     """
@@ -24,20 +123,97 @@ def create_transaction(transaction_data: dict) -> Transaction:
     Returns:
         Transaction: La transacción creada
     """
-    inserted_transaction = db.transactions.insert_one(transaction_data)
-    transaction = db.transactions.find_one({"_id": inserted_transaction.inserted_id})
+    transactions = get_collection("transactions")
+    with causal_session(transaction_data["user_id"]) as session:
+        inserted_transaction = transactions.insert_one(transaction_data, session=session)
+        transaction = transactions.find_one({"_id": inserted_transaction.inserted_id}, session=session)
+    record_transaction(transaction)
     return Transaction(id = str(transaction["_id"]), **transaction)
 
-def get_transactions_by_user_and_fund(user_id: str, fund_id: str) -> list[Transaction]:
+def create_transaction_batch(transactions_data: list[dict]) -> list[Transaction]:
+    """
+    Crea varias transacciones de un mismo usuario en una sola escritura ordenada.
+
+    Si una choca con un índice único (otra escritura ya tomó su `user_version`)
+    la escritura se detiene ahí. Las anteriores se quedan: ya tomaron sus
+    versiones y otra petición pudo haberlas aplicado al balance con
+    `settle_user_version`, así que borrarlas dejaría el ledger sin transacciones
+    que el balance ya incluye.
+
+    Args:
+        transactions_data (list[dict]): Los datos de las transacciones, en orden.
+
+    Returns:
+        list[Transaction]: Las transacciones creadas, en orden: un prefijo de las
+        pedidas (vacío si la primera ya estaba tomada).
+    """
+    transactions = get_collection("transactions")
+    with causal_session(transactions_data[0]["user_id"]) as session:
+        try:
+            inserted_ids = transactions.insert_many(transactions_data, ordered=True, session=session).inserted_ids
+        except BulkWriteError as e:
+            if e.details["writeErrors"][0]["code"] != 11000:
+                raise
+            inserted_ids = [document["_id"] for document in transactions_data[:e.details["nInserted"]]]
+        if not inserted_ids:
+            return []
+        stored = {
+            transaction["_id"]: transaction
+            for transaction in transactions.find({"_id": {"$in": inserted_ids}}, session=session)
+        }
+    created = [stored[transaction_id] for transaction_id in inserted_ids]
+    record_transactions(created)
+    return [Transaction(id=str(transaction["_id"]), **transaction) for transaction in created]
+
+def get_transactions_by_user_and_fund(user_id: str, fund_id: str, fields: Fields = None) -> list[Transaction]:
     """
-    Obtiene todas las transacciones de un usuario para un fondo específico.
+    Obtiene todas las transacciones de un usuario para un fondo específico,
+    incluidas las archivadas (el estado de la suscripción depende de todo el historial).
+
+    Args:
+        user_id (str): El ID del usuario.
+        fund_id (str): El ID del fondo.
+        fields (Iterable[str] | None): Los campos de `Transaction` que se necesitan; None son todos.
+
+    Returns:
+        list[Transaction]: Una lista de transacciones del usuario para el fondo especificado
+        (modelos parciales si se pasa `fields`).
+    """
+    fields = normalize_fields(Transaction, fields)
+    # Lo usa el flujo de suscripción: se lee del primario
+    hot = list(get_collection("transactions").find(
+        {"user_id": user_id, "fund_id": fund_id}, mongo_projection(fields and fields | {"id"})
+    ))
+    archived = get_archived_transactions(user_id, fund_id, route=ReadRoute.PRIMARY)
+    archived = _project_archived(_without_duplicates(archived, hot), fields)
+    return [to_model(Transaction, transaction, fields) for transaction in archived + hot]
+
+def get_latest_transaction_for_fund(user_id: str, fund_id: str, fields: Fields = None) -> Transaction | None:
+    """
+    Obtiene la última transacción de un usuario en un fondo, de cualquiera de los dos tiers.
+
+    El estado de la suscripción solo depende de la última: se busca primero en
+    el tier caliente (índice user_id, fund_id, timestamp, user_version, _id) y solo si no hay se
+    pide al archivo la última del fondo, así el costo no crece con el historial.
 
     Args:
         user_id (str): El ID del usuario.
         fund_id (str): El ID del fondo.
+        fields (Iterable[str] | None): Los campos de `Transaction` que se necesitan; None son todos.
 
     Returns:
-        list[Transaction]: Una lista de transacciones del usuario para el fondo especificado.
+        Transaction | None: La transacción (modelo parcial si se pasa `fields`), o None si no hay.
     """
-    transactions = db.transactions.find({"user_id": user_id, "fund_id": fund_id})
-    return [Transaction(id = str(transaction["_id"]), **transaction) for transaction in transactions]
+    fields = normalize_fields(Transaction, fields)
+    # Lo usa el flujo de suscripción: se lee del primario
+    latest = get_collection("transactions").find_one(
+        {"user_id": user_id, "fund_id": fund_id}, mongo_projection(fields),
+        sort=[(key, -1) for key in CHRONOLOGICAL_KEYS],
+    )
+    if latest is None:
+        pipeline = _fund_pipeline(user_id, fund_id, -1) + [{"$limit": 1}]
+        archived = next(get_collection(ARCHIVE_COLLECTION).aggregate(pipeline), None)
+        if archived is None:
+            return None
+        latest = _project_archived([{**archived["transactions"], "user_id": user_id}], fields)[0]
+    return to_model(Transaction, latest, fields)
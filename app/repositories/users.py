@@ -1,9 +1,40 @@
-from db import db
+from db import causal_session, get_db
+from config import settings
 from schema.users import UserOut
 from bson import ObjectId
+from repositories.singleflight import SingleFlight
+from cache import TTLCache
+from repositories.projection import Fields, mongo_projection, narrow, normalize_fields, to_model
+from repositories.balances import delta, save_snapshot
+from datetime import datetime, timezone
+from metrics import registry
 
 DEFAULT_INITIAL_BALANCE = 500_000
 
+_user_flight = SingleFlight(ttl=settings.singleflight_user_ttl)
+
+user_writes = registry.counter("user_writes_total", "Escrituras de balance por operación y resultado (committed, exhausted)")
+version_conflicts = registry.counter("user_version_conflicts_total", "Escrituras que perdieron la versión del usuario y se reintentaron")
+
+# Perfiles por `sub` de Cognito y el índice inverso id de usuario -> `sub`,
+# necesario para invalidar cuando solo se conoce el id (p.ej. al cambiar el balance)
+_profile_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+_cognito_ids = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+def invalidate_user(user_id: str | None = None, cognito_id: str | None = None) -> None:
+    """
+    Descarta el perfil guardado de un usuario.
+
+    Args:
+        user_id (str | None): El ID del usuario.
+        cognito_id (str | None): El ID de Cognito del usuario.
+    """
+    if user_id is not None:
+        cognito_id = _cognito_ids.pop(user_id, cognito_id)
+    if cognito_id is not None:
+        _profile_cache.pop(cognito_id)
+    _user_flight.clear()
+
 def get_user_by_email(email: str) -> dict | None:
     """
     Obtiene un usuario de la base de datos por su correo electrónico.
@@ -13,21 +44,60 @@ def get_user_by_email(email: str) -> dict | None:
     Returns:
         dict | None: El documento del usuario si se encuentra, de lo contrario None.
     """
-    return db.users.find_one({"email": email})
+    return get_db().users.find_one({"email": email})
 
-def get_user_by_cognito_id(cognito_id: str) -> dict | None:
+def get_user_by_cognito_id(cognito_id: str, use_cache: bool = True, fields: Fields = None) -> UserOut | None:
     """
     Obtiene un usuario de la base de datos por su ID de Cognito.
 
     Args:
         cognito_id (str): El ID de Cognito del usuario a buscar.   
+        use_cache (bool): Si se puede responder desde la caché de perfiles.
+        fields (Iterable[str] | None): Los campos de `UserOut` que se necesitan; None son todos.
     
     Returns:
-        dict | None: El documento del usuario si se encuentra, de lo contrario None.
+        UserOut | None: El usuario si se encuentra (un modelo parcial si se pasa
+        `fields`), de lo contrario None.
     """
-    user = db.users.find_one({"cognito_id": cognito_id})
+    fields = normalize_fields(UserOut, fields)
+    if use_cache:
+        cached = _profile_cache.get(cognito_id)
+        if cached is not None:
+            return narrow(cached, fields)
 
-    return UserOut(id=str(user["_id"]), **user) if user else None
+    user = get_db().users.find_one({"cognito_id": cognito_id}, mongo_projection(fields))
+    if not user:
+        return None
+    if fields is not None:
+        # Un perfil parcial no se guarda en la caché
+        return to_model(UserOut, user, fields)
+
+    user_out = UserOut(id=str(user["_id"]), **user)
+    _profile_cache.set(cognito_id, user_out)
+    _cognito_ids.set(user_out.id, cognito_id)
+    return user_out
+
+async def fetch_user_by_cognito_id(cognito_id: str, use_cache: bool = True, fields: Fields = None) -> UserOut | None:
+    """
+    Versión asíncrona de `get_user_by_cognito_id`: las peticiones concurrentes
+    para el mismo usuario comparten una sola consulta.
+
+    Args:
+        cognito_id (str): El ID de Cognito del usuario a buscar.
+        use_cache (bool): Si se puede responder desde la caché de perfiles.
+        fields (Iterable[str] | None): Los campos de `UserOut` que se necesitan; None son todos.
+
+    Returns:
+        UserOut | None: El usuario si se encuentra, de lo contrario None.
+    """
+    fields = normalize_fields(UserOut, fields)
+    if use_cache:
+        cached = _profile_cache.get(cognito_id)
+        if cached is not None:
+            return narrow(cached, fields)
+    return await _user_flight.do(
+        (cognito_id, use_cache, fields), get_user_by_cognito_id, cognito_id, use_cache, fields
+    )
 
 def create_user(email: str, phone: str, cognito_id: str) -> UserOut:
     """
@@ -52,25 +122,95 @@ def create_user(email: str, phone: str, cognito_id: str) -> UserOut:
         "balance": DEFAULT_INITIAL_BALANCE,
         "notif_options": "email",
         "cognito_id": cognito_id,
+        "version": 0,
     }
-    inserted_user = db.users.insert_one(user)
+    inserted_user = get_db().users.insert_one(user)
+    # Snapshot inicial: el balance del usuario parte del monto de bienvenida
+    save_snapshot(str(inserted_user.inserted_id), datetime.now(timezone.utc), DEFAULT_INITIAL_BALANCE)
+    invalidate_user(cognito_id=cognito_id)
     final_user: UserOut = UserOut(id=str(inserted_user.inserted_id), **user)
     return final_user
 
-def update_user_balance(user_id: str, new_balance: float) -> None:
+def _at_version(user_id: str, version: int) -> dict:
+    # Los usuarios creados antes de las versiones no tienen el campo: cuentan como versión 0
+    return {"_id": ObjectId(user_id), "version": {"$in": [0, None]} if version == 0 else version}
+
+def apply_balance_change(user_id: str, version: int, amount: int, count: int = 1) -> bool:
     """
-    Actualiza el balance de un usuario en la base de datos.
-    
+    Suma `amount` al balance del usuario si sigue en `version` y lo pasa a `version + count`.
+
     Args:
         user_id (str): El ID del usuario a actualizar.
-        new_balance (float): El nuevo balance del usuario.
-    
+        version (int): La versión del usuario sobre la que se calculó el cambio.
+        amount (int): El cambio del balance (negativo al suscribirse).
+        count (int): Transacciones que resume el cambio (una versión por transacción).
+
     Returns:
-        bool: True si la actualización fue exitosa, False en caso contrario.
+        bool: True si se aplicó, False si el usuario ya no estaba en `version`.
     """
-    user = db.users.find_one({"_id": ObjectId(user_id)})
-    if not user:
+    with causal_session(user_id) as session:
+        result = get_db().users.update_one(
+            _at_version(user_id, version),
+            {"$inc": {"balance": amount}, "$set": {"version": version + count}},
+            session=session,
+        )
+    # El balance cambió: no se puede seguir sirviendo el perfil guardado
+    invalidate_user(user_id=user_id)
+    return result.modified_count == 1
+
+def settle_user_version(user_id: str, version: int) -> bool:
+    """
+    Aplica al usuario las transacciones que ya tomaron las versiones siguientes a `version`.
+
+    Una escritura primero registra sus transacciones con `user_version` (el
+    índice único decide quién gana cada versión) y después cambia el balance. Si
+    quien ganó todavía no lo cambió, o se cayó entre los dos pasos, el que pierde
+    lo completa antes de reintentar; `apply_balance_change` es condicional, así
+    que solo uno de los dos lo aplica.
+
+    Args:
+        user_id (str): El ID del usuario.
+        version (int): La versión del usuario que se leyó.
+
+    Returns:
+        bool: True si había transacciones pendientes y se aplicaron.
+    """
+    pending = get_db().transactions.find(
+        {"user_id": user_id, "user_version": {"$gt": version}}, {"transaction_type": 1, "amount": 1, "user_version": 1}
+    ).sort("user_version", 1)
+    # Solo las versiones consecutivas: una escritura registra las suyas de una vez
+    settled = []
+    for transaction in pending:
+        if transaction["user_version"] != version + len(settled) + 1:
+            break
+        settled.append(transaction)
+    if not settled:
         return False
-    db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"balance": new_balance}})
-    return True
+    return apply_balance_change(user_id, version, sum(delta(transaction) for transaction in settled), len(settled))
 
+def commit_balance_change(user_id: str, version: int, amount: int, count: int = 1) -> None:
+    """
+    Aplica el cambio de balance de transacciones ya registradas con las versiones `version + 1 .. version + count`.
+
+    Si `apply_balance_change` no lo aplica es porque otra petición movió la
+    versión con `settle_user_version` (quizá solo una parte del lote, si lo vio
+    a medio insertar): se completa hasta que el usuario pase de `version + count`.
+
+    Raises:
+        RuntimeError: Si la versión del usuario no avanza hasta cubrir el lote.
+    """
+    if apply_balance_change(user_id, version, amount, count):
+        return
+    target = version + count
+    while True:
+        user = get_db().users.find_one({"_id": ObjectId(user_id)}, {"version": 1})
+        current = (user or {}).get("version", 0)
+        if current >= target:
+            return
+        if not settle_user_version(user_id, current):
+            # Otro pudo aplicarlo entre la lectura y el intento: solo es un error si nadie avanzó
+            user = get_db().users.find_one({"_id": ObjectId(user_id)}, {"version": 1})
+            if (user or {}).get("version", 0) == current:
+                raise RuntimeError(
+                    f"User {user_id} is at version {current}, expected at least {target} after writing its transactions"
+                )
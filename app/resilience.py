@@ -0,0 +1,222 @@
+"""
+Circuit breaker y bulkhead para las llamadas a proveedores de AWS.
+
+Cada dependencia ("ses", "sns", "cognito", "secretsmanager") tiene un límite
+de llamadas simultáneas (bulkhead) y un circuito que se abre tras
+`failure_threshold` fallos seguidos. Con el circuito abierto las llamadas
+fallan de inmediato con `CircuitOpenError`; pasado `reset_timeout` se deja
+pasar una llamada de prueba (half-open) que decide si se cierra o se vuelve a abrir.
+"""
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable
+
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from config import settings
+from exceptions import BulkheadFullError, CircuitOpenError
+from metrics import registry
+
+circuit_state_gauge = registry.gauge("circuit_state", "Estado del circuito (0=closed, 1=half_open, 2=open)")
+circuit_rejections = registry.counter("circuit_rejections_total", "Llamadas rechazadas sin llegar al proveedor")
+circuit_failures = registry.counter("circuit_failures_total", "Fallos registrados por el circuito")
+bulkhead_inflight = registry.gauge("bulkhead_inflight", "Llamadas en curso por dependencia")
+
+# Errores de AWS que indican un problema del proveedor y no de la petición
+RETRYABLE_ERROR_CODES = {
+    "Throttling", "ThrottlingException", "TooManyRequestsException",
+    "RequestLimitExceeded", "ServiceUnavailable", "InternalFailure",
+    "InternalErrorException", "InternalServiceError",
+}
+
+
+def aws_client_config(max_pool_connections: int = 10) -> Config:
+    """Configuración de botocore con timeouts y reintentos acotados."""
+    return Config(
+        connect_timeout=settings.aws_connect_timeout,
+        read_timeout=settings.aws_read_timeout,
+        retries={"max_attempts": settings.aws_max_attempts, "mode": "standard"},
+        max_pool_connections=max_pool_connections,
+    )
+
+
+def is_dependency_failure(exc: BaseException) -> bool:
+    """
+    Indica si una excepción cuenta como fallo del proveedor.
+
+    Los errores de cliente (4xx como usuario inexistente o contraseña inválida)
+    no abren el circuito.
+    """
+    if isinstance(exc, ClientError):
+        error = exc.response.get("Error", {})
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return status >= 500 or error.get("Code") in RETRYABLE_ERROR_CODES
+    return isinstance(exc, (BotoCoreError, OSError))
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """Lanza `CircuitOpenError` si la llamada no debe llegar al proveedor."""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        circuit_rejections.inc(dependency=self.name, reason="open")
+        raise CircuitOpenError(self.name, "circuit is open", retry_after=retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        circuit_failures.inc(dependency=self.name)
+        with self._lock:
+            self._failures += 1
+            if self._state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Libera el cupo de prueba si la llamada terminó sin veredicto (error de cliente)."""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self) -> None:
+        if self.max_wait > 0:
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            circuit_rejections.inc(dependency=self.name, reason="bulkhead")
+            raise BulkheadFullError(self.name, f"more than {self.max_concurrent} concurrent calls")
+        bulkhead_inflight.inc(dependency=self.name)
+
+    def release(self) -> None:
+        bulkhead_inflight.dec(dependency=self.name)
+        self._semaphore.release()
+
+
+class Dependency:
+    """Agrupa el bulkhead y el circuito de una dependencia externa."""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, bulkhead: Bulkhead):
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecuta la llamada al proveedor protegida por el bulkhead y el circuito.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto.
+            BulkheadFullError: Si no hay cupo para otra llamada simultánea.
+        """
+        self.breaker.before_call()
+        try:
+            self.bulkhead.acquire()
+        except BulkheadFullError:
+            self.breaker.release_probe()
+            raise
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_dependency_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+            raise
+        finally:
+            self.bulkhead.release()
+        self.breaker.record_success()
+        return result
+
+
+_dependencies: dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+
+def get_dependency(name: str) -> Dependency:
+    """
+    Obtiene (o crea) la protección compartida de una dependencia.
+
+    Args:
+        name (str): "ses", "sns", "cognito" o "secretsmanager".
+
+    Returns:
+        Dependency: La dependencia con su circuito y bulkhead.
+    """
+    with _dependencies_lock:
+        dependency = _dependencies.get(name)
+        if dependency is None:
+            dependency = _dependencies[name] = Dependency(
+                name,
+                CircuitBreaker(
+                    name,
+                    failure_threshold=settings.circuit_failure_threshold,
+                    reset_timeout=settings.circuit_reset_timeout,
+                ),
+                Bulkhead(
+                    name,
+                    max_concurrent=settings.bulkhead_limits.get(name, settings.bulkhead_default_limit),
+                    max_wait=settings.bulkhead_max_wait,
+                ),
+            )
+        return dependency
+
+
+def _export_circuit_states() -> None:
+    with _dependencies_lock:
+        dependencies = list(_dependencies.values())
+    for dependency in dependencies:
+        circuit_state_gauge.set(_STATE_VALUES[dependency.breaker.state], dependency=dependency.name)
+
+
+registry.add_collector(_export_circuit_states)
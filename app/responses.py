@@ -0,0 +1,84 @@
+from typing import Any, Iterable
+
+import bson
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse, Response
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    Respuesta JSON por defecto de la API, serializada con orjson.
+
+    orjson codifica de forma nativa `datetime`, `Enum` y `UUID`. Las fechas
+    sin zona horaria que devuelve Mongo se tratan como UTC y se emiten con
+    sufijo "Z", igual que la serialización de Pydantic.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=JSON_OPTIONS)
+
+
+def _encode_bson_value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps_bson(value: Any) -> bytes:
+    """Serializa con orjson valores que vienen de Mongo (`ObjectId` se emite como texto)."""
+    return orjson.dumps(value, default=_encode_bson_value, option=JSON_OPTIONS)
+
+
+def raw_batches_to_json(batches: Iterable[bytes], older: Iterable[dict] = ()) -> bytes:
+    """
+    Convierte lotes de BSON crudo (`find_raw_batches`) en un arreglo JSON.
+
+    Cada lote se decodifica con la extensión en C de `bson` y se serializa con
+    orjson antes de pasar al siguiente, sin modelos de Pydantic de por medio:
+    en memoria solo están los diccionarios de un lote y los bytes de salida.
+    `_id` se emite como `id` (texto), igual que los modelos de salida.
+
+    Args:
+        batches (Iterable[bytes]): Los lotes de documentos BSON concatenados.
+        older (Iterable[dict]): Documentos ya decodificados (p.ej. del archivo) que van
+            antes de los lotes; se omiten los que también vienen en los lotes.
+
+    Returns:
+        bytes: El arreglo JSON.
+    """
+    chunks = []
+    seen = set()
+    for batch in batches:
+        documents = bson.decode_all(batch)
+        if not documents:
+            continue
+        for document in documents:
+            if "_id" in document:
+                document["id"] = document.pop("_id")
+                seen.add(document["id"])
+        # Se quitan los corchetes de cada lote y se unen los lotes con comas
+        chunks.append(dumps_bson(documents)[1:-1])
+    older = [
+        {("id" if key == "_id" else key): value for key, value in document.items()}
+        for document in older if document.get("_id") not in seen
+    ]
+    if older:
+        chunks.insert(0, dumps_bson(older)[1:-1])
+    return b"[" + b",".join(chunks) + b"]"
+
+
+def raw_json_response(content: bytes, status_code: int = 200) -> Response:
+    """
+    Respuesta con un cuerpo JSON ya serializado.
+
+    Args:
+        content (bytes): El JSON.
+        status_code (int): El código de estado de la respuesta.
+
+    Returns:
+        Response: La respuesta con `Content-Type: application/json`.
+    """
+    return Response(content=content, status_code=status_code, media_type="application/json")
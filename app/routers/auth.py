@@ -3,15 +3,18 @@ from fastapi.security import OAuth2PasswordBearer
 import boto3, hmac, hashlib, base64
 from botocore.exceptions import ClientError
 from config import settings
+from resilience import aws_client_config, get_dependency
 from schema.auth import (
     SignupIn, ConfirmIn, LoginIn
 )
 from repositories.users import create_user
 
 
+# Las rutas son síncronas: FastAPI las corre en su threadpool, así las llamadas a
+# Cognito y la espera del bulkhead (un semáforo de hilos) no bloquean el event loop
 router = APIRouter(prefix="/auth", tags=["auth"])
-cog = boto3.client("cognito-idp", region_name=settings.region)
-resp = cog.list_user_pools(MaxResults=10)
+cog = boto3.client("cognito-idp", region_name=settings.region, config=aws_client_config())
+cognito = get_dependency("cognito")
 
 oauth2scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -28,7 +31,7 @@ def get_secret_hash(username, app_client_id, app_client_secret):
     return base64.b64encode(digest).decode()
 
 @router.post("/signup")
-async def signup(signup_in: SignupIn):
+def signup(signup_in: SignupIn):
     """Sign up a new user in Cognito.
     
     Args:
@@ -44,7 +47,8 @@ async def signup(signup_in: SignupIn):
             settings.cognito_client_secret
         )
 
-        response = cog.sign_up(
+        response = cognito.call(
+            cog.sign_up,
             ClientId=settings.cognito_client_id,
             Username=signup_in.email,
             Password=signup_in.password,
@@ -60,7 +64,7 @@ async def signup(signup_in: SignupIn):
         raise HTTPException(status_code=400, detail=e.response['Error']['Message'])
     
 @router.post("/confirm")
-async def confirm(confirm_in: ConfirmIn):
+def confirm(confirm_in: ConfirmIn):
     """Confirm a user's sign-up in Cognito.
 
     Args:
@@ -75,7 +79,8 @@ async def confirm(confirm_in: ConfirmIn):
             settings.cognito_client_id,
             settings.cognito_client_secret
         )
-        response = cog.confirm_sign_up(
+        response = cognito.call(
+            cog.confirm_sign_up,
             ClientId=settings.cognito_client_id,
             Username=confirm_in.email,
             ConfirmationCode=confirm_in.confirmation_code,
@@ -86,7 +91,7 @@ async def confirm(confirm_in: ConfirmIn):
         raise HTTPException(status_code=400, detail=e.response['Error']['Message'])
     
 @router.post("/login")
-async def login(login_in: LoginIn):
+def login(login_in: LoginIn):
     """Log in a user to Cognito and return access and refresh tokens.
     
     Args:
@@ -101,7 +106,8 @@ async def login(login_in: LoginIn):
             settings.cognito_client_id,
             settings.cognito_client_secret
         )
-        response = cog.initiate_auth(
+        response = cognito.call(
+            cog.initiate_auth,
             ClientId=settings.cognito_client_id,
             AuthFlow="USER_PASSWORD_AUTH",
             AuthParameters={
@@ -0,0 +1,66 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from change_stream import change_hub
+from config import settings
+from repositories.users import fetch_user_by_cognito_id
+from security.auth import get_current_user
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+async def event_stream(request: Request, user_id: str):
+    """
+    Genera el stream SSE de un usuario: sus transacciones nuevas y los cambios
+    de su balance, con un comentario de heartbeat cuando no hay actividad.
+
+    Args:
+        request (Request): La petición, para detectar la desconexión del cliente.
+        user_id (str): El ID del usuario.
+    """
+    queue = change_hub.subscribe(user_id)
+    try:
+        # El cliente lee el historial una vez y a partir de "ready" solo recibe los cambios
+        yield b"retry: 5000\nevent: ready\ndata: {}\n\n"
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=settings.sse_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": heartbeat\n\n"
+                continue
+            yield b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+    finally:
+        change_hub.unsubscribe(user_id, queue)
+
+
+@router.get("/stream")
+async def stream_events(request: Request, current_user: dict = Depends(get_current_user)):
+    """Stream SSE de las transacciones y el balance del usuario autenticado.
+
+    Eventos:
+        ready: la suscripción está activa.
+        transaction: una transacción nueva (mismo esquema que `/funds/get/transactions`).
+        balance: el nuevo balance del usuario.
+        resync: se perdieron eventos; el cliente debe volver a leer el historial.
+
+    Args:
+        request (Request): La petición.
+        current_user (dict): El usuario autenticado, inyectado por dependencia.
+
+    Returns:
+        StreamingResponse: El stream `text/event-stream`.
+    """
+    user = await fetch_user_by_cognito_id(current_user["sub"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return StreamingResponse(
+        event_stream(request, user.id),
+        media_type="text/event-stream",
+        # Sin caché ni buffering en proxies, para que cada evento llegue de inmediato
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
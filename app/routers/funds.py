@@ -1,26 +1,68 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import random
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from bson.errors import InvalidId
 
-from repositories.funds import get_fund_by_id, get_funds_by_category, get_funds
-from repositories.users import get_user_by_cognito_id, update_user_balance
-from repositories.transactions import get_transactions, create_transaction,  get_transactions_by_user_and_fund
-from schema.funds import FundsCategories, FundsOut
-from schema.users import UserOut, NotificationOptions
+from repositories.funds import fetch_fund_by_id, get_funds_by_category, get_funds
+from repositories.users import (
+    commit_balance_change, fetch_user_by_cognito_id, settle_user_version, user_writes, version_conflicts,
+)
+from repositories.transactions import get_transactions_json, create_transaction_batch, get_latest_transaction_for_fund
+from repositories.fund_stats import get_fund_stats
+from repositories.balances import balance_at, delta
+from balance_compactor import balance_compactor
+from schema.funds import FundsCategories, FundsOut, FundStatsOut
+from schema.users import UserOut, NotificationOptions, BalanceOut
 from schema.transactions import TransactionType, TransactionIn, Transaction
 from datetime import datetime, timezone
 from bson import ObjectId
-from notifications import EmailNotifier, Message, SMSNotifier
+from notifications import DeliveryEngine, Message, NotificationCoalescer
+from notification_templates import NotificationEvent, templates
+from config import settings
+from exceptions import VersionConflictError
+from write_scheduler import WriteScheduler
+from responses import raw_json_response
+from http_cache import catalog_etag, catalog_headers, etag_matches, not_modified
 
 from security.auth import get_current_user
 
-email_notifier = EmailNotifier()
-sms_notifier = SMSNotifier()
+delivery_engine = DeliveryEngine(
+    ses_concurrency=settings.ses_concurrency,
+    sns_concurrency=settings.sns_concurrency,
+    templates=templates,
+)
+
+
+def build_digest(messages: list[Message]) -> Message:
+    """Fusiona varias notificaciones del mismo usuario y evento en un resumen."""
+    variables = {"count": str(len(messages)), "items": "\n".join(message.body for message in messages)}
+    rendered = templates.render(NotificationEvent.DIGEST, **variables)
+    templated = messages[0].template is not None
+    return Message(
+        subject=rendered.subject,
+        body=rendered.text,
+        recipient=messages[0].recipient,
+        template=templates.get(NotificationEvent.DIGEST).ses_name if templated else None,
+        template_data=variables if templated else None,
+    )
+
+
+notification_coalescer = NotificationCoalescer(
+    deliver=delivery_engine.submit,
+    window=settings.notification_coalesce_window,
+    dedup_ttl=settings.notification_dedup_ttl,
+    digest=build_digest,
+)
 
 router = APIRouter(prefix="/funds", tags=["funds"])
 
+# Campos de las transacciones que necesita el flujo de suscripción/cancelación
+SUBSCRIPTION_FIELDS = frozenset({"fund_id", "amount", "transaction_type", "timestamp"})
+
 
 @router.get("/{fund_id}", response_model=FundsOut)
-async def read_fund(fund_id: str):
+async def read_fund(fund_id: str, request: Request, response: Response):
     """Obtiene un fondo por su ID.
 
     Args:
@@ -29,13 +71,47 @@ async def read_fund(fund_id: str):
     Returns:
         FundsOut: Los detalles del fondo.
     """
-    fund = get_fund_by_id(fund_id)
+    # Primero el fondo (sale de la caché del catálogo): un `If-None-Match: *`
+    # sobre un fondo que no existe debe responder 404, no 304
+    try:
+        fund = await fetch_fund_by_id(fund_id)
+    except InvalidId:
+        fund = None
     if not fund:
         raise HTTPException(status_code=404, detail="Fund not found")
+
+    etag = await catalog_etag(f"fund:{fund_id}")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(catalog_headers(etag))
     return fund
     
+@router.get("/{fund_id}/stats", response_model=FundStatsOut)
+async def read_fund_stats(fund_id: str, days: int = Query(30, ge=1, le=366), current_user: dict = Depends(get_current_user)):
+    """Obtiene el AUM, los suscriptores activos y los flujos diarios de un fondo.
+
+    Se lee de `fund_stats`, que se actualiza con cada transacción: el costo no
+    depende del tamaño del ledger.
+
+    Args:
+        fund_id (str): El ID del fondo.
+        days (int): Días hacia atrás de los buckets diarios.
+        current_user (dict): El usuario autenticado, inyectado por dependencia.
+
+    Returns:
+        FundStatsOut: Las estadísticas del fondo.
+    """
+    try:
+        fund = await fetch_fund_by_id(fund_id)
+    except InvalidId:
+        fund = None
+    if not fund:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    return get_fund_stats(fund_id, days=days)
+
+
 @router.get("/category/{category}")
-async def read_funds_by_category(category: FundsCategories):   
+async def read_funds_by_category(category: FundsCategories, request: Request, response: Response):
     """Obtiene fondos por categoría.
 
     Args:
@@ -44,21 +120,31 @@ async def read_funds_by_category(category: FundsCategories):
     Returns:
         list: Una lista de fondos de la categoría especificada.
     """
+    etag = await catalog_etag(f"category:{category.value}")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     funds = get_funds_by_category(category.value)
+    response.headers.update(catalog_headers(etag))
     return funds
 
 
 @router.get("/", response_model=list[FundsOut])
-async def read_all_funds():
+async def read_all_funds(request: Request, response: Response):
     """Obtiene todos los fondos disponibles.   
     Returns:
         list: Una lista de todos los fondos.
     """
+    etag = await catalog_etag("funds")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     funds = get_funds()
+    response.headers.update(catalog_headers(etag))
     return funds
 
 
-@router.get("/get/transactions")
+@router.get("/get/transactions", response_model=list[Transaction])
 async def read_transactions_by_user(current_user: dict = Depends(get_current_user)):
     """Obtiene todas las transacciones asociadas al usuario autenticado.
 
@@ -70,60 +156,74 @@ async def read_transactions_by_user(current_user: dict = Depends(get_current_use
     """
     cognito_user_id = current_user["sub"]
 
-    user = get_user_by_cognito_id(cognito_user_id)
+    user = await fetch_user_by_cognito_id(cognito_user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    transactions = get_transactions(user_id=user.id)
-    return transactions
+    # Camino rápido: BSON crudo -> JSON, sin modelos intermedios
+    return raw_json_response(get_transactions_json(user_id=user.id))
 
 
 
 
-@router.post("/post/transactions", response_model=Transaction)
-async def create_transactions(
-    transaction_in: TransactionIn,
-    current_user: dict = Depends(get_current_user)
-):
-    """Crea una nueva transacción para el usuario autenticado.
+@router.get("/get/balance", response_model=BalanceOut)
+async def read_balance(as_of: datetime | None = None, current_user: dict = Depends(get_current_user)):
+    """Obtiene el balance del usuario autenticado, actual o a una fecha.
+
+    Se calcula desde el snapshot más cercano y las transacciones posteriores,
+    así que consultar una fecha pasada no recorre todo el historial.
 
     Args:
-        transaction_in (TransactionIn): Los detalles de la transacción a crear.
+        as_of (datetime | None): La fecha (ISO 8601); por defecto ahora.
         current_user (dict): El usuario autenticado, inyectado por dependencia.
 
     Returns:
-        Transaction: La transacción creada.
+        BalanceOut: El balance y el snapshot del que se partió.
     """
-
-    # Verificar el usuario autenticado
-    cognito_user_id = current_user["sub"]
-    user: UserOut | None = get_user_by_cognito_id(cognito_user_id)
-    
+    user = await fetch_user_by_cognito_id(current_user["sub"], fields={"id"})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    balance = balance_at(user.id, as_of)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return balance
+
+
+class InsufficientFundsError(HTTPException):
+    """Saldo insuficiente para suscribirse: responde 400 y se le notifica al usuario."""
+
+    def __init__(self, fund: FundsOut):
+        super().__init__(status_code=400, detail=f"No tiene saldo disponible para vincularse al fondo {fund.name}")
+        self.fund = fund
 
-    # Verificar que el fondo existe
-    fund = get_fund_by_id(transaction_in.fund_id)
-    if not fund:
-        raise HTTPException(status_code=404, detail="Fund not found")
 
-    # Obtener todas las transacciones del usuario para este fondo
-    fund_transactions = get_transactions_by_user_and_fund(user.id, transaction_in.fund_id)
-    fund_transactions.sort(key=lambda t: t.timestamp)
+def active_subscription(user_id: str, fund_id: str) -> dict | None:
+    """Suscripción vigente del usuario en el fondo (`fund_id` y `amount`): la hay si su última transacción es una suscripción."""
+    # Solo se lee la última transacción del fondo (solo los campos que se usan abajo)
+    latest = get_latest_transaction_for_fund(user_id, fund_id, fields=SUBSCRIPTION_FIELDS)
+    if latest is not None and latest.transaction_type == TransactionType.SUBSCRIBE:
+        return {"fund_id": latest.fund_id, "amount": latest.amount}
+    return None
 
-    # Determinar si el usuario tiene una suscripción activa
-    active_subscription = None
-    for t in fund_transactions:
-        if t.transaction_type == TransactionType.SUBSCRIBE:
-            active_subscription = t
-        elif t.transaction_type == TransactionType.CANCEL:
-            active_subscription = None
 
+def plan_transaction(user: UserOut, balance: int, active: dict | None, fund: FundsOut, transaction_in: TransactionIn) -> dict:
+    """Valida la operación contra el estado del usuario y arma la transacción a registrar.
+
+    Args:
+        user (UserOut): El usuario, leído del primario.
+        balance (int): El balance tras las operaciones anteriores del mismo lote.
+        active (dict | None): La suscripción vigente en el fondo tras esas operaciones.
+        fund (FundsOut): El fondo de la operación.
+        transaction_in (TransactionIn): La operación pedida.
+
+    Returns:
+        dict: Los datos de la transacción, sin `user_version`.
+    """
     # Manejar la logica para la transacción de suscripción o cancelación
     if transaction_in.transaction_type == TransactionType.SUBSCRIBE:
         # Verificar que el usuario no tenga una suscripción activa en el fondo en cuestión
-        if active_subscription:
+        if active:
             raise HTTPException(status_code=400, detail=f"User is already subscribed to fund '{fund.name}'")
         # Verificar que el monto sea válido y que el usuario tenga saldo suficiente
         if transaction_in.amount is None:
@@ -131,66 +231,194 @@ async def create_transactions(
         #Verificar que el monto sea mayor al minimo
         if transaction_in.amount < fund.min_amount:
             raise HTTPException(status_code=400, detail=f"Amount must be at least the minimum of {fund.min_amount}")
-        #Verificar que el usuario tenga saldo suficiente
-        if user.balance < transaction_in.amount:
-            raise HTTPException(status_code=400, detail=f"No tiene saldo disponible para vincularse al fondo {fund.name}")
+        #Verificar que el usuario tenga saldo suficiente (se notifica con el resultado final del lote)
+        if balance < transaction_in.amount:
+            raise InsufficientFundsError(fund)
 
-        new_balance = user.balance - transaction_in.amount
-
-        # Actualizar el balance del usuario
-        update_user_balance(user.id, new_balance)
-
-        transaction_data = transaction_in.dict()
+        transaction_data = transaction_in.model_dump()
         transaction_data.update({
             "user_id": user.id,
             "timestamp": datetime.now(timezone.utc)
         })
+        return transaction_data
 
-        # Crear la transacción
-        new_transaction = create_transaction(transaction_data)
-        send_message(user=user,
-                     subject="Subscription Successful",
-                     body=f"You have successfully subscribed to the fund '{fund.name}' with an amount of {transaction_in.amount}.")
-        return new_transaction
-
-    elif transaction_in.transaction_type == TransactionType.CANCEL:
-        # Verificar que el usuario tenga una suscripción activa en el fondo en cuestión
-        if not active_subscription:
-            raise HTTPException(status_code=400, detail=f"User is not subscribed to fund '{fund.name}'")
-
-        # Revertir el balance del usuario
-        refund_amount = active_subscription.amount
-        new_balance = user.balance + refund_amount
-        update_user_balance(user.id, new_balance)
-
-        # Crear la transacción de cancelación
-        transaction_data = {
-            "user_id": user.id,
-            "fund_id": active_subscription.fund_id,
-            "amount": refund_amount,
-            "transaction_type": TransactionType.CANCEL.value,
-            "timestamp": datetime.now(timezone.utc)
-        }
+    # Cancelación: verificar que el usuario tenga una suscripción activa en el fondo en cuestión
+    if not active:
+        raise HTTPException(status_code=400, detail=f"User is not subscribed to fund '{fund.name}'")
+
+    # Se devuelve el monto de la suscripción
+    return {
+        "user_id": user.id,
+        "fund_id": active["fund_id"],
+        "amount": active["amount"],
+        "transaction_type": TransactionType.CANCEL.value,
+        "timestamp": datetime.now(timezone.utc)
+    }
+
+
+def write_batch(user: UserOut, operations: list[tuple[FundsOut, TransactionIn]], start: int, outcomes: list) -> tuple[list, list]:
+    """Valida las operaciones desde `start`, registra las válidas y aplica su cambio de balance.
+
+    Hace todas las llamadas bloqueantes a Mongo de un intento de `execute_batch`,
+    que la corre en un hilo para no detener el event loop.
+
+    Args:
+        user (UserOut): El usuario, leído del primario.
+        operations (list): El lote completo de pares (fondo, operación pedida).
+        start (int): La primera operación sin resultado final.
+        outcomes (list): Los resultados por operación; aquí se guardan los errores
+            de validación y las transacciones creadas.
+
+    Returns:
+        tuple[list, list]: Las operaciones planeadas como (posición, transacción) y
+        las transacciones creadas, un prefijo de las planeadas.
+    """
+    balance = user.balance
+    active = {}
+    planned = []  # (posición en el lote, transacción)
+    for position in range(start, len(operations)):
+        fund, transaction_in = operations[position]
+        fund_id = transaction_in.fund_id
+        if fund_id not in active:
+            active[fund_id] = active_subscription(user.id, fund_id)
+        try:
+            transaction_data = plan_transaction(user, balance, active[fund_id], fund, transaction_in)
+        except HTTPException as e:
+            outcomes[position] = e
+            continue
+        transaction_data["user_version"] = user.version + len(planned) + 1
+        balance += delta(transaction_data)
+        active[fund_id] = transaction_data if transaction_in.transaction_type == TransactionType.SUBSCRIBE else None
+        planned.append((position, transaction_data))
+    if not planned:
+        return planned, []
+
+    created = create_transaction_batch([transaction_data for _, transaction_data in planned])
+    if created:
+        written = planned[:len(created)]
+        commit_balance_change(user.id, user.version, sum(delta(data) for _, data in written), len(created))
+        for (position, _), transaction in zip(written, created):
+            outcomes[position] = transaction
+    return planned, created
+
+
+async def execute_batch(cognito_user_id: str, operations: list[tuple[FundsOut, TransactionIn]]) -> list:
+    """Ejecuta en orden un lote de operaciones del mismo usuario con una sola escritura.
+
+    Cada operación se valida contra el estado que dejan las anteriores; las
+    válidas se registran juntas con versiones consecutivas del usuario
+    (`user_version`, única por usuario) y el balance cambia una vez, solo si el
+    usuario sigue en la versión leída. Si otra escritura (p.ej. de otro worker)
+    ganó una de las versiones, las transacciones registradas antes de ella se
+    quedan y el resto del lote se vuelve a leer y validar, hasta
+    `USER_WRITE_MAX_ATTEMPTS` veces.
+
+    Args:
+        cognito_user_id (str): El `sub` de Cognito del usuario.
+        operations (list): Pares (fondo, operación pedida), en orden de llegada.
+
+    Returns:
+        list: Por operación, la `Transaction` creada o la excepción con la que falla.
+    """
+    outcomes: list = [None] * len(operations)
+    start = 0  # las operaciones anteriores ya tienen su resultado final
+    for attempt in range(settings.user_write_max_attempts):
+        # Se lee sin caché: el balance y la versión deben estar al día
+        user: UserOut | None = await fetch_user_by_cognito_id(cognito_user_id, use_cache=False)
+        if not user:
+            for position in range(start, len(operations)):
+                outcomes[position] = HTTPException(status_code=404, detail="User not found")
+            return outcomes
+
+        planned, created = await asyncio.to_thread(write_batch, user, operations, start, outcomes)
+        if not planned:
+            break
+        if created:
+            balance_compactor.notify(user.id)
+            for (position, transaction_data), transaction in zip(planned, created):
+                user_writes.inc(operation=TransactionType(transaction_data["transaction_type"]).value, outcome="committed")
+                fund, transaction_in = operations[position]
+                event = NotificationEvent.SUBSCRIBE if transaction_in.transaction_type == TransactionType.SUBSCRIBE else NotificationEvent.CANCEL
+                send_message(user=user, event=event, dedup_key=transaction.id, fund_name=fund.name, amount=transaction.amount)
+        if len(created) == len(planned):
+            break
+
+        # Otra escritura tomó la versión siguiente: desde la primera operación sin
+        # registrar se vuelve a validar contra el estado nuevo
+        unwritten = planned[len(created):]
+        for _, transaction_data in unwritten:
+            version_conflicts.inc(operation=TransactionType(transaction_data["transaction_type"]).value)
+        start = unwritten[0][0]
+        await asyncio.to_thread(settle_user_version, user.id, user.version + len(created))
+        await asyncio.sleep(random.uniform(0, settings.user_write_retry_backoff * 2 ** attempt))
+
+    else:
+        # Solo las operaciones válidas que no se alcanzaron a registrar fallan por
+        # el conflicto; las que no pasaron la validación conservan su error
+        for position, transaction_data in unwritten:
+            user_writes.inc(operation=TransactionType(transaction_data["transaction_type"]).value, outcome="exhausted")
+            outcomes[position] = VersionConflictError(user.id, settings.user_write_max_attempts)
+
+    # Los reintentos vuelven a validar: la notificación sale una vez, con el resultado final
+    for outcome in outcomes:
+        if isinstance(outcome, InsufficientFundsError):
+            send_message(user=user, event=NotificationEvent.INSUFFICIENT_FUNDS, fund_name=outcome.fund.name)
+    return outcomes
+
+
+write_scheduler = WriteScheduler(execute_batch, max_batch=settings.write_batch_max_size)
+
+
+@router.post("/post/transactions", response_model=Transaction)
+async def create_transactions(
+    transaction_in: TransactionIn,
+    current_user: dict = Depends(get_current_user)
+):
+    """Crea una nueva transacción para el usuario autenticado.
+
+    Las operaciones de un mismo usuario se serializan en el worker y las que
+    llegan juntas se escriben en un solo lote (ver `execute_batch`).
+
+    Args:
+        transaction_in (TransactionIn): Los detalles de la transacción a crear.
+        current_user (dict): El usuario autenticado, inyectado por dependencia.
+
+    Returns:
+        Transaction: La transacción creada.
+    """
+    # Verificar que el fondo existe
+    fund = await fetch_fund_by_id(transaction_in.fund_id)
+    if not fund:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    return await write_scheduler.submit(current_user["sub"], (fund, transaction_in))
 
-        # Crear la transacción
-        new_transaction = create_transaction(transaction_data)
-        # TODO: Send notification based on user.notif_options
-        return new_transaction
 
+def send_message(user: UserOut, event: NotificationEvent, dedup_key: str | None = None, **variables):
+    """Notifica al usuario por su canal preferido usando la plantilla del evento.
 
-def send_message(user: UserOut, subject: str, body: str):
-    print(user.notif_options, "Notification Option")
+    Args:
+        user (UserOut): El usuario a notificar.
+        event (NotificationEvent): El evento ocurrido.
+        dedup_key (str | None): Identidad del evento (p.ej. el id de la transacción)
+            para no notificarlo dos veces; None no se deduplica.
+        **variables: Las variables de la plantilla del evento.
+    """
+    template = templates.get(event)
+    rendered = templates.render(event, **variables)
+    template_data = {name: str(value) for name, value in variables.items()}
     if user.notif_options == NotificationOptions.email:
         message = Message(
-            subject=subject,
-            body=body,
-            recipient=user.email
+            subject=rendered.subject,
+            body=rendered.text,
+            recipient=user.email,
+            template=template.ses_name,
+            template_data=template_data,
         )
-        email_notifier.send(message=message, email=user.email)
+        notification_coalescer.submit((user.id, event.value), message, channel="email", dedup_key=dedup_key)
     elif user.notif_options == NotificationOptions.sms:
         message = Message(
-            subject=subject,
-            body=body,
+            subject=rendered.subject,
+            body=rendered.text,
             recipient=user.phone
         )
-        sms_notifier.send(message=message, phone=user.phone)
\ No newline at end of file
+        notification_coalescer.submit((user.id, event.value), message, channel="sms", dedup_key=dedup_key)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Query
+
+from reporting import eligible_clients, get_connection
+from schema.reports import EligibleClient
+from security.auth import get_current_user
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+@router.get("/eligible-clients", response_model=list[EligibleClient])
+def get_eligible_clients(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user),
+):
+    """Clientes inscritos en algún producto disponible en una sucursal que visitan (`query.sql`).
+
+    Se sirve desde el índice de join que mantienen los triggers, así que la
+    latencia no depende del volumen de visitas. Se define sin async: SQLite
+    bloquea, así que corre en el threadpool con una conexión por hilo.
+
+    Args:
+        limit (int): Máximo de clientes a devolver.
+        offset (int): Clientes a saltar, en orden de id.
+        current_user (dict): El usuario autenticado, inyectado por dependencia.
+
+    Returns:
+        list[EligibleClient]: Los clientes.
+    """
+    return eligible_clients(get_connection(), limit=limit, offset=offset)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from enum import Enum
+from datetime import datetime
 
 class FundsCategories(str, Enum):
     """Categorías de fondos disponibles."""
@@ -12,3 +13,24 @@ class FundsOut(BaseModel):
     name: str
     min_amount: int
     category: FundsCategories
+
+class FundDailyStats(BaseModel):
+    """Flujos de un fondo en un día (UTC)."""
+    day: str
+    subscriptions: int = 0
+    cancellations: int = 0
+    subscribed_amount: int = 0
+    cancelled_amount: int = 0
+    net_flow: int = 0
+
+class FundStatsOut(BaseModel):
+    """Estadísticas de un fondo para los tableros de operación."""
+    fund_id: str
+    aum: int = 0
+    active_subscribers: int = 0
+    subscriptions: int = 0
+    cancellations: int = 0
+    subscribed_amount: int = 0
+    cancelled_amount: int = 0
+    last_transaction_at: datetime | None = None
+    daily: list[FundDailyStats] = []
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class EligibleClient(BaseModel):
+    """Cliente inscrito en algún producto disponible en una sucursal que visita."""
+    id: int
+    nombre: str
+    apellidos: str
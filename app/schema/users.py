@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from enum import Enum
+from datetime import datetime
 
 class NotificationOptions(str, Enum):
     """Opciones para enviar las notificaciones"""
@@ -13,3 +14,13 @@ class UserOut(BaseModel):
     phone: str
     balance: int
     notif_options: NotificationOptions
+    # Se incrementa con cada cambio de balance; los usuarios anteriores no la tienen
+    version: int = 0
+
+class BalanceOut(BaseModel):
+    """Balance de un usuario a una fecha, calculado desde el ledger y los snapshots."""
+    user_id: str
+    balance: int
+    as_of: datetime
+    snapshot_as_of: datetime | None = None
+    ledger_entries: int = 0
@@ -0,0 +1,287 @@
+"""
+Generador de datos sintéticos con forma de producción, para pruebas de escala.
+
+- Transacciones por usuario con distribución de ley de potencias (pocos
+  usuarios muy activos, la mayoría con pocas transacciones).
+- Fechas dentro de [`START`, `end`) para todos los usuarios: cada historial
+  empieza en el primer año y reparte sus transacciones en orden hasta `end`
+  (por defecto el inicio del día actual), así ninguna queda en el futuro.
+- Secuencias válidas por usuario sobre los fondos sembrados: solo se
+  suscribe a fondos sin suscripción activa, con monto >= mínimo y saldo
+  suficiente, y solo cancela suscripciones activas (devolviendo el monto).
+  El balance final de cada usuario es coherente con su historial.
+
+La generación es determinista para una semilla y un `end` y se hace en streaming: los
+documentos se escriben en lotes con `insert_many` no ordenado, así que
+escala de 10k a 100M transacciones con memoria acotada. Los `_id` también
+son deterministas, por lo que repetir una generación no duplica datos.
+
+Uso (desde la carpeta `app`):
+    python synthetic_data.py 1000000 --seed 42 --manifest dataset.json
+    ENV=memory python synthetic_data.py 10000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import mean
+
+from pymongo.errors import BulkWriteError
+
+from bulk_loader import DUPLICATE_KEY, defer_indexes, deterministic_id
+from config import settings
+from db import ensure_indexes, get_db
+from init_db import seed_funds
+from repositories.backend import Database
+from repositories.users import DEFAULT_INITIAL_BALANCE
+from schema.transactions import TransactionType
+
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+# Múltiplos del monto mínimo con los que se suscriben los usuarios
+AMOUNT_MULTIPLIERS = (1, 1, 1, 1.5, 2, 3, 5)
+CANCEL_PROBABILITY = 0.35
+
+
+def power_law_counts(total: int, users: int, alpha: float, rng: random.Random) -> list[int]:
+    """
+    Reparte `total` transacciones entre `users` con pesos de una distribución
+    de Pareto de forma `alpha` (menor = cola más pesada).
+
+    Returns:
+        list[int]: Transacciones por usuario (suman exactamente `total`).
+    """
+    weights = [rng.paretovariate(alpha) for _ in range(users)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    # El resto se asigna a los usuarios con mayor parte fraccional
+    remainder = total - sum(counts)
+    by_fraction = sorted(range(users), key=lambda i: weights[i] * scale - counts[i], reverse=True)
+    for i in by_fraction[:remainder]:
+        counts[i] += 1
+    return counts
+
+
+def history_timestamps(count: int, end: datetime, rng: random.Random) -> list[datetime]:
+    """
+    Fechas ordenadas de las transacciones de un usuario, todas en [`START`, `end`).
+
+    El historial empieza en algún momento del primer año (o antes de `end`, si
+    es más cercano) y las `count` fechas se reparten uniformes hasta `end`, así
+    un usuario muy activo tiene los intervalos más cortos en vez de pasarse de hoy.
+
+    Returns:
+        list[datetime]: Las fechas en orden.
+    """
+    first = START + (min(end, START + timedelta(days=365)) - START) * rng.random()
+    # Un milisegundo de margen: al redondear a microsegundos no se llega a `end`
+    span = (end - first).total_seconds() - 0.001
+    return [first + timedelta(seconds=offset) for offset in sorted(rng.random() * span for _ in range(count))]
+
+
+def user_history(user_id: str, count: int, funds: list[dict], rng: random.Random, end: datetime) -> tuple[list[dict], int, dict]:
+    """
+    Genera una secuencia válida de suscripciones y cancelaciones.
+
+    Returns:
+        tuple: (transacciones, balance final, suscripciones activas por fondo).
+    """
+    balance = DEFAULT_INITIAL_BALANCE
+    active: dict[str, int] = {}
+    transactions = []
+    for timestamp in history_timestamps(count, end, rng):
+        affordable = [fund for fund in funds if fund["id"] not in active and fund["min_amount"] <= balance]
+        if active and (not affordable or rng.random() < CANCEL_PROBABILITY):
+            fund_id = rng.choice(sorted(active))
+            amount = active.pop(fund_id)
+            balance += amount
+            transaction_type = TransactionType.CANCEL
+        elif affordable:
+            fund = rng.choice(affordable)
+            fund_id = fund["id"]
+            amount = int(fund["min_amount"] * rng.choice(AMOUNT_MULTIPLIERS)) // 1000 * 1000
+            amount = max(fund["min_amount"], min(amount, balance // 1000 * 1000))
+            active[fund_id] = amount
+            balance -= amount
+            transaction_type = TransactionType.SUBSCRIBE
+        else:
+            # Sin saldo para ningún fondo y sin suscripciones: no hay acción válida
+            break
+        transactions.append({
+            "user_id": user_id,
+            "fund_id": fund_id,
+            "amount": amount,
+            "transaction_type": transaction_type.value,
+            "timestamp": timestamp,
+        })
+    return transactions, balance, active
+
+
+class BatchWriter:
+    """Acumula documentos y los escribe en lotes no ordenados, ignorando duplicados."""
+
+    def __init__(self, database: Database, collection: str, batch_size: int):
+        self.collection = database[collection]
+        self.batch_size = batch_size
+        self.buffer: list[dict] = []
+        self.inserted = 0
+        self.duplicates = 0
+
+    def add(self, document: dict) -> None:
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        try:
+            self.inserted += len(self.collection.insert_many(self.buffer, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+            self.inserted += e.details["nInserted"]
+            self.duplicates += len(errors)
+        self.buffer = []
+
+
+def _percentile(sorted_values: list[int], q: float) -> int:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def generate(
+    database: Database, transactions: int, users: int | None = None, seed: int = 42,
+    alpha: float = 1.5, batch_size: int = 10_000, progress: bool = False, end: datetime | None = None,
+) -> dict:
+    """
+    Genera usuarios y transacciones sobre los fondos sembrados en `database`.
+
+    Args:
+        database (Database): La base de datos (MongoDB o en memoria).
+        transactions (int): Número objetivo de transacciones.
+        users (int | None): Número de usuarios; por defecto una veinteava parte de las transacciones.
+        seed (int): La semilla; la misma semilla genera los mismos datos.
+        alpha (float): Forma de la distribución de Pareto (menor = más concentrado).
+        batch_size (int): Documentos por `insert_many`.
+        progress (bool): Si se imprime el avance por stderr.
+        end (datetime | None): Límite (exclusivo) de las fechas; por defecto el inicio del día actual (UTC).
+
+    Returns:
+        dict: El manifiesto con los parámetros y las estadísticas del dataset.
+    """
+    started = time.perf_counter()
+    users = users or max(1, transactions // 20)
+    end = end or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if end <= START:
+        raise ValueError(f"end must be after {START.isoformat()}")
+    seed_funds(database)
+    funds = sorted(
+        ({"id": str(fund["_id"]), "name": fund["name"], "min_amount": fund["min_amount"]} for fund in database.funds.find({})),
+        key=lambda fund: fund["name"],
+    )
+    rng = random.Random(seed)
+    counts = power_law_counts(transactions, users, alpha, rng)
+
+    deferred = {name: defer_indexes(database, name) for name in ("users", "transactions")}
+    user_writer = BatchWriter(database, "users", batch_size)
+    transaction_writer = BatchWriter(database, "transactions", batch_size)
+
+    generated_counts = []
+    per_fund = {fund["name"]: {"subscribe": 0, "cancel": 0} for fund in funds}
+    fund_names = {fund["id"]: fund["name"] for fund in funds}
+    active_total = 0
+    first_timestamp = last_timestamp = None
+    for index, count in enumerate(counts):
+        user_rng = random.Random(seed * 1_000_003 + index)
+        user_id = str(deterministic_id(f"synthetic-user-{seed}", str(index)))
+        history, balance, active = user_history(user_id, count, funds, user_rng, end)
+        if history:
+            first_timestamp = min(filter(None, (first_timestamp, history[0]["timestamp"])))
+            last_timestamp = max(filter(None, (last_timestamp, history[-1]["timestamp"])))
+        for sequence, transaction in enumerate(history):
+            transaction["_id"] = deterministic_id(f"synthetic-tx-{seed}", f"{index}:{sequence}")
+            transaction_writer.add(transaction)
+            per_fund[fund_names[transaction["fund_id"]]][transaction["transaction_type"]] += 1
+        user_writer.add({
+            "_id": deterministic_id(f"synthetic-user-{seed}", str(index)),
+            "email": f"synthetic+{seed}.{index}@example.com",
+            "phone": f"+57300{index:07d}",
+            "balance": balance,
+            "notif_options": "sms" if user_rng.random() < 0.2 else "email",
+            "cognito_id": f"synthetic-{seed}-{index}",
+        })
+        generated_counts.append(len(history))
+        active_total += len(active)
+        if progress and index and index % 10_000 == 0:
+            elapsed = time.perf_counter() - started
+            done = sum(generated_counts)
+            print(f"{index:,} users, {done:,} transactions, {done / elapsed:,.0f} tx/s", file=sys.stderr)
+    user_writer.flush()
+    transaction_writer.flush()
+
+    write_seconds = time.perf_counter() - started
+    ensure_indexes(database)
+
+    generated_counts.sort()
+    total = sum(generated_counts)
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "database": database.name,
+        "params": {
+            "transactions": transactions, "users": users, "seed": seed, "alpha": alpha,
+            "batch_size": batch_size, "end": end.isoformat(),
+        },
+        "users": {"count": users, "inserted": user_writer.inserted, "duplicates": user_writer.duplicates},
+        "transactions": {
+            "count": total,
+            "inserted": transaction_writer.inserted,
+            "duplicates": transaction_writer.duplicates,
+            "subscribe": sum(fund["subscribe"] for fund in per_fund.values()),
+            "cancel": sum(fund["cancel"] for fund in per_fund.values()),
+            "active_subscriptions": active_total,
+            "first_timestamp": first_timestamp.isoformat() if first_timestamp else None,
+            "last_timestamp": last_timestamp.isoformat() if last_timestamp else None,
+        },
+        "per_user": {
+            "min": generated_counts[0],
+            "mean": round(mean(generated_counts), 2),
+            "p50": _percentile(generated_counts, 0.50),
+            "p90": _percentile(generated_counts, 0.90),
+            "p99": _percentile(generated_counts, 0.99),
+            "max": generated_counts[-1],
+            "without_transactions": sum(1 for c in generated_counts if c == 0),
+        },
+        "per_fund": per_fund,
+        "indexes_deferred": deferred,
+        "write_seconds": round(write_seconds, 2),
+        "docs_per_second": round((total + users) / write_seconds) if write_seconds else None,
+        "index_seconds": round(time.perf_counter() - started - write_seconds, 2),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Genera usuarios y transacciones sintéticos.")
+    parser.add_argument("transactions", type=int, help="Número de transacciones (10k a 100M)")
+    parser.add_argument("--users", type=int, help="Número de usuarios (por defecto transacciones / 20)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--alpha", type=float, default=1.5, help="Forma de la distribución de Pareto")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--manifest", help="Archivo donde se escribe el manifiesto JSON")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Límite (exclusivo) de las fechas, ISO 8601 con zona; por defecto hoy")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    manifest = generate(
+        get_db(), args.transactions, users=args.users, seed=args.seed,
+        alpha=args.alpha, batch_size=args.batch_size, progress=True, end=args.end,
+    )
+    manifest["env"] = settings.env
+    output = json.dumps(manifest, indent=2)
+    if args.manifest:
+        with open(args.manifest, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
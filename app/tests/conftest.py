@@ -0,0 +1,70 @@
+"""
+Fixtures comunes: cada prueba corre contra una base en memoria nueva
+(`ENV=memory`), sin cachés de procesos anteriores y sin notificaciones reales.
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+
+os.environ["ENV"] = "memory"
+
+import pytest
+from fastapi.testclient import TestClient
+
+import db
+from repositories import funds as funds_repo
+from repositories import users as users_repo
+
+COGNITO_ID = "cognito-ana"
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch):
+    """Base en memoria nueva, con índices y el catálogo de fondos sembrado."""
+    monkeypatch.setattr(db, "_db", None)
+    for cache in (users_repo._profile_cache, users_repo._cognito_ids, users_repo._user_flight,
+                  funds_repo._fund_flight, funds_repo._catalog_cache):
+        cache.clear()
+    monkeypatch.setattr(funds_repo, "_revision", None)
+    return db.get_db()
+
+
+@pytest.fixture(autouse=True)
+def sent(monkeypatch):
+    """Eventos notificados por las rutas de fondos, en orden."""
+    from routers import funds as funds_router
+
+    events = []
+    monkeypatch.setattr(funds_router, "send_message", lambda user, event, **kwargs: events.append(event))
+    return events
+
+
+@pytest.fixture
+def funds(database):
+    """Los fondos sembrados, por nombre."""
+    return {fund["name"]: fund for fund in database.funds.find({})}
+
+
+@pytest.fixture
+def cognito_id():
+    """El `sub` de Cognito de `user`."""
+    return COGNITO_ID
+
+
+@pytest.fixture
+def user(cognito_id):
+    """Un usuario con el saldo inicial."""
+    return users_repo.create_user("ana@example.com", "+573000000000", cognito_id)
+
+
+@pytest.fixture
+def client(user, cognito_id):
+    """Cliente HTTP autenticado como `user`."""
+    import main
+    from security.auth import get_current_user
+
+    main.app.dependency_overrides[get_current_user] = lambda: {"sub": cognito_id}
+    with TestClient(main.app) as test_client:
+        yield test_client
+    main.app.dependency_overrides.clear()
@@ -0,0 +1,35 @@
+"""Carga masiva sobre el backend en memoria."""
+import json
+
+from bulk_loader import parse_args, run
+
+USERS = (
+    "email,phone,cognito_id\n"
+    "ana@example.com,+573000000001,cognito-ana\n"
+    "luis@example.com,+573000000002,cognito-luis\n"
+    "eva@example.com,+573000000003,cognito-ana\n"
+)
+
+
+def load(tmp_path, *extra):
+    source = tmp_path / "usuarios.csv"
+    source.write_text(USERS, encoding="utf-8")
+    return run(parse_args(["users", str(source), "--workers", "0", "--rejects", str(tmp_path / "rechazos.ndjson"), *extra]))
+
+
+def test_unique_conflicts_are_rejected_not_fatal(database, tmp_path):
+    summary = load(tmp_path)
+    assert summary["indexes_deferred"]
+    assert (summary["inserted"], summary["duplicates"], summary["rejected"]) == (2, 0, 1)
+    rejected = [json.loads(line) for line in (tmp_path / "rechazos.ndjson").read_text().splitlines()]
+    assert rejected[0]["row"]["email"] == "eva@example.com"
+    assert "cognito_id" in rejected[0]["error"]
+    assert "email_1" in database.users.index_information()
+
+
+def test_reloading_counts_duplicates(database, tmp_path):
+    load(tmp_path)
+    summary = load(tmp_path)
+    assert not summary["indexes_deferred"]
+    assert (summary["inserted"], summary["duplicates"], summary["rejected"]) == (0, 2, 1)
+    assert database.users.count_documents({}) == 2
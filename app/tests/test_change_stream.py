@@ -0,0 +1,86 @@
+"""Traducción de los cambios de Mongo a eventos SSE y reparto a las conexiones."""
+import asyncio
+from datetime import datetime, timezone
+
+import orjson
+from bson import ObjectId
+
+from change_stream import ChangeStreamHub, change_to_event
+from schema.transactions import Transaction
+
+
+def test_transaction_event_has_only_the_schema_fields():
+    transaction_id = ObjectId()
+    user_id, name, data = change_to_event({
+        "ns": {"coll": "transactions"},
+        "operationType": "insert",
+        "fullDocument": {
+            "_id": transaction_id, "user_id": "u1", "fund_id": "f1", "amount": 50_000,
+            "transaction_type": "subscribe", "timestamp": datetime.now(timezone.utc), "user_version": 7,
+        },
+    })
+    payload = orjson.loads(data)
+    assert (user_id, name) == ("u1", "transaction")
+    assert set(payload) == set(Transaction.model_fields)
+    assert payload["id"] == str(transaction_id)
+
+
+def test_balance_event():
+    user_id = ObjectId()
+    change = {
+        "ns": {"coll": "users"},
+        "operationType": "update",
+        "documentKey": {"_id": user_id},
+        "updateDescription": {"updatedFields": {"balance": 10, "version": 3}},
+    }
+    assert change_to_event(change) == (str(user_id), "balance", b'{"balance":10}')
+
+
+def test_hub_skips_malformed_changes_and_keeps_running(database):
+    hub = ChangeStreamHub(lambda: database, max_await_ms=20, retry_delay=0.01)
+
+    async def run():
+        queue = hub.subscribe("u1")
+        try:
+            await asyncio.sleep(0.1)  # el hilo abre el stream
+            database.transactions.insert_one({"fund_id": "f1"})  # sin user_id: KeyError al traducirlo
+            database.transactions.insert_one({
+                "user_id": "u1", "fund_id": "f1", "amount": 1, "transaction_type": "subscribe",
+                "timestamp": datetime.now(timezone.utc),
+            })
+            return await asyncio.wait_for(queue.get(), timeout=2)
+        finally:
+            hub.unsubscribe("u1", queue)
+            hub.stop()
+
+    name, data = asyncio.run(run())
+    assert name == "transaction" and orjson.loads(data)["user_id"] == "u1"
+
+
+def test_hub_reopens_after_unexpected_errors(database):
+    attempts = []
+
+    def get_database():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return database
+
+    hub = ChangeStreamHub(get_database, max_await_ms=20, retry_delay=0.01)
+
+    async def run():
+        queue = hub.subscribe("u1")
+        try:
+            for _ in range(100):
+                if len(attempts) > 1:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            database.users.insert_one({"_id": "u1", "balance": 1})
+            database.users.update_one({"_id": "u1"}, {"$set": {"balance": 2}})
+            return await asyncio.wait_for(queue.get(), timeout=2)
+        finally:
+            hub.unsubscribe("u1", queue)
+            hub.stop()
+
+    assert asyncio.run(run()) == ("balance", b'{"balance":2}')
@@ -0,0 +1,11 @@
+"""Validación de la configuración."""
+import pytest
+from pydantic import ValidationError
+
+from config import Settings
+
+
+@pytest.mark.parametrize("attempts", [0, -1])
+def test_write_attempts_must_be_positive(attempts):
+    with pytest.raises(ValidationError, match="user_write_max_attempts"):
+        Settings(user_write_max_attempts=attempts)
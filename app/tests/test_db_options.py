@@ -0,0 +1,20 @@
+"""Opciones del MongoClient a partir de la configuración."""
+from pymongo import MongoClient
+from pymongo.read_preferences import ReadPreference
+
+from config import settings
+from db import mongo_client_options
+
+
+def test_connection_string_read_preference_is_kept(monkeypatch):
+    monkeypatch.setattr(settings, "mongo_read_preference", None)
+    options = mongo_client_options()
+    assert "readPreference" not in options
+    client = MongoClient("mongodb://localhost/?readPreference=secondaryPreferred", connect=False, **options)
+    assert client.read_preference == ReadPreference.SECONDARY_PREFERRED
+    client.close()
+
+
+def test_configured_read_preference_wins(monkeypatch):
+    monkeypatch.setattr(settings, "mongo_read_preference", "nearest")
+    assert mongo_client_options()["readPreference"] == "nearest"
@@ -0,0 +1,101 @@
+"""Envíos masivos de DeliveryEngine contra clientes SES/SNS falsos."""
+import threading
+import time
+
+import pytest
+
+from notifications import (
+    BULK_TEMPLATE_NAME,
+    SES_BULK_MAX_DESTINATIONS,
+    DeliveryEngine,
+    Message,
+    notifications_errors,
+)
+
+
+class FakeSES:
+    def __init__(self):
+        self.batches = []
+
+    def create_template(self, Template):
+        pass
+
+    def update_template(self, Template):
+        pass
+
+    def send_bulk_templated_email(self, Template, Destinations, **kwargs):
+        self.batches.append((Template, len(Destinations)))
+        return {"Status": [{"Status": "Success"} for _ in Destinations]}
+
+
+class FakeSNS:
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.published = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def publish(self, PhoneNumber, Message):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.01)
+            if PhoneNumber in self.fail_for:
+                raise ValueError("número inválido")
+            with self._lock:
+                self.published += 1
+            return {"MessageId": PhoneNumber}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def engine():
+    engine = DeliveryEngine(ses_concurrency=2, sns_concurrency=3)
+    engine.ses = FakeSES()
+    engine.sns = FakeSNS()
+    yield engine
+    engine.shutdown()
+
+
+def test_emails_are_batched_by_template(engine):
+    messages = [Message("Asunto", f"Cuerpo {i}", f"user{i}@example.com") for i in range(120)]
+    messages += [
+        Message("Asunto", "", f"digest{i}@example.com", template="digest", template_data={"n": i})
+        for i in range(30)
+    ]
+
+    report = engine.send_emails(messages)
+
+    assert (report.sent, report.failed) == (150, 0)
+    assert sorted(engine.ses.batches) == sorted([
+        (BULK_TEMPLATE_NAME, 50), (BULK_TEMPLATE_NAME, 50), (BULK_TEMPLATE_NAME, 20), ("digest", 30),
+    ])
+    assert report.calls == len(engine.ses.batches)
+    assert all(size <= SES_BULK_MAX_DESTINATIONS for _, size in engine.ses.batches)
+
+
+def test_sms_respect_the_concurrency_limit(engine):
+    messages = [Message("", f"Mensaje {i}", f"+5730000000{i:02d}") for i in range(24)]
+
+    report = engine.send_sms(messages)
+
+    assert (report.sent, report.failed) == (24, 0)
+    assert engine.sns.published == 24
+    assert engine.sns.max_active == 3
+
+
+def test_failed_sms_are_counted(engine):
+    engine.sns.fail_for = {"+573000000001"}
+    before = notifications_errors.value(source="sns", error="ValueError")
+
+    report = engine.send_sms([
+        Message("", "Hola", "+573000000001"),
+        Message("", "Hola", "+573000000002"),
+    ])
+
+    assert (report.sent, report.failed) == (1, 1)
+    assert notifications_errors.value(source="sns", error="ValueError") == before + 1
@@ -0,0 +1,148 @@
+"""El historial se conserva al compactar y archivar; las estadísticas cuadran con el ledger."""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from archive_transactions import archive
+from rebuild_fund_stats import rebuild
+from repositories.balances import balance_at, compact_user, delta
+from repositories.fund_stats import get_fund_stats
+from repositories.memory import InMemoryCollection
+from repositories.transactions import create_transaction, create_transaction_batch, get_transactions_by_user_and_fund
+from repositories.users import DEFAULT_INITIAL_BALANCE
+from routers.funds import active_subscription
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture
+def ledger(database, funds):
+    """Tres usuarios con dos años de suscripciones y cancelaciones alternadas por fondo."""
+    rng = random.Random(5)
+    fund_ids = [str(fund["_id"]) for fund in funds.values()]
+    users = {}
+    for n in range(3):
+        user_id = ObjectId()
+        timestamp, active, transactions = NOW - timedelta(days=800), {}, []
+        while True:
+            timestamp += timedelta(hours=rng.randint(1, 70))
+            if timestamp > NOW - timedelta(minutes=5):
+                break
+            fund_id = rng.choice(fund_ids)
+            transaction_type = "cancel" if active.get(fund_id) else "subscribe"
+            active[fund_id] = transaction_type == "subscribe"
+            transactions.append({
+                "_id": ObjectId(), "user_id": str(user_id), "fund_id": fund_id,
+                "transaction_type": transaction_type, "amount": rng.randint(1, 100) * 100, "timestamp": timestamp,
+            })
+        database.transactions.insert_many(transactions)
+        database.users.insert_one({
+            "_id": user_id, "email": f"user{n}@example.com", "cognito_id": f"cognito-{n}", "phone": f"+5730000000{n}",
+            "balance": DEFAULT_INITIAL_BALANCE + sum(delta(t) for t in transactions),
+        })
+        users[str(user_id)] = transactions
+    return users
+
+
+def replay(transactions, as_of):
+    return DEFAULT_INITIAL_BALANCE + sum(delta(t) for t in transactions if t["timestamp"] <= as_of)
+
+
+def assert_balances_match_replay(ledger):
+    for user_id, transactions in ledger.items():
+        for as_of in [NOW - timedelta(days=d) for d in (0, 1, 100, 400, 700, 900)] + \
+                     [t["timestamp"] for t in transactions[::37]]:
+            assert balance_at(user_id, as_of).balance == replay(transactions, as_of), (user_id, as_of)
+
+
+def subscription_state(ledger, fund_ids):
+    return {
+        (user_id, fund_id): (
+            sorted(t.id for t in get_transactions_by_user_and_fund(user_id, fund_id)),
+            active_subscription(user_id, fund_id),
+        )
+        for user_id in ledger for fund_id in fund_ids
+    }
+
+
+def test_balance_at_with_snapshots_and_archive(database, ledger):
+    assert_balances_match_replay(ledger)
+
+    assert any(compact_user(user_id, every=20) for user_id in ledger)
+    assert database.balance_snapshots.count_documents({}) > 0
+    assert_balances_match_replay(ledger)
+
+    archive(database, 365)
+    assert_balances_match_replay(ledger)
+
+
+def test_archive_keeps_history_and_subscriptions(database, funds, ledger):
+    fund_ids = [str(fund["_id"]) for fund in funds.values()]
+    before = subscription_state(ledger, fund_ids)
+
+    assert archive(database, 365)["moved"] > 0
+    assert database.transactions_archive.count_documents({}) > 0
+    assert subscription_state(ledger, fund_ids) == before
+    # Archivar de nuevo no mueve nada
+    assert archive(database, 365)["moved"] == 0
+    assert subscription_state(ledger, fund_ids) == before
+
+
+def test_incremental_fund_stats_match_rebuild(database, funds, user):
+    fund_id = str(funds["DEUDAPRIVADA"]["_id"])
+    for transaction_type in ("subscribe", "cancel", "subscribe"):
+        create_transaction({
+            "user_id": user.id, "fund_id": fund_id, "amount": 60_000,
+            "transaction_type": transaction_type, "timestamp": NOW,
+        })
+    incremental = get_fund_stats(fund_id)
+    assert incremental.subscriptions == 2
+    assert incremental.cancellations == 1
+    assert incremental.aum == 60_000
+
+    rebuild(database, workers=2)
+    assert get_fund_stats(fund_id) == incremental
+
+
+def test_batch_updates_fund_stats_in_one_bulk_write_per_collection(database, funds, user, monkeypatch):
+    fund_ids = [str(funds[name]["_id"]) for name in ("DEUDAPRIVADA", "FDO-ACCIONES")]
+    writes = []
+    bulk_write = InMemoryCollection.bulk_write
+
+    def counting_bulk_write(self, requests, **kwargs):
+        writes.append((self.name, len(requests)))
+        return bulk_write(self, requests, **kwargs)
+
+    monkeypatch.setattr(InMemoryCollection, "bulk_write", counting_bulk_write)
+
+    create_transaction_batch([
+        {"user_id": user.id, "fund_id": fund_id, "amount": 300_000 if fund_id == fund_ids[1] else 60_000,
+         "transaction_type": transaction_type, "timestamp": NOW, "user_version": version}
+        for version, (fund_id, transaction_type) in enumerate(
+            [(fund_ids[0], "subscribe"), (fund_ids[1], "subscribe"), (fund_ids[0], "cancel")], start=1)
+    ])
+    assert sorted(writes) == [("fund_stats", 2), ("fund_stats_daily", 2)]
+
+    incremental = [get_fund_stats(fund_id) for fund_id in fund_ids]
+    assert (incremental[0].subscriptions, incremental[0].cancellations, incremental[0].aum) == (1, 1, 0)
+    assert incremental[1].aum == 300_000
+    rebuild(database, workers=2)
+    assert [get_fund_stats(fund_id) for fund_id in fund_ids] == incremental
+
+
+def test_latest_transaction_breaks_timestamp_ties_by_version(database, funds, user):
+    fund_id = str(funds["DEUDAPRIVADA"]["_id"])
+    # Mongo guarda milisegundos: las dos operaciones del mismo lote empatan
+    timestamp = NOW.replace(microsecond=NOW.microsecond // 1000 * 1000) - timedelta(days=400)
+    database.transactions.insert_many([
+        {"_id": ObjectId(), "user_id": user.id, "fund_id": fund_id, "amount": 60_000,
+         "transaction_type": transaction_type, "timestamp": timestamp, "user_version": version}
+        for transaction_type, version in (("cancel", 2), ("subscribe", 1))
+    ])
+    assert active_subscription(user.id, fund_id) is None
+
+    archive(database, 365)
+    assert database.transactions.count_documents({}) == 0
+    assert active_subscription(user.id, fund_id) is None
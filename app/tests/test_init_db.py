@@ -0,0 +1,17 @@
+"""Catálogo inicial de fondos."""
+import os
+
+import init_db
+from init_db import DEFAULT_FUNDS_PATH, load_default_funds
+
+
+def test_catalog_ships_with_the_app():
+    # La imagen de Docker y el paquete de la lambda se construyen desde `app/`
+    assert os.path.dirname(DEFAULT_FUNDS_PATH) == os.path.dirname(os.path.abspath(init_db.__file__))
+    funds = load_default_funds()
+    assert len({fund["fund_id"] for fund in funds}) == len(funds) == 5
+    assert all({"fund_id", "name", "min_amount", "category"} <= fund.keys() for fund in funds)
+
+
+def test_memory_backend_is_seeded_from_the_catalog(database):
+    assert sorted(fund["name"] for fund in database.funds.find({})) == sorted(f["name"] for f in load_default_funds())
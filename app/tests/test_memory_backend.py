@@ -0,0 +1,51 @@
+"""El backend en memoria debe comportarse como Mongo en lo que usa la app."""
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from db import verify_indexes
+from repositories.memory import InMemoryDatabase
+
+
+def test_unique_index_rejects_duplicates(database):
+    database.users.insert_one({"email": "a@example.com", "cognito_id": "a", "phone": "1"})
+    with pytest.raises(DuplicateKeyError):
+        database.users.insert_one({"email": "a@example.com", "cognito_id": "b", "phone": "2"})
+
+
+def test_partial_unique_index_ignores_documents_without_the_field(database):
+    database.transactions.insert_many([{"user_id": "u"}, {"user_id": "u"}])
+    database.transactions.insert_one({"user_id": "u", "user_version": 1})
+    with pytest.raises(DuplicateKeyError):
+        database.transactions.insert_one({"user_id": "u", "user_version": 1})
+
+
+def test_dotted_path_matches_inside_arrays(database):
+    database.transactions_archive.insert_one({
+        "user_id": "u",
+        "transactions": [{"fund_id": "1"}, {"fund_id": "2"}],
+    })
+    assert database.transactions_archive.count_documents({"transactions.fund_id": "2"}) == 1
+    assert database.transactions_archive.count_documents({"transactions.fund_id": "3"}) == 0
+
+
+def test_aggregate_unwind_and_sort(database):
+    database.transactions_archive.insert_one({
+        "user_id": "u",
+        "transactions": [{"fund_id": "1", "n": 2}, {"fund_id": "2", "n": 1}, {"fund_id": "1", "n": 1}],
+    })
+    result = list(database.transactions_archive.aggregate([
+        {"$match": {"user_id": "u"}},
+        {"$unwind": "$transactions"},
+        {"$match": {"transactions.fund_id": "1"}},
+        {"$sort": {"transactions.n": 1}},
+    ]))
+    assert [doc["transactions"]["n"] for doc in result] == [1, 2]
+
+
+def test_required_indexes_exist(database):
+    verify_indexes(database)
+
+
+def test_missing_required_index_fails():
+    with pytest.raises(RuntimeError, match="user_version_unique"):
+        verify_indexes(InMemoryDatabase("empty"))
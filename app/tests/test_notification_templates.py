@@ -0,0 +1,10 @@
+"""Renderizado local de las plantillas de notificación."""
+from notification_templates import NotificationEvent, templates
+
+
+def test_html_escapes_variables():
+    rendered = templates.render(NotificationEvent.SUBSCRIBE, fund_name="<b>A&B</b>", amount=50_000)
+    assert "&lt;b&gt;A&amp;B&lt;/b&gt;" in rendered.html
+    assert "<b>A&B</b>" not in rendered.html
+    # El texto plano se deja tal cual
+    assert "<b>A&B</b>" in rendered.text
@@ -0,0 +1,58 @@
+"""Deduplicación de notificaciones por evento."""
+from concurrent.futures import Future
+
+import pytest
+
+from notifications import Message, NotificationCoalescer
+
+KEY = ("user", "subscribe")
+MESSAGE = Message("Suscripción", "Suscrito a DEUDAPRIVADA por 50000", "ana@example.com")
+
+
+@pytest.fixture
+def deliveries():
+    return []
+
+
+@pytest.fixture
+def coalescer(deliveries):
+    def deliver(message, channel):
+        future = Future()
+        deliveries.append(future)
+        return future
+
+    return NotificationCoalescer(deliver, window=0, dedup_ttl=300)
+
+
+def test_same_event_is_sent_once(coalescer, deliveries):
+    assert coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx1")
+    # Mientras está en camino tampoco se repite
+    assert not coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx1")
+    deliveries[-1].set_result((1, 0))
+    assert not coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx1")
+    assert len(deliveries) == 1
+
+
+def test_failed_delivery_can_be_retried(coalescer, deliveries):
+    assert coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx1")
+    deliveries[-1].set_result((0, 1))
+    assert coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx1")
+    assert len(deliveries) == 2
+
+
+def test_same_content_of_another_event_is_sent(coalescer, deliveries):
+    coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx1")
+    deliveries[-1].set_result((1, 0))
+    assert coalescer.submit(KEY, MESSAGE, "email", dedup_key="tx2")
+    assert coalescer.submit(KEY, MESSAGE, "email")
+    assert len(deliveries) == 3
+
+
+def test_same_content_without_event_is_sent_once(coalescer, deliveries):
+    assert coalescer.submit(KEY, MESSAGE, "email")
+    deliveries[-1].set_result((1, 0))
+    assert not coalescer.submit(KEY, MESSAGE, "email")
+    # Otro cuerpo u otro canal sí se entregan
+    assert coalescer.submit(KEY, Message(MESSAGE.subject, "Suscrito a DEUDAPRIVADA por 60000", MESSAGE.recipient), "email")
+    assert coalescer.submit(KEY, MESSAGE, "sms")
+    assert len(deliveries) == 3
@@ -0,0 +1,46 @@
+"""Reporte de clientes elegibles sobre el esquema de `init.sql`."""
+import os
+import sqlite3
+
+import pytest
+
+import reporting
+from reporting import DEFAULT_SCHEMA_PATH, connect, eligible_clients, load_data, verify_join_index
+
+DATA = {
+    "cliente": "id,nombre,apellidos,ciudad\n1,Ana,Gómez,Bogotá\n2,Luis,Pérez,Cali\n3,Eva,Ruiz,Cali\n",
+    "sucursal": "id,nombre,ciudad\n1,Centro,Bogotá\n2,Norte,Cali\n",
+    "producto": "id,nombre,tipo_producto\n1,FPV,fondo\n2,FIC,fondo\n",
+    "inscripcion": "id_producto,id_cliente\n1,1\n2,2\n2,3\n",
+    "disponibilidad": "id_sucursal,id_producto\n1,1\n2,1\n",
+    "visitan": "id_cliente,id_sucursal,fecha\n1,1,2024-01-01\n2,2,2024-01-02\n3,1,2024-01-03\n",
+}
+
+
+def test_schema_ships_with_the_app():
+    # La imagen de Docker se construye desde `app/`
+    assert os.path.dirname(DEFAULT_SCHEMA_PATH) == os.path.dirname(os.path.abspath(reporting.__file__))
+    assert os.path.exists(DEFAULT_SCHEMA_PATH)
+
+
+def test_load_csv_directory(tmp_path):
+    for table, content in DATA.items():
+        (tmp_path / f"{table}.csv").write_text(content, encoding="utf-8")
+    conn = connect(":memory:")
+    assert load_data(conn, str(tmp_path))["visitan"] == 3
+    assert [c["id"] for c in eligible_clients(conn)] == [1]
+    assert eligible_clients(conn, use_join_index=False) == eligible_clients(conn)
+    assert verify_join_index(conn)["ok"]
+
+
+def test_load_sql_script_is_atomic(tmp_path):
+    script = tmp_path / "datos.sql"
+    script.write_text(
+        "INSERT INTO cliente VALUES (1, 'Ana', 'Gómez', 'Bogotá');\n"
+        "INSERT INTO cliente VALUES (1, 'Ana', 'Gómez', 'Bogotá');\n",
+        encoding="utf-8",
+    )
+    conn = connect(":memory:")
+    with pytest.raises(sqlite3.IntegrityError):
+        load_data(conn, str(script))
+    assert conn.execute("SELECT COUNT(*) FROM cliente").fetchone()[0] == 0
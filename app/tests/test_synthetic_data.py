@@ -0,0 +1,31 @@
+"""Generador de datos sintéticos sobre el backend en memoria."""
+from datetime import datetime, timezone
+
+from repositories.balances import delta
+from repositories.users import DEFAULT_INITIAL_BALANCE
+from synthetic_data import START, generate
+
+
+def test_histories_stay_in_the_past_and_balances_match(database):
+    manifest = generate(database, 5_000, seed=42)
+    now = datetime.now(timezone.utc)
+
+    assert manifest["transactions"]["inserted"] == manifest["transactions"]["count"]
+    assert datetime.fromisoformat(manifest["transactions"]["last_timestamp"]) < now
+    assert datetime.fromisoformat(manifest["transactions"]["first_timestamp"]) >= START
+    latest = next(database.transactions.find({}).sort("timestamp", -1).limit(1))
+    assert latest["timestamp"] < now
+
+    balances = {}
+    for transaction in database.transactions.find({}):
+        balances[transaction["user_id"]] = balances.get(transaction["user_id"], DEFAULT_INITIAL_BALANCE) + delta(transaction)
+    for user in database.users.find({}):
+        assert user["balance"] == balances.get(str(user["_id"]), DEFAULT_INITIAL_BALANCE)
+
+
+def test_same_seed_and_end_generate_the_same_data(database):
+    end = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    first = generate(database, 1_000, seed=7, end=end)
+    again = generate(database, 1_000, seed=7, end=end)
+    assert again["transactions"]["duplicates"] == first["transactions"]["count"]
+    assert again["transactions"]["last_timestamp"] == first["transactions"]["last_timestamp"] < end.isoformat()
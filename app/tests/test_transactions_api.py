@@ -0,0 +1,92 @@
+"""Flujo de suscripción y cancelación por HTTP."""
+from notification_templates import NotificationEvent
+from repositories.users import DEFAULT_INITIAL_BALANCE
+
+
+def subscribe(client, fund, amount):
+    return client.post("/funds/post/transactions", json={
+        "fund_id": str(fund["_id"]), "transaction_type": "subscribe", "amount": amount,
+    })
+
+
+def cancel(client, fund):
+    return client.post("/funds/post/transactions", json={"fund_id": str(fund["_id"]), "transaction_type": "cancel", "amount": None})
+
+
+def test_subscribe_and_cancel(client, funds, sent):
+    fund = funds["FPV_BTG_PACTUAL_RECAUDADORA"]
+
+    response = subscribe(client, fund, 100_000)
+    assert response.status_code == 200
+    assert response.json()["transaction_type"] == "subscribe"
+    assert client.get("/funds/get/balance").json()["balance"] == DEFAULT_INITIAL_BALANCE - 100_000
+
+    response = cancel(client, fund)
+    assert response.status_code == 200
+    assert response.json()["amount"] == 100_000
+    assert client.get("/funds/get/balance").json()["balance"] == DEFAULT_INITIAL_BALANCE
+
+    history = client.get("/funds/get/transactions").json()
+    assert sorted(t["transaction_type"] for t in history) == ["cancel", "subscribe"]
+    assert "user_version" not in history[0]
+    assert sent == [NotificationEvent.SUBSCRIBE, NotificationEvent.CANCEL]
+
+
+def test_double_subscription_is_rejected(client, funds):
+    fund = funds["DEUDAPRIVADA"]
+    assert subscribe(client, fund, 50_000).status_code == 200
+    response = subscribe(client, fund, 50_000)
+    assert response.status_code == 400
+    assert "already subscribed" in response.json()["detail"]
+
+
+def test_cancel_without_subscription_is_rejected(client, funds):
+    assert cancel(client, funds["DEUDAPRIVADA"]).status_code == 400
+
+
+def test_amount_below_minimum_is_rejected(client, funds):
+    assert subscribe(client, funds["FDO-ACCIONES"], 1_000).status_code == 400
+
+
+def test_insufficient_funds_notifies_once(client, funds, sent):
+    response = subscribe(client, funds["FDO-ACCIONES"], DEFAULT_INITIAL_BALANCE + 1)
+    assert response.status_code == 400
+    assert sent == [NotificationEvent.INSUFFICIENT_FUNDS]
+
+
+def test_unknown_fund(client):
+    response = client.post("/funds/post/transactions", json={
+        "fund_id": "0" * 24, "transaction_type": "subscribe", "amount": 100_000,
+    })
+    assert response.status_code == 404
+
+
+def test_fund_etag(client, funds):
+    fund_id = str(funds["DEUDAPRIVADA"]["_id"])
+    response = client.get(f"/funds/{fund_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get(f"/funds/{fund_id}", headers={"If-None-Match": etag}).status_code == 304
+    # Un fondo que no existe es 404 aunque la condición sea `*`
+    assert client.get("/funds/" + "0" * 24, headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_catalog_etag_follows_the_data(client, database, monkeypatch):
+    from repositories import funds as funds_repo
+
+    before = funds_repo.get_catalog_version()
+    database.funds.update_one({"fund_id": 1}, {"$set": {"min_amount": 1}})
+    monkeypatch.setattr(funds_repo, "_revision", None)
+    assert funds_repo.get_catalog_version() != before
+
+
+def test_malformed_fund_id_is_not_found(client):
+    assert client.get("/funds/not-an-object-id").status_code == 404
+    assert client.get("/funds/not-an-object-id/stats").status_code == 404
+
+
+def test_catalog_version_is_ready_at_startup(client):
+    from repositories import funds as funds_repo
+
+    # El lifespan la calcula antes de aceptar peticiones
+    assert funds_repo._revision is not None
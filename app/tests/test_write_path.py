@@ -0,0 +1,150 @@
+"""Escrituras con versión por usuario: lotes, conflictos y recuperación."""
+import asyncio
+import random
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+
+from config import settings
+from exceptions import VersionConflictError
+from notification_templates import NotificationEvent
+from repositories.balances import delta
+from repositories.users import DEFAULT_INITIAL_BALANCE
+from routers import funds as funds_router
+from schema.funds import FundsOut
+from schema.transactions import TransactionIn
+from write_scheduler import WriteScheduler
+
+
+def operation(fund, transaction_type, amount=None):
+    return FundsOut(**{**fund, "id": str(fund["_id"])}), TransactionIn(
+        fund_id=str(fund["_id"]), transaction_type=transaction_type, amount=amount,
+    )
+
+
+def stored(database, user):
+    document = database.users.find_one({"email": user.email})
+    transactions = list(database.transactions.find({"user_id": user.id}))
+    return document, transactions
+
+
+def assert_consistent(database, user):
+    """El balance es el que da el ledger y las versiones son consecutivas."""
+    document, transactions = stored(database, user)
+    assert document["balance"] == DEFAULT_INITIAL_BALANCE + sum(delta(t) for t in transactions)
+    versions = sorted(t["user_version"] for t in transactions)
+    assert versions == list(range(1, len(transactions) + 1))
+    assert document["version"] == len(transactions)
+    return transactions
+
+
+def claim_version(database, user, version, fund):
+    """Simula otro worker que ya registró la transacción `version` sin aplicar el balance."""
+    database.transactions.insert_one({
+        "user_id": user.id, "fund_id": str(fund["_id"]), "amount": fund["min_amount"],
+        "transaction_type": "subscribe", "timestamp": datetime.now(timezone.utc), "user_version": version,
+    })
+
+
+def test_batch_validates_each_operation_against_the_previous_ones(database, user, cognito_id, funds):
+    fund = funds["DEUDAPRIVADA"]
+    outcomes = asyncio.run(funds_router.execute_batch(cognito_id, [
+        operation(fund, "subscribe", 50_000),
+        operation(fund, "subscribe", 50_000),
+        operation(fund, "cancel"),
+    ]))
+    assert outcomes[0].transaction_type == "subscribe"
+    assert isinstance(outcomes[1], HTTPException) and outcomes[1].status_code == 400
+    assert outcomes[2].transaction_type == "cancel"
+    assert len(assert_consistent(database, user)) == 2
+
+
+def test_concurrent_workers_never_lose_or_double_count(database, user, cognito_id, funds):
+    rng = random.Random(3)
+    fund_list = list(funds.values())
+    other_worker = WriteScheduler(funds_router.execute_batch, max_batch=50)
+
+    async def submit(i):
+        fund = rng.choice(fund_list)
+        transaction_type = rng.choice(["subscribe", "cancel"])
+        op = operation(fund, transaction_type, rng.randint(75, 200) * 1000)
+        scheduler = other_worker if i % 3 == 0 else funds_router.write_scheduler
+        try:
+            await scheduler.submit(cognito_id, op)
+            return "ok"
+        except HTTPException as e:
+            return e.status_code
+        except VersionConflictError:
+            return "conflict"
+
+    async def run():
+        results = []
+        for _ in range(5):
+            results += await asyncio.gather(*[submit(i) for i in range(40)])
+        return results
+
+    results = asyncio.run(run())
+    assert "ok" in results
+    transactions = assert_consistent(database, user)
+    # Por fondo, suscripción y cancelación se alternan
+    for fund in fund_list:
+        sequence = [t["transaction_type"] for t in sorted(transactions, key=lambda t: t["user_version"])
+                    if t["fund_id"] == str(fund["_id"])]
+        assert all(a != b for a, b in zip(sequence, sequence[1:]))
+
+
+def test_conflict_keeps_the_written_prefix(database, user, cognito_id, funds):
+    claim_version(database, user, 3, funds["DEUDAPRIVADA"])
+    outcomes = asyncio.run(funds_router.execute_batch(cognito_id, [
+        operation(funds["FPV_BTG_PACTUAL_RECAUDADORA"], "subscribe", 75_000),
+        operation(funds["FDO-ACCIONES"], "subscribe", 250_000),
+        operation(funds["FPV_BTG_PACTUAL_DINAMICA"], "subscribe", 100_000),
+        operation(funds["FPV_BTG_PACTUAL_RECAUDADORA"], "cancel"),
+    ]))
+    assert [o.transaction_type for o in outcomes] == ["subscribe", "subscribe", "subscribe", "cancel"]
+    transactions = assert_consistent(database, user)
+    assert len(transactions) == 5
+
+
+def test_exhausted_retries_keep_validation_errors(database, user, cognito_id, funds, sent, monkeypatch):
+    monkeypatch.setattr(settings, "user_write_max_attempts", 1)
+    claim_version(database, user, 1, funds["FPV_BTG_PACTUAL_ECOPETROL"])
+    outcomes = asyncio.run(funds_router.execute_batch(cognito_id, [
+        operation(funds["FDO-ACCIONES"], "subscribe", DEFAULT_INITIAL_BALANCE + 1),
+        operation(funds["DEUDAPRIVADA"], "subscribe", 50_000),
+        operation(funds["FPV_BTG_PACTUAL_DINAMICA"], "subscribe", 100_000),
+    ]))
+    assert isinstance(outcomes[0], funds_router.InsufficientFundsError)
+    assert all(isinstance(o, VersionConflictError) for o in outcomes[1:])
+    assert outcomes[1] is not outcomes[2]
+    assert sent == [NotificationEvent.INSUFFICIENT_FUNDS]
+
+
+def test_retries_notify_insufficient_funds_once(database, user, cognito_id, funds, sent):
+    claim_version(database, user, 1, funds["FPV_BTG_PACTUAL_ECOPETROL"])
+    outcomes = asyncio.run(funds_router.execute_batch(cognito_id, [
+        operation(funds["FDO-ACCIONES"], "subscribe", DEFAULT_INITIAL_BALANCE + 1),
+        operation(funds["DEUDAPRIVADA"], "subscribe", 50_000),
+    ]))
+    assert outcomes[1].transaction_type == "subscribe"
+    assert sent.count(NotificationEvent.INSUFFICIENT_FUNDS) == 1
+    assert_consistent(database, user)
+
+
+def test_interrupted_write_is_rolled_forward(database, user, cognito_id, funds):
+    # Una transacción registrada cuyo cambio de balance nunca se aplicó
+    claim_version(database, user, 1, funds["DEUDAPRIVADA"])
+    outcome, = asyncio.run(funds_router.execute_batch(cognito_id, [
+        operation(funds["FPV_BTG_PACTUAL_RECAUDADORA"], "subscribe", 75_000),
+    ]))
+    assert outcome.transaction_type == "subscribe"
+    assert len(assert_consistent(database, user)) == 2
+
+
+def test_users_without_version_field(database, user, cognito_id, funds):
+    database.users.update_one({"email": user.email}, {"$unset": {"version": ""}})
+    outcome, = asyncio.run(funds_router.execute_batch(cognito_id, [
+        operation(funds["DEUDAPRIVADA"], "subscribe", 50_000),
+    ]))
+    assert outcome.transaction_type == "subscribe"
+    assert_consistent(database, user)
@@ -0,0 +1,82 @@
+"""
+Serialización por usuario de las escrituras de `/funds/post/transactions`.
+
+Las operaciones de un mismo usuario que llegan a un worker se encolan y una
+sola tarea las ejecuta en orden; las que se acumulan mientras se escribe un
+lote salen juntas en el siguiente (hasta `WRITE_BATCH_MAX_SIZE`), así que un
+usuario que envía muchas operaciones a la vez paga una lectura y una escritura
+por lote en vez de competir consigo mismo por la versión del documento.
+
+Entre workers la exclusión la siguen dando las escrituras condicionadas a la
+versión del usuario (ver `routers.funds.execute_batch`).
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from metrics import registry
+
+batch_sizes = registry.summary("write_scheduler_batch_size", "Operaciones por lote escrito")
+queued_operations = registry.gauge("write_scheduler_queued", "Operaciones encoladas esperando lote")
+
+# Ejecuta un lote de operaciones de una llave y devuelve, en el mismo orden,
+# el resultado de cada una o la excepción con la que debe fallar
+BatchExecutor = Callable[[Hashable, list[Any]], Awaitable[list[Any]]]
+
+
+class WriteScheduler:
+    """
+    Cola por llave (usuario) que ejecuta sus operaciones en orden y en lotes.
+
+    Args:
+        execute (BatchExecutor): Ejecuta un lote: `await execute(key, operations)`.
+        max_batch (int): Operaciones máximas por lote.
+    """
+
+    def __init__(self, execute: BatchExecutor, max_batch: int = 50):
+        self.execute = execute
+        self.max_batch = max(1, max_batch)
+        self._queues: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+        self._drainers: dict[Hashable, asyncio.Task] = {}
+
+    async def submit(self, key: Hashable, operation: Any) -> Any:
+        """
+        Encola una operación y espera su resultado.
+
+        Args:
+            key (Hashable): La llave que serializa (p.ej. el usuario).
+            operation (Any): La operación.
+
+        Returns:
+            Any: El resultado de la operación; si falló, se relanza su excepción.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, []).append((operation, future))
+        queued_operations.inc()
+        if key not in self._drainers:
+            # La tarea no depende de la petición que la creó: si esa se cancela, el resto sigue
+            self._drainers[key] = asyncio.create_task(self._drain(key))
+        return await future
+
+    async def _drain(self, key: Hashable) -> None:
+        try:
+            # Sin `await` entre el último `pop` y el `finally`: nadie encola sin ver la tarea activa
+            while queue := self._queues.pop(key, None):
+                for start in range(0, len(queue), self.max_batch):
+                    await self._run_batch(key, queue[start:start + self.max_batch])
+        finally:
+            self._drainers.pop(key, None)
+
+    async def _run_batch(self, key: Hashable, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        queued_operations.dec(len(batch))
+        batch_sizes.observe(len(batch))
+        try:
+            results = await self.execute(key, [operation for operation, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():  # la petición se canceló mientras esperaba
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -1,9 +1,15 @@
-SELECT NOMBRE FROM CLIENTE
-INNER JOIN INSCRIPCION ON CLIENTE.ID = INSCRIPCION.ID_CLIENTE
+-- Clientes inscritos en algún producto que está disponible en una sucursal que visitan.
+-- Semi-join: cada cliente aparece una sola vez aunque cumpla con varios productos o sucursales.
+SELECT CLIENTE.ID, CLIENTE.NOMBRE, CLIENTE.APELLIDOS
+FROM CLIENTE
 WHERE EXISTS (
     SELECT 1
-    FROM VISITAN
+    FROM INSCRIPCION
     INNER JOIN DISPONIBILIDAD
-    ON VISITAN.ID_SUCURSAL = DISPONIBILIDAD.ID_SUCURSAL
-    WHERE VISITAN.ID_CLIENTE = CLIENTE.ID
-)
\ No newline at end of file
+        ON DISPONIBILIDAD.ID_PRODUCTO = INSCRIPCION.ID_PRODUCTO
+    INNER JOIN VISITAN
+        ON VISITAN.ID_SUCURSAL = DISPONIBILIDAD.ID_SUCURSAL
+        AND VISITAN.ID_CLIENTE = INSCRIPCION.ID_CLIENTE
+    WHERE INSCRIPCION.ID_CLIENTE = CLIENTE.ID
+)
+ORDER BY CLIENTE.ID;
@@ -12,7 +12,7 @@ data "archive_file" "app_tgz" {
 resource "aws_instance" "amaris-webserver" {
   ami                         = "ami-04b70fa74e45c3917"
   associate_public_ip_address = true
-  instance_type               = "t2.micro"
+  instance_type               = var.web_instance_type
   subnet_id                   = aws_subnet.amaris-subnet-public.id
   vpc_security_group_ids      = [aws_security_group.amaris-public-http-traffic.id]
   root_block_device {
@@ -56,7 +56,7 @@ resource "aws_instance" "amaris-webserver" {
       "sudo unzip -o /home/ubuntu/app.zip",
       "cd /home/ubuntu",
       "sudo docker build -t fastapi-app .",
-      "sudo docker run -d -p 80:8000 fastapi-app",
+      "sudo docker run -d --restart unless-stopped -p 80:8000 -e WEB_CONCURRENCY=${var.WEB_CONCURRENCY} fastapi-app",
     ]
   }
 
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import base64
+import boto3
+import botocore
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
+
+# Archivos empaquetados junto al handler
+BASE_DIR   = os.path.dirname(__file__)
+CA_PATH    = os.path.join(BASE_DIR, "global-bundle.pem")
+FUNDS_PATH = os.path.join(BASE_DIR, "funds.json")
+
+REQUIRED_FIELDS = ("fund_id", "name", "min_amount", "category")
+
+# Código de error de Mongo para credenciales inválidas (p.ej. password rotada)
+AUTHENTICATION_FAILED = 18
+
+# Estado a nivel de módulo: se conserva entre invocaciones "calientes" del mismo
+# contenedor, así solo la primera paga Secrets Manager, TLS y la autenticación
+_secrets_client = None
+_secrets: dict = {}
+_clients: dict = {}
+
+
+def get_secret(secret_id: str) -> str:
+    global _secrets_client
+    if secret_id in _secrets:
+        return _secrets[secret_id]
+    if _secrets_client is None:
+        cfg = botocore.config.Config(connect_timeout=10, read_timeout=10, retries={"max_attempts": 3})
+        _secrets_client = boto3.client("secretsmanager", config=cfg)
+    resp = _secrets_client.get_secret_value(SecretId=secret_id)
+    if "SecretString" in resp:
+        secret = resp["SecretString"]
+    else:
+        secret = base64.b64decode(resp["SecretBinary"]).decode("utf-8")
+    _secrets[secret_id] = secret
+    return secret
+
+
+def get_client(cluster_endpoint: str, username: str, secret_id: str) -> tuple:
+    """Devuelve (cliente, reutilizado). El cliente se crea una vez por contenedor."""
+    key = (cluster_endpoint, username, secret_id)
+    client = _clients.get(key)
+    if client is not None:
+        return client, True
+
+    password = get_secret(secret_id)
+    mongo_uri = (
+        f"mongodb://{username}:{password}@{cluster_endpoint}:27017/?tls=true&tlsCAFile={CA_PATH}&replicaSet=rs0&readPreference=secondaryPreferred&retryWrites=false"
+    )
+    client = MongoClient(
+        mongo_uri,
+        serverSelectionTimeoutMS=15000,
+        connectTimeoutMS=10000,
+        socketTimeoutMS=10000,
+        maxPoolSize=2,  # una invocación a la vez por contenedor
+    )
+    # Test de conexión (solo al crear el cliente)
+    client.admin.command("ping")
+    _clients[key] = client
+    return client, False
+
+
+def forget_client(cluster_endpoint: str, username: str, secret_id: str) -> None:
+    """Descarta el cliente y el secreto guardados (p.ej. tras rotar la password)."""
+    client = _clients.pop((cluster_endpoint, username, secret_id), None)
+    _secrets.pop(secret_id, None)
+    if client is not None:
+        client.close()
+
+
+def load_funds(event: dict) -> list:
+    """Fondos de event["funds"] o, si no vienen, del funds.json empaquetado."""
+    funds = event.get("funds")
+    if funds is None:
+        with open(FUNDS_PATH, encoding="utf-8") as f:
+            funds = json.load(f)
+    for fund in funds:
+        missing = [field for field in REQUIRED_FIELDS if field not in fund]
+        if missing:
+            raise ValueError(f"Fund {fund.get('fund_id', fund)} is missing {', '.join(missing)}")
+    return funds
+
+
+def upsert_funds(coll, funds: list) -> dict:
+    """Upsert idempotente por fund_id: repetir el seed no duplica ni pisa otros campos."""
+    coll.create_index("fund_id", unique=True)
+    ops = [UpdateOne({"fund_id": fund["fund_id"]}, {"$set": fund}, upsert=True) for fund in funds]
+    if not ops:
+        return {"matched": 0, "modified": 0, "upserted": 0}
+    res = coll.bulk_write(ops, ordered=False)
+    return {"matched": res.matched_count, "modified": res.modified_count, "upserted": res.upserted_count}
+
+
+def lambda_handler(event, context):
+    """
+    Siembra (o actualiza) la colección 'funds' con upserts por fund_id.
+    Requiere:
+      - event["cluster_endpoint"]  (p.ej. docdb-xxx.cluster-xxxxxx.us-east-1.docdb.amazonaws.com)
+      - event["secret_id"]         (nombre/ARN del secret con la password)
+      - event.get("db_name", "amaris")
+      - event.get("username", "amarisadmin")
+      - event.get("funds")         (opcional; por defecto funds.json)
+    """
+    started = time.perf_counter()
+    cluster_endpoint = event["cluster_endpoint"]
+    secret_id        = event["secret_id"]
+    db_name          = event.get("db_name", os.environ.get("DEFAULT_DB", "amaris"))
+    username         = event.get("username", "amarisadmin")
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    try:
+        funds = load_funds(event)
+    except (OSError, ValueError) as e:
+        return {"status": "error", "where": "funds", "message": str(e), "duration_ms": elapsed_ms()}
+
+    if not os.path.exists(CA_PATH):
+        return {"status": "error", "where": "tls", "message": f"No CA bundle at {CA_PATH}", "duration_ms": elapsed_ms()}
+
+    for attempt in range(2):
+        try:
+            client, reused = get_client(cluster_endpoint, username, secret_id)
+            result = upsert_funds(client[db_name]["funds"], funds)
+            break
+        except BulkWriteError as e:
+            return {"status": "error", "where": "docdb", "message": str(e.details.get("writeErrors", e)), "duration_ms": elapsed_ms()}
+        except OperationFailure as e:
+            if e.code != AUTHENTICATION_FAILED or attempt == 1:
+                return {"status": "error", "where": "docdb", "message": str(e), "duration_ms": elapsed_ms()}
+            # Credenciales cacheadas vencidas: se vuelve a leer el secret una vez
+            forget_client(cluster_endpoint, username, secret_id)
+        except ConnectionFailure as e:
+            forget_client(cluster_endpoint, username, secret_id)
+            return {"status": "error", "where": "docdb", "message": str(e), "duration_ms": elapsed_ms()}
+        except botocore.exceptions.ClientError as e:
+            return {"status": "error", "where": "secrets", "message": str(e), "duration_ms": elapsed_ms()}
+        except Exception as e:
+            return {"status": "error", "where": "general", "message": str(e), "duration_ms": elapsed_ms()}
+
+    response = {
+        "status": "ok",
+        "message": f"Upserted {len(funds)} funds into '{db_name}.funds'",
+        "warm": reused,
+        "duration_ms": elapsed_ms(),
+        **result,
+    }
+    print(json.dumps(response))
+    return response
@@ -152,9 +152,11 @@ data "http" "rds_ca_bundle" {
 #    - Requiere que tengas Python y pip disponibles localmente.
 #    - Si usas Apple Silicon, esto igual funciona (pymongo puro Python).
 resource "null_resource" "build_lambda_zip" {
-  # Si el endpoint cambia o el bundle CA cambia, podríamos reconstruir
+  # Se reconstruye si cambia el bundle CA, el handler o el catálogo de fondos
   triggers = {
-    rds_ca_sha = sha1(data.http.rds_ca_bundle.response_body)
+    rds_ca_sha  = sha1(data.http.rds_ca_bundle.response_body)
+    handler_sha = filesha1("${path.module}/lambda_src/handler.py")
+    funds_sha   = filesha1("${path.module}/../app/funds.json")
   }
 
   provisioner "local-exec" {
@@ -167,88 +169,12 @@ resource "null_resource" "build_lambda_zip" {
       # Guardar el bundle TLS
       echo '${replace(data.http.rds_ca_bundle.response_body, "'", "'\\''")}' > "$BUILD_DIR/global-bundle.pem"
 
-      # Crear requirements y handler
+      # Handler desde lambda_src y catálogo de fondos desde la app (única fuente)
+      cp "${path.module}/lambda_src/handler.py" "${path.module}/../app/funds.json" "$BUILD_DIR/"
       cat > "$BUILD_DIR/requirements.txt" << 'REQ'
 pymongo==4.7.3
 REQ
 
-      cat > "$BUILD_DIR/handler.py" << 'PY'
-import os
-import json
-import base64
-import boto3
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, OperationFailure
-import botocore
-
-def get_secret(secret_id: str) -> str:
-    sm = boto3.client("secretsmanager")
-    resp = sm.get_secret_value(SecretId=secret_id)
-    if "SecretString" in resp:
-        return resp["SecretString"]
-    return base64.b64decode(resp["SecretBinary"]).decode("utf-8")
-
-def lambda_handler(event, context):
-    """
-    Ejecuta el seed de la colección 'funds' en el DB 'amaris' (o el que venga en event["db_name"]).
-    Requiere:
-      - event["cluster_endpoint"]  (p.ej. docdb-xxx.cluster-xxxxxx.us-east-1.docdb.amazonaws.com)
-      - event["secret_id"]         (nombre/ARN del secret con la password)
-      - event.get("db_name", "amaris")
-      - event.get("username", "amarisadmin")
-    """
-    cluster_endpoint = event["cluster_endpoint"]
-    secret_id        = event["secret_id"]
-    db_name          = event.get("db_name", "amaris")
-    username         = event.get("username", "amarisadmin")
-
-    # Leer password del secret
-    password = get_secret(secret_id)
-
-    # Ruta al bundle TLS empaquetado
-    ca_path = os.path.join(os.path.dirname(__file__), "global-bundle.pem")
-
-    # Simplifica la cadena de conexión a una sola línea
-    mongo_uri = f"mongodb://{username}:{password}@{cluster_endpoint}:27017/?tls=true&tlsCAFile={ca_path}&replicaSet=rs0&readPreference=secondaryPreferred&retryWrites=false"
-
-    client = None
-    try:
-        print(f"Connecting to MongoDB at {cluster_endpoint}:27017 (TLS)")
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=8000)
-        client.admin.command('ismaster')
-        print("MongoDB connection successful.")
-
-        db = client[db_name]
-        coll = db["funds"]
-
-        if coll.count_documents({}) > 0:
-            msg = "Funds collection already has data. Skipping."
-            print(msg)
-            return {"status": "ok", "message": msg}
-
-        funds_data = [
-            {"fund_id": 1, "name": "FPV_BTG_PACTUAL_RECAUDADORA", "min_amount": 75000,  "category": "FPV"},
-            {"fund_id": 2, "name": "FPV_BTG_PACTUAL_ECOPETROL",  "min_amount": 125000, "category": "FPV"},
-            {"fund_id": 3, "name": "DEUDAPRIVADA",               "min_amount": 50000,  "category": "FIC"},
-            {"fund_id": 4, "name": "FDO-ACCIONES",               "min_amount": 250000, "category": "FIC"},
-            {"fund_id": 5, "name": "FPV_BTG_PACTUAL_DINAMICA",   "min_amount": 100000, "category": "FPV"},
-        ]
-        res = coll.insert_many(funds_data)
-        msg = f"Inserted {len(res.inserted_ids)} docs into '{db_name}.funds'"
-        print(msg)
-        return {"status": "ok", "message": msg}
-
-    except (ConnectionFailure, OperationFailure) as e:
-        print(f"Mongo error: {e}")
-        return {"status": "error", "message": str(e)}
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return {"status": "error", "message": str(e)}
-    finally:
-        if client:
-            client.close()
-PY
-
       # Instalar dependencias vendorizadas
       python3 -m pip install --upgrade pip >/dev/null
       python3 -m pip install -r "$BUILD_DIR/requirements.txt" -t "$BUILD_DIR" >/dev/null
@@ -297,9 +223,9 @@ resource "aws_lambda_function" "docdb_seeder" {
 }
 
 resource "null_resource" "invoke_seed" {
-  # Triggers never change => se ejecuta una vez y luego queda estable
+  # El seed es idempotente (upsert por fund_id): se vuelve a ejecutar cuando cambia el catálogo
   triggers = {
-    run_once = "true"
+    funds_sha = filesha1("${path.module}/../app/funds.json")
   }
 
   provisioner "local-exec" {
@@ -314,7 +240,8 @@ resource "null_resource" "invoke_seed" {
         --payload '{"cluster_endpoint":"${aws_docdb_cluster.amaris_docdb.endpoint}","secret_id":"${aws_secretsmanager_secret.mongo_secret.id}","db_name":"amaris","username":"${aws_docdb_cluster.amaris_docdb.master_username}"}' \
         --cli-binary-format raw-in-base64-out \
         "${path.module}/lambda_invoke_output.json" >/dev/null
-      echo "Seed invoked."
+      # Resumen del seed: upserts y duración de la invocación
+      cat "${path.module}/lambda_invoke_output.json"; echo
     EOT
   }
 
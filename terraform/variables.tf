@@ -13,3 +13,13 @@ variable "ALLOWED_ORIGINS" {
   description = "Allowed origins for CORS"
   default     = "*"
 }
+
+variable "web_instance_type" {
+  description = "EC2 instance type for the API server"
+  default     = "t2.micro"
+}
+
+variable "WEB_CONCURRENCY" {
+  description = "Number of API worker processes (0 = one per vCPU)"
+  default     = 0
+}